@@ -0,0 +1,173 @@
+import asyncio
+import time
+from urllib.parse import urlparse
+from concurrent.futures import ProcessPoolExecutor
+from frontier import open_crawl
+from fetcher import fetcher, ValidatorStore, NOT_MODIFIED, validators_path
+from extract import extract_page
+from utils import fetch_html, can_fetch, get_crawl_delay, get_sitemaps, parse_sitemap
+
+
+
+class TokenBucket:
+    """
+    Seau à jetons : autorise une requête toutes les `delay` secondes, avec au plus `capacity` requêtes d'avance.
+    """
+
+    def __init__(self, delay, capacity=1):
+        self.delay = delay
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+
+    def refill(self):
+        """Ajoute les jetons gagnés depuis la dernière mise à jour."""
+        now = time.monotonic()
+        if self.delay > 0:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) / self.delay)
+        else:
+            self.tokens = self.capacity
+        self.updated = now
+
+
+    async def acquire(self):
+        """Attend qu'un jeton soit disponible puis le consomme."""
+        async with self.lock:
+            self.refill()
+            while self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) * self.delay)
+                self.refill()
+            self.tokens -= 1
+
+
+
+class HostScheduler:
+    """
+    Politesse par hôte : un seau à jetons par hôte, réglé sur le Crawl-delay de son robots.txt.
+    Les requêtes vers des hôtes différents ne s'attendent pas entre elles.
+    """
+
+    def __init__(self, default_delay=1.0, user_agent="*"):
+        self.default_delay = default_delay
+        self.user_agent = user_agent
+        self.buckets = {}
+
+
+    async def bucket(self, url):
+        """Retourne le seau de l'hôte d'une URL, créé au premier accès à cet hôte."""
+        host = urlparse(url).netloc
+        if host not in self.buckets:
+            delay = await asyncio.to_thread(get_crawl_delay, url, self.user_agent)
+            self.buckets.setdefault(host, TokenBucket(self.default_delay if delay is None else delay))
+        return self.buckets[host]
+
+
+    async def wait(self, url):
+        """Attend le tour de l'hôte d'une URL."""
+        bucket = await self.bucket(url)
+        await bucket.acquire()
+
+
+
+async def crawl_website_async(start_url, max_pages=50, concurrency=10, default_delay=1.0, filename="data/data.jsonl", use_sitemaps=False, resume=False, capacity=1_000_000, parse_workers=None):
+    """
+    Explore un site web avec plusieurs requêtes en parallèle, en suivant les liens internes et en priorisant
+    les pages produit. Les requêtes bloquantes sont exécutées dans des threads, l'analyse des pages dans un
+    pool de processus, et chaque hôte est interrogé au rythme de son Crawl-delay.
+
+    Args:
+        start_url (str): URL de départ
+        max_pages (int): Nombre maximal de pages enregistrées
+        concurrency (int): Nombre de requêtes en parallèle
+        default_delay (float): Délai entre deux requêtes vers un même hôte sans Crawl-delay, en secondes
+        filename (str): Fichier JSONL des données collectées, écrit en ajout seul
+        use_sitemaps (bool): Ajoute aussi à la file les URLs des sitemaps du robots.txt
+        resume (bool): Reprend l'exploration enregistrée dans filename et sa frontière
+        capacity (int): Nombre d'URLs prévu, pour dimensionner le filtre de Bloom de la frontière
+        parse_workers (int): Nombre de processus d'analyse des pages (os.cpu_count() si None) ; avec 0, les
+            pages sont analysées dans la boucle d'événements
+
+    Returns:
+        int: Nombre de pages enregistrées
+    """
+    sink, frontier = open_crawl(filename, resume, capacity)
+    fetcher.validators = ValidatorStore(validators_path(filename))
+    in_flight = 0
+    changed = asyncio.Event()  # Signale de nouveaux liens ou la fin d'une page
+    scheduler = HostScheduler(default_delay)
+    loop = asyncio.get_running_loop()
+    parse_pool = ProcessPoolExecutor(parse_workers) if parse_workers != 0 else None
+
+    frontier.add(start_url, 0)
+    if use_sitemaps:
+        for sitemap_url in await asyncio.to_thread(get_sitemaps, start_url):
+            for link in await asyncio.to_thread(parse_sitemap, sitemap_url):
+                priority = 0 if "produit" in link.lower() else 1
+                frontier.add(link, priority)
+
+    async def worker():
+        nonlocal in_flight
+        while True:
+            # Les pages en cours comptent dans la limite, pour ne pas la dépasser
+            if frontier.visited + in_flight >= max_pages:
+                return
+            url = frontier.pop()
+            if url is None:
+                if in_flight == 0:
+                    return  # File vide et plus aucune page en cours
+                changed.clear()
+                await changed.wait()
+                continue
+
+            in_flight += 1
+            try:
+                if not await asyncio.to_thread(can_fetch, url):
+                    print(f"Accès interdit par robots.txt : {url}")
+                    frontier.done(url, visited=False)
+                    continue
+
+                await scheduler.wait(url)
+                print(f"Exploration : {url}")
+                html = await asyncio.to_thread(fetch_html, url)
+                if html is NOT_MODIFIED:
+                    # Page inchangée : ses données de la dernière exploration sont reprises sans l'analyser
+                    html_parsed = fetcher.validators.record(url)
+                elif not html:
+                    frontier.done(url, visited=False)
+                    continue  # Passe à la page suivante si erreur
+                else:
+                    # L'analyse, coûteuse en CPU, ne bloque pas les téléchargements en cours
+                    if parse_pool is not None:
+                        html_parsed = await loop.run_in_executor(parse_pool, extract_page, html, url, start_url)
+                    else:
+                        html_parsed = extract_page(html, url, start_url)
+                    html_parsed['url'] = url
+                    fetcher.validators.set_record(url, html_parsed)
+                sink.write(html_parsed)
+                frontier.done(url)
+
+                for link in html_parsed['internal_links']:
+                    priority = 0 if "produit" in link.lower() else 1  # Priorise les pages produit
+                    frontier.add(link, priority)
+
+                # Point de reprise : les pages sont écrites sur le disque avant l'état de la frontière
+                if frontier.checkpoint_due():
+                    frontier.checkpoint(sink.offset())
+            finally:
+                in_flight -= 1
+                changed.set()
+
+    try:
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    finally:
+        if parse_pool is not None:
+            parse_pool.shutdown()
+
+    frontier.close(sink.offset())
+    sink.close()
+    fetcher.validators.close()
+    print(f"Exploration terminée ! Données enregistrées dans {filename}")
+    print(fetcher.report())
+    return frontier.visited
@@ -0,0 +1,92 @@
+import os
+import time
+import glob
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from bs4 import BeautifulSoup
+from utils import html_parse
+from extract import extract_page
+
+
+def write_fixtures(folder_path, count=200, products=40):
+    """
+    Écrit des pages HTML de test dans un dossier : une page produit par fichier, avec un en-tête, une
+    description, des liens relatifs et absolus et un pied de page.
+    """
+    os.makedirs(folder_path, exist_ok=True)
+    for i in range(count):
+        links = "".join(f'<li><a href="/product/{j}">Produit {j}</a> <a href="https://web-scraping.dev/produit/{j}#avis">avis</a></li>'
+                        for j in range(products))
+        html = (f'<!DOCTYPE html><html><head><meta charset="utf-8"><title>Produit {i} - web-scraping.dev</title>'
+                f'<link rel="stylesheet" href="/style.css"></head><body><header><nav><a href="/">Accueil</a>'
+                f'<a href="/products">Produits</a></nav></header><main><h1>Produit {i}</h1>'
+                f'<p>Description du <b>produit {i}</b> &amp; de ses caractéristiques.</p><p>Second paragraphe.</p>'
+                f'<ul>{links}</ul><div class="reviews">' + "<p>Avis client très satisfait.</p>" * 20 +
+                f'</div></main><footer><a href="https://example.com/">Partenaire</a></footer></body></html>')
+        with open(os.path.join(folder_path, f"page_{i}.html"), "w", encoding="utf-8") as f:
+            f.write(html)
+
+
+def load_fixtures(folder_path):
+    """Relit les pages HTML d'un dossier, avec l'URL de page déduite du nom du fichier."""
+    pages = []
+    for file_path in sorted(glob.glob(os.path.join(folder_path, "*.html"))):
+        with open(file_path, "rb") as f:
+            name = os.path.splitext(os.path.basename(file_path))[0]
+            pages.append((f.read(), f"https://web-scraping.dev/{name}"))
+    return pages
+
+
+def parse_soup(html, url):
+    return html_parse(BeautifulSoup(html, 'html.parser'), url)
+
+
+def parse_all(function, pages):
+    for html, url in pages:
+        function(html, url)
+
+
+def parse_pool(pages, workers):
+    with ProcessPoolExecutor(workers) as pool:
+        list(pool.map(extract_page, [html for html, _ in pages], [url for _, url in pages], chunksize=16))
+
+
+def benchmark_extraction(folder_path="fixtures/", repeat=3, workers=None):
+    """
+    Compare les pages analysées par seconde : BeautifulSoup, extraction en une passe et extraction en une
+    passe dans un pool de processus. Des pages de test sont écrites dans folder_path s'il est vide.
+
+    Args:
+        folder_path (str): Dossier des pages HTML enregistrées
+        repeat (int): Nombre de passes sur les pages
+        workers (int): Nombre de processus du pool (os.cpu_count() si None)
+    """
+    if not glob.glob(os.path.join(folder_path, "*.html")):
+        write_fixtures(folder_path)
+    pages = load_fixtures(folder_path) * repeat
+    size = sum(len(html) for html, _ in pages) / len(pages) / 1024
+    print(f"{len(pages)} pages, {size:.1f} Ko en moyenne")
+
+    print(f"{'extraction':<24}{'pages/s':>12}")
+    for name, run in [
+        ("beautifulsoup", lambda: parse_all(parse_soup, pages)),
+        ("une passe", lambda: parse_all(extract_page, pages)),
+        (f"une passe, {workers or os.cpu_count()} processus", lambda: parse_pool(pages, workers)),
+    ]:
+        start = time.perf_counter()
+        run()
+        print(f"{name:<24}{len(pages) / (time.perf_counter() - start):>12,.0f}")
+
+    soup_links = set(parse_soup(*pages[0])['internal_links'])
+    extracted = extract_page(*pages[0])
+    print(f"Liens internes : {len(extracted['internal_links'])} en une passe (relatifs résolus, dédoublonnés), "
+          f"{len(soup_links)} avec BeautifulSoup")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Débit d'analyse des pages HTML")
+    parser.add_argument('--fixtures', default="fixtures/", help="dossier des pages HTML enregistrées")
+    parser.add_argument('--repeat', type=int, default=3, help="nombre de passes sur les pages")
+    parser.add_argument('--workers', type=int, default=None, help="nombre de processus du pool")
+    args = parser.parse_args()
+    benchmark_extraction(args.fixtures, args.repeat, args.workers)
@@ -0,0 +1,122 @@
+from html.parser import HTMLParser
+from urllib.parse import urljoin, urldefrag, urlparse
+
+
+# Taille des morceaux de HTML passés au parseur, pour pouvoir s'arrêter avant la fin de la page
+CHUNK_SIZE = 16384
+
+
+
+class PageExtractor(HTMLParser):
+    """
+    Extraction en une passe, sans construire d'arbre : titre, texte du premier paragraphe et liens internes.
+
+    Le texte n'est plus collecté une fois le titre et le premier paragraphe trouvés. Si les liens ne sont
+    pas demandés, l'analyse s'arrête à ce moment-là.
+    """
+
+    def __init__(self, page_url, base_url=None, links=True):
+        super().__init__(convert_charrefs=True)
+        self.page_url = page_url
+        self.netloc = urlparse(base_url or page_url).netloc  # Calculé une seule fois par page
+        page = urlparse(page_url)
+        self.origin = f"{page.scheme}://{page.netloc}" if page.netloc == self.netloc else None
+        self.resolved = {}  # href -> lien interne (None si externe), pour ne résoudre chaque href qu'une fois
+        self.collect_links = links
+        self.title = None
+        self.first_paragraph = None
+        self.internal_links = {}  # dict ordonné, pour dédoublonner en gardant l'ordre des liens
+        self.in_title = False
+        self.paragraph = None  # Morceaux du premier paragraphe en cours de lecture
+        self.done = False
+
+
+    def resolve(self, href):
+        """Lien absolu sans fragment d'un href, None s'il pointe vers un autre hôte."""
+        if self.origin and href.startswith("/") and not href.startswith("//") and "/." not in href:
+            return self.origin + href.split("#", 1)[0]  # Chemin absolu sur l'hôte de la page
+        link = urldefrag(urljoin(self.page_url, href)).url
+        return link if urlparse(link).netloc == self.netloc else None
+
+
+    def text_done(self):
+        return self.title is not None and self.first_paragraph is not None
+
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "a" and self.collect_links:
+            for name, href in attrs:
+                if name == "href" and href:
+                    if href not in self.resolved:
+                        self.resolved[href] = self.resolve(href.strip())
+                    if self.resolved[href] is not None:
+                        self.internal_links[self.resolved[href]] = None
+                    break
+        elif self.text_done():
+            return
+        elif tag == "title" and self.title is None:
+            self.in_title = True
+            self.title = ""
+        elif tag == "p":
+            if self.paragraph is not None:
+                self.end_paragraph()  # Un <p> ouvert dans un <p> ferme le premier
+            elif self.first_paragraph is None:
+                self.paragraph = []
+
+
+    def handle_endtag(self, tag):
+        if tag == "title":
+            self.in_title = False
+        elif tag == "p" and self.paragraph is not None:
+            self.end_paragraph()
+
+
+    def handle_data(self, data):
+        if self.in_title:
+            self.title += data
+        elif self.paragraph is not None:
+            self.paragraph.append(data.strip())
+
+
+    def end_paragraph(self):
+        self.first_paragraph = "".join(self.paragraph)
+        self.paragraph = None
+        if self.text_done() and not self.collect_links:
+            self.done = True
+
+
+    def result(self):
+        if self.paragraph is not None:
+            self.end_paragraph()  # Premier paragraphe jamais fermé
+        return {
+            'title': self.title if self.title is not None else "Titre non trouvé",
+            'first_paragraph': self.first_paragraph if self.first_paragraph is not None else "Aucun paragraphe trouvé",
+            'internal_links': list(self.internal_links)
+        }
+
+
+
+def extract_page(html, page_url, base_url=None, links=True):
+    """
+    Extrait le titre, le premier paragraphe et les liens internes d'une page HTML, sans BeautifulSoup.
+    Les liens relatifs sont résolus par rapport à l'URL de la page, sans fragment, et dédoublonnés.
+
+    Args:
+        html (bytes | str): Contenu de la page
+        page_url (str): URL de la page
+        base_url (str): URL dont l'hôte définit les liens internes (celui de la page si None)
+        links (bool): Extrait aussi les liens ; sinon l'analyse s'arrête après le premier paragraphe
+
+    Returns:
+        dict: title, first_paragraph et internal_links, comme html_parse
+    """
+    if isinstance(html, bytes):
+        html = html.decode("utf-8", errors="replace")
+    parser = PageExtractor(page_url, base_url, links)
+    for start in range(0, len(html), CHUNK_SIZE):
+        parser.feed(html[start:start + CHUNK_SIZE])
+        if parser.done:
+            break
+    else:
+        parser.close()
+    return parser.result()
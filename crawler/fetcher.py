@@ -0,0 +1,180 @@
+import os
+import json
+import zlib
+import sqlite3
+import threading
+import urllib3
+
+
+# Résultat de fetch_html pour une page inchangée depuis la dernière exploration (réponse 304). C'est un
+# objet unique, jamais confondu avec le contenu d'une page : il se compare avec `is NOT_MODIFIED`
+NOT_MODIFIED = object()
+
+
+
+class ValidatorStore:
+    """
+    Validateurs HTTP des pages déjà téléchargées (ETag et Last-Modified), gardés dans une base SQLite d'une
+    exploration à l'autre, avec la taille de chaque page et les données qui en ont été extraites. Une page
+    inchangée n'est ni téléchargée ni analysée à nouveau : ses données sont relues ici.
+    """
+
+    def __init__(self, path="data/data.validators.db"):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("CREATE TABLE IF NOT EXISTS validators (url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, "
+                        "size INTEGER, record TEXT)")
+
+
+    def headers(self, url):
+        """En-têtes de requête conditionnelle d'une URL (vide si les données de la page n'ont pas été enregistrées)."""
+        with self.lock:
+            row = self.db.execute("SELECT etag, last_modified FROM validators WHERE url = ? AND record IS NOT NULL",
+                                  (url,)).fetchone()
+        headers = {}
+        if row is not None:
+            etag, last_modified = row
+            if etag:
+                headers['If-None-Match'] = etag
+            if last_modified:
+                headers['If-Modified-Since'] = last_modified
+        return headers
+
+
+    def size(self, url):
+        """Taille décompressée de la dernière version téléchargée d'une page."""
+        with self.lock:
+            row = self.db.execute("SELECT size FROM validators WHERE url = ?", (url,)).fetchone()
+        return row[0] if row else 0
+
+
+    def record(self, url):
+        """Données extraites de la dernière version d'une page, None si elles n'ont pas été enregistrées."""
+        with self.lock:
+            row = self.db.execute("SELECT record FROM validators WHERE url = ?", (url,)).fetchone()
+        return json.loads(row[0]) if row and row[0] else None
+
+
+    def update(self, url, etag, last_modified, size):
+        """Enregistre les validateurs d'une page qui vient d'être téléchargée."""
+        if not etag and not last_modified:
+            return
+        with self.lock:
+            self.db.execute("INSERT OR REPLACE INTO validators (url, etag, last_modified, size, record) VALUES (?, ?, ?, ?, NULL)",
+                            (url, etag, last_modified, size))
+            self.db.commit()
+
+
+    def set_record(self, url, record):
+        """Enregistre les données extraites d'une page, relues quand elle n'a pas changé."""
+        with self.lock:
+            self.db.execute("UPDATE validators SET record = ? WHERE url = ?", (json.dumps(record, ensure_ascii=False), url))
+            self.db.commit()
+
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+
+
+class Fetcher:
+    """
+    Couche de téléchargement du crawler : connexions persistantes réutilisées par hôte (urllib3), réponses
+    compressées (gzip, deflate) et requêtes conditionnelles si un ValidatorStore est branché. Partagée par
+    tous les workers (threads compris).
+
+    Les statistiques comptent les octets reçus sur le réseau et les octets économisés par la compression
+    et par les pages inchangées (réponses 304, dont la taille est celle de la version déjà téléchargée).
+    """
+
+    def __init__(self, maxsize=10, timeout=10, retries=2, validators=None):
+        self.pool = urllib3.PoolManager(maxsize=maxsize, timeout=urllib3.Timeout(total=timeout),
+                                        retries=urllib3.Retry(retries, redirect=5))
+        self.validators = validators
+        self.lock = threading.Lock()
+        self.stats = {'requests': 0, 'not_modified': 0, 'received_bytes': 0, 'compression_saved_bytes': 0,
+                      'not_modified_saved_bytes': 0}
+
+
+    @staticmethod
+    def decode(body, encoding):
+        """Décompresse le corps d'une réponse selon son Content-Encoding."""
+        if encoding == "gzip":
+            return zlib.decompress(body, 16 + zlib.MAX_WBITS)
+        if encoding == "deflate":
+            try:
+                return zlib.decompress(body)
+            except zlib.error:
+                return zlib.decompress(body, -zlib.MAX_WBITS)  # deflate brut, sans en-tête zlib
+        return body
+
+
+    def count(self, **values):
+        with self.lock:
+            for key, value in values.items():
+                self.stats[key] += value
+
+
+    def fetch(self, url, headers=None):
+        """
+        Télécharge une page.
+
+        Args:
+            url (str): URL de la page
+            headers (dict): En-têtes de requête supplémentaires
+
+        Returns:
+            tuple: (statut HTTP, contenu décompressé) ; le contenu est None pour une réponse 304 ou en erreur
+        """
+        headers = {'Accept-Encoding': "gzip, deflate", **(headers or {})}
+        if self.validators is not None:
+            headers.update(self.validators.headers(url))
+
+        response = self.pool.request("GET", url, headers=headers, preload_content=False, decode_content=False)
+        try:
+            raw = response.read(decode_content=False)
+        finally:
+            response.release_conn()  # Rend la connexion au pool pour la requête suivante
+
+        self.count(requests=1, received_bytes=len(raw))
+        if response.status == 304:
+            self.count(not_modified=1, not_modified_saved_bytes=self.validators.size(url) if self.validators else 0)
+            return response.status, None
+        if response.status != 200:
+            return response.status, None
+
+        body = self.decode(raw, response.headers.get('Content-Encoding', "").strip().lower())
+        self.count(compression_saved_bytes=len(body) - len(raw))
+        if self.validators is not None:
+            self.validators.update(url, response.headers.get('ETag'), response.headers.get('Last-Modified'), len(body))
+        return response.status, body
+
+
+    def saved_bytes(self):
+        return self.stats['compression_saved_bytes'] + self.stats['not_modified_saved_bytes']
+
+
+    def report(self):
+        """Résumé des octets reçus et économisés."""
+        stats = self.stats
+        return (f"{stats['requests']} requêtes, {stats['not_modified']} pages inchangées, "
+                f"{stats['received_bytes']} octets reçus, {self.saved_bytes()} octets économisés "
+                f"(compression : {stats['compression_saved_bytes']}, pages inchangées : {stats['not_modified_saved_bytes']})")
+
+
+
+def validators_path(filename):
+    """
+    Base SQLite des validateurs associée à un fichier de pages. Elle est gardée d'une exploration à l'autre.
+    """
+    return os.path.splitext(filename)[0] + ".validators.db"
+
+
+
+# Couche de téléchargement partagée par tout le crawler
+fetcher = Fetcher()
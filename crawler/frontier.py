@@ -0,0 +1,229 @@
+import os
+import math
+import time
+import sqlite3
+import hashlib
+from sink import JsonlSink
+
+
+# États des URLs de la table seen
+QUEUED = 0    # dans la file d'attente
+CLAIMED = 1   # retirée de la file, en cours d'exploration
+VISITED = 2   # page enregistrée
+SKIPPED = 3   # interdite par robots.txt ou en erreur
+
+
+
+class BloomFilter:
+    """
+    Filtre de Bloom : ensemble approché de taille fixe, sans faux négatif. Une URL absente du filtre n'a
+    jamais été vue, il n'est donc pas nécessaire de la chercher sur le disque.
+    """
+
+    def __init__(self, capacity=1_000_000, error_rate=0.01):
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))  # Nombre de bits
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+
+    def positions(self, item):
+        """Positions des bits d'un élément (double hachage)."""
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+
+    def add(self, item):
+        for position in self.positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+
+    def __contains__(self, item):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self.positions(item))
+
+
+    def save(self, path):
+        """Écrit le filtre dans un fichier, remplacé de façon atomique."""
+        with open(path + ".tmp", "wb") as f:
+            f.write(self.size.to_bytes(8, "little") + self.hashes.to_bytes(1, "little"))
+            f.write(self.bits)
+        os.replace(path + ".tmp", path)
+
+
+    @classmethod
+    def load(cls, path):
+        """Relit un filtre écrit par save."""
+        bloom = cls.__new__(cls)
+        with open(path, "rb") as f:
+            bloom.size = int.from_bytes(f.read(8), "little")
+            bloom.hashes = int.from_bytes(f.read(1), "little")
+            bloom.bits = bytearray(f.read())
+        return bloom
+
+
+
+class Frontier:
+    """
+    Frontière persistante du crawler : file d'attente avec priorité et ensemble des URLs déjà vues, dans
+    une base SQLite, avec un filtre de Bloom en mémoire devant l'ensemble des URLs vues.
+
+    Une URL n'entre dans la file qu'une seule fois (dédoublonnage à l'ajout). Seuls le filtre de Bloom et le
+    cache de SQLite restent en mémoire, quelle que soit la taille de l'exploration. Les modifications sont
+    enregistrées sur le disque à chaque point de reprise (checkpoint) ; après un arrêt, les URLs qui étaient
+    en cours d'exploration reviennent dans la file.
+    """
+
+    def __init__(self, path="data/data.frontier.db", capacity=1_000_000, error_rate=0.01, checkpoint_every=100,
+                 checkpoint_interval=30.0, resume=True):
+        self.path = path
+        self.bloom_path = os.path.splitext(path)[0] + ".bloom"
+        self.checkpoint_every = checkpoint_every
+        self.checkpoint_interval = checkpoint_interval
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if not resume:
+            for file_path in (path, path + "-wal", path + "-shm", self.bloom_path):
+                if os.path.exists(file_path):
+                    os.remove(file_path)
+
+        self.db = sqlite3.connect(path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS seen (url TEXT PRIMARY KEY, priority INTEGER, state INTEGER)")
+        self.db.execute("CREATE TABLE IF NOT EXISTS queue (id INTEGER PRIMARY KEY AUTOINCREMENT, priority INTEGER, url TEXT)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS queue_order ON queue (priority, id)")
+        self.db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value)")
+
+        # Les URLs en cours d'exploration au dernier point de reprise sont remises dans la file
+        claimed = self.db.execute("SELECT priority, url FROM seen WHERE state = ?", (CLAIMED,)).fetchall()
+        self.db.executemany("INSERT INTO queue (priority, url) VALUES (?, ?)", claimed)
+        self.db.execute("UPDATE seen SET state = ? WHERE state = ?", (QUEUED, CLAIMED))
+        self.db.commit()
+
+        if os.path.exists(self.bloom_path):
+            self.bloom = BloomFilter.load(self.bloom_path)
+        else:
+            self.bloom = BloomFilter(capacity, error_rate)
+            for (url,) in self.db.execute("SELECT url FROM seen"):
+                self.bloom.add(url)
+
+        self.visited = self.db.execute("SELECT COUNT(*) FROM seen WHERE state = ?", (VISITED,)).fetchone()[0]
+        self.changes = 0
+        self.last_checkpoint = time.monotonic()
+
+
+    def seen(self, url):
+        """Vérifie si une URL a déjà été ajoutée à la frontière."""
+        if url not in self.bloom:
+            return False
+        return self.db.execute("SELECT 1 FROM seen WHERE url = ?", (url,)).fetchone() is not None
+
+
+    def add(self, url, priority=1):
+        """
+        Ajoute une URL à la file si elle n'a jamais été vue.
+
+        Returns:
+            bool: True si l'URL a été ajoutée
+        """
+        if self.seen(url):
+            return False
+        self.bloom.add(url)
+        if not self.db.execute("INSERT OR IGNORE INTO seen (url, priority, state) VALUES (?, ?, ?)",
+                               (url, priority, QUEUED)).rowcount:
+            return False
+        self.db.execute("INSERT INTO queue (priority, url) VALUES (?, ?)", (priority, url))
+        return True
+
+
+    def pop(self):
+        """Retire de la file l'URL de plus haute priorité (la plus ancienne à priorité égale), None si la file est vide."""
+        while True:
+            row = self.db.execute("SELECT id, url FROM queue ORDER BY priority, id LIMIT 1").fetchone()
+            if row is None:
+                return None
+            queue_id, url = row
+            self.db.execute("DELETE FROM queue WHERE id = ?", (queue_id,))
+            # Les URLs déjà visitées (rattrapées par restore) sont retirées de la file sans être rendues
+            if self.db.execute("UPDATE seen SET state = ? WHERE url = ? AND state = ?", (CLAIMED, url, QUEUED)).rowcount:
+                return url
+
+
+    def done(self, url, visited=True):
+        """Marque une URL retirée de la file comme enregistrée, ou comme ignorée si visited est False."""
+        cursor = self.db.execute("UPDATE seen SET state = ? WHERE url = ? AND state != ?",
+                                 (VISITED if visited else SKIPPED, url, VISITED))
+        if visited and cursor.rowcount:
+            self.visited += 1
+        self.changes += 1
+
+
+    def restore(self, records):
+        """
+        Rattrape les pages enregistrées après le dernier point de reprise : elles sont marquées comme
+        visitées et leurs liens internes sont ajoutés à la file.
+        """
+        for record in records:
+            self.bloom.add(record['url'])
+            self.db.execute("INSERT OR IGNORE INTO seen (url, priority, state) VALUES (?, ?, ?)", (record['url'], 1, QUEUED))
+            self.done(record['url'])
+            for link in record.get('internal_links', []):
+                self.add(link, 0 if "produit" in link.lower() else 1)
+
+
+    def checkpoint_due(self):
+        """Vérifie s'il est temps d'enregistrer un point de reprise."""
+        return (self.changes >= self.checkpoint_every
+                or (self.changes and time.monotonic() - self.last_checkpoint >= self.checkpoint_interval))
+
+
+    def checkpoint(self, sink_offset=None):
+        """
+        Enregistre l'état de la frontière sur le disque.
+
+        Args:
+            sink_offset (int): Taille du fichier des pages au moment du point de reprise ; à la reprise, seules
+                les pages écrites après cette position sont relues
+        """
+        if sink_offset is not None:
+            self.db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('sink_offset', ?)", (sink_offset,))
+        # Le filtre est écrit avant la base : il contient toujours au moins les URLs enregistrées
+        self.bloom.save(self.bloom_path)
+        self.db.commit()
+        self.changes = 0
+        self.last_checkpoint = time.monotonic()
+
+
+    def sink_offset(self):
+        """Position du fichier des pages au dernier point de reprise (0 si aucun)."""
+        row = self.db.execute("SELECT value FROM meta WHERE key = 'sink_offset'").fetchone()
+        return row[0] if row else 0
+
+
+    def close(self, sink_offset=None):
+        self.checkpoint(sink_offset)
+        self.db.close()
+
+
+
+def frontier_path(filename):
+    """
+    Base SQLite de la frontière associée à un fichier de pages.
+    """
+    return os.path.splitext(filename)[0] + ".frontier.db"
+
+
+
+def open_crawl(filename, resume=False, capacity=1_000_000):
+    """
+    Ouvre le fichier des pages et la frontière d'une exploration. À la reprise, les pages écrites après le
+    dernier point de reprise de la frontière sont rattrapées.
+    """
+    sink = JsonlSink(filename, resume=resume)
+    frontier = Frontier(frontier_path(filename), capacity=capacity, resume=resume)
+    if resume:
+        frontier.restore(sink.records(frontier.sink_offset()))
+    return sink, frontier
@@ -1,54 +1,94 @@
-import queue
-import os
-from utils import polite_request, save_data, html_parse, add_link, can_fetch
+import argparse
+import asyncio
+from utils import polite_request, add_link, can_fetch
+from extract import extract_page
+from frontier import open_crawl
+from fetcher import fetcher, ValidatorStore, NOT_MODIFIED, validators_path
 
 
 
-def crawl_website(start_url, max_pages=50):
+def crawl_website(start_url, max_pages=50, filename="data/data.jsonl", resume=False, capacity=1_000_000):
     """
     Explore un site web en suivant les liens internes et en priorisant les pages produit.
+    Les pages sont ajoutées au fur et à mesure à un fichier JSONL et la file d'attente est gardée sur le
+    disque ; avec resume, l'exploration reprend là où elle s'était arrêtée.
     """
-    filename = "data/data.json"
-    if os.path.exists(filename):
-        os.remove(filename)
-        print(f"Le fichier {filename} a été supprimé.")
-    
-    visited = set()  # URLs déjà visitées
-    to_visit = queue.PriorityQueue()  # File d'attente avec priorité
-    
-    # Ajouter la première URL
-    add_link(start_url, to_visit, visited, priority=0)
-
-    while not to_visit.empty() and len(visited) < max_pages:
-        _, url = to_visit.get()  # Récupère l'URL avec la plus haute priorité
-
-        if url not in visited and can_fetch(url):
-
-            print(f"Exploration : {url}")
-
-            # Récupérer et analyser la page
-            soup = polite_request(url)
-            if not soup:
-                continue  # Passe à la page suivante si erreur
-
-            html_parsed = html_parse(soup, start_url)
+    sink, frontier = open_crawl(filename, resume, capacity)
+    fetcher.validators = ValidatorStore(validators_path(filename))
+
+    # Ajouter la première URL (ignorée si elle a déjà été vue)
+    add_link(start_url, frontier, priority=0)
+
+    while frontier.visited < max_pages:
+        url = frontier.pop()  # Récupère l'URL avec la plus haute priorité
+        if url is None:
+            break
+
+        if not can_fetch(url):
+            frontier.done(url, visited=False)
+            continue
+
+        print(f"Exploration : {url}")
+
+        # Récupérer et analyser la page
+        html = polite_request(url)
+        if html is NOT_MODIFIED:
+            # Page inchangée : ses données de la dernière exploration sont reprises sans l'analyser
+            html_parsed = fetcher.validators.record(url)
+        elif not html:
+            frontier.done(url, visited=False)
+            continue  # Passe à la page suivante si erreur
+        else:
+            html_parsed = extract_page(html, url, start_url)
             html_parsed['url'] = url
+            fetcher.validators.set_record(url, html_parsed)
+
+        # Stocker les données
+        sink.write(html_parsed)
 
-            # Stocker les données
-            save_data(html_parsed)
+        # Marquer l'URL comme visitée
+        frontier.done(url)
 
-            # Marquer l'URL comme visitée
-            visited.add(url)
+        # Ajouter les liens internes à explorer
+        internal_links = html_parsed['internal_links']
+        for link in internal_links:
+            priority = 0 if "produit" in link.lower() else 1  # Priorise les pages produit
+            add_link(link, frontier, priority)
 
-            # Ajouter les liens internes à explorer
-            internal_links = html_parsed['internal_links']
-            for link in internal_links:
-                priority = 0 if "produit" in link.lower() else 1  # Priorise les pages produit
-                add_link(link, to_visit, visited, priority)
+        # Point de reprise : les pages sont écrites sur le disque avant l'état de la frontière
+        if frontier.checkpoint_due():
+            frontier.checkpoint(sink.offset())
 
-    print("Exploration terminée !")
+    frontier.close(sink.offset())
+    sink.close()
+    fetcher.validators.close()
+    print(f"Exploration terminée ! Données enregistrées dans {filename}")
+    print(fetcher.report())
 
 # Lancer le crawler
 if __name__ == "__main__":
-    start_url = "https://web-scraping.dev/products"  # Remplace par l'URL du site cible
-    crawl_website(start_url)
+    parser = argparse.ArgumentParser(description="Crawler de pages produit")
+    parser.add_argument('--start-url', default="https://web-scraping.dev/products", help="URL de départ")
+    parser.add_argument('--max-pages', type=int, default=50, help="nombre maximal de pages visitées")
+    parser.add_argument('--async', dest='use_async', action='store_true',
+                        help="plusieurs requêtes en parallèle, avec un délai par hôte (Crawl-delay)")
+    parser.add_argument('--concurrency', type=int, default=10, help="nombre de requêtes en parallèle (--async)")
+    parser.add_argument('--delay', type=float, default=1.0,
+                        help="délai entre deux requêtes vers un hôte sans Crawl-delay, en secondes (--async)")
+    parser.add_argument('--resume', action='store_true',
+                        help="reprend une exploration interrompue après les pages déjà enregistrées")
+    parser.add_argument('--output', default="data/data.jsonl", help="fichier JSONL des pages explorées")
+    parser.add_argument('--capacity', type=int, default=1_000_000,
+                        help="nombre d'URLs prévu, pour dimensionner le filtre de Bloom de la frontière")
+    parser.add_argument('--parse-workers', type=int, default=None,
+                        help="nombre de processus d'analyse des pages, 0 pour analyser sans pool (--async)")
+    parser.add_argument('--sitemaps', action='store_true',
+                        help="ajoute à la file les URLs des sitemaps déclarés dans robots.txt (--async)")
+    args = parser.parse_args()
+
+    if args.use_async:
+        from async_crawler import crawl_website_async
+        asyncio.run(crawl_website_async(args.start_url, args.max_pages, args.concurrency, args.delay, args.output,
+                                        args.sitemaps, args.resume, args.capacity, args.parse_workers))
+    else:
+        crawl_website(args.start_url, args.max_pages, args.output, args.resume, args.capacity)
@@ -0,0 +1,108 @@
+import time
+import threading
+import urllib.request
+import urllib.error
+import urllib.robotparser
+from urllib.parse import urlparse
+
+
+
+class RobotsEntry:
+    """
+    robots.txt d'un hôte, tel qu'il a été lu, avec sa date d'expiration dans le cache.
+    """
+
+    def __init__(self, parser, status, expires):
+        self.parser = parser
+        self.status = status  # Code HTTP, None si le fichier n'a pas pu être lu
+        self.expires = expires
+
+
+
+class RobotsCache:
+    """
+    Cache des robots.txt par hôte, partagé par tous les workers du crawler (threads compris).
+
+    Chaque robots.txt est téléchargé une seule fois par durée de validité. Les réponses en erreur sont
+    aussi gardées en cache (cache négatif), avec une durée plus courte :
+    - 401 et 403 : tout est interdit ;
+    - autres 4xx : tout est autorisé (pas de robots.txt) ;
+    - 5xx et erreurs réseau : tout est interdit jusqu'au prochain essai.
+    """
+
+    def __init__(self, ttl=3600, error_ttl=300, timeout=10):
+        self.ttl = ttl
+        self.error_ttl = error_ttl
+        self.timeout = timeout
+        self.entries = {}
+        self.host_locks = {}
+        self.lock = threading.Lock()
+        self.fetches = 0
+
+
+    @staticmethod
+    def robots_url(url):
+        """URL du robots.txt de l'hôte d'une URL."""
+        parsed_url = urlparse(url)
+        return f"{parsed_url.scheme}://{parsed_url.netloc}/robots.txt"
+
+
+    def fetch(self, robots_url):
+        """Télécharge et analyse un robots.txt."""
+        self.fetches += 1
+        parser = urllib.robotparser.RobotFileParser(robots_url)
+        try:
+            with urllib.request.urlopen(robots_url, timeout=self.timeout) as response:
+                parser.parse(response.read().decode("utf-8", errors="replace").splitlines())
+                return RobotsEntry(parser, response.status, time.monotonic() + self.ttl)
+        except urllib.error.HTTPError as e:
+            if e.code in (401, 403) or e.code >= 500:
+                parser.disallow_all = True
+            else:
+                parser.allow_all = True
+            return RobotsEntry(parser, e.code, time.monotonic() + self.error_ttl)
+        except Exception as e:
+            print(f"Erreur lors de la lecture de robots.txt : {e}")
+            parser.disallow_all = True
+            return RobotsEntry(parser, None, time.monotonic() + self.error_ttl)
+
+
+    def get(self, url):
+        """Retourne le robots.txt de l'hôte d'une URL, téléchargé s'il est absent du cache ou expiré."""
+        robots_url = self.robots_url(url)
+        with self.lock:
+            entry = self.entries.get(robots_url)
+            if entry is not None and entry.expires > time.monotonic():
+                return entry
+            host_lock = self.host_locks.setdefault(robots_url, threading.Lock())
+
+        # Un seul téléchargement par hôte, les autres workers attendent son résultat
+        with host_lock:
+            with self.lock:
+                entry = self.entries.get(robots_url)
+            if entry is None or entry.expires <= time.monotonic():
+                entry = self.fetch(robots_url)
+                with self.lock:
+                    self.entries[robots_url] = entry
+        return entry
+
+
+    def can_fetch(self, url, user_agent="*"):
+        """Vérifie si le crawler est autorisé à accéder à une URL."""
+        return self.get(url).parser.can_fetch(user_agent, url)
+
+
+    def crawl_delay(self, url, user_agent="*"):
+        """Crawl-delay de l'hôte d'une URL en secondes, None s'il n'y en a pas."""
+        delay = self.get(url).parser.crawl_delay(user_agent)
+        return float(delay) if delay is not None else None
+
+
+    def sitemaps(self, url):
+        """URLs des sitemaps déclarés dans le robots.txt de l'hôte d'une URL."""
+        return self.get(url).parser.site_maps() or []
+
+
+
+# Cache partagé par tout le crawler
+robots_cache = RobotsCache()
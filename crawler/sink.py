@@ -0,0 +1,117 @@
+import os
+import json
+import time
+import threading
+
+
+
+class JsonlSink:
+    """
+    Sortie des pages explorées en ajout seul : un enregistrement JSON par ligne, au format lu par
+    `index.parse_jsonl`.
+
+    Les enregistrements sont gardés dans un tampon et écrits par lots, suivis d'un seul fsync, quand le
+    lot est plein ou que le dernier fsync date de plus de `flush_interval` secondes. Après un arrêt brutal,
+    seule la dernière ligne peut être incomplète : elle est supprimée à l'ouverture, et l'exploration
+    reprend après le dernier enregistrement complet.
+    """
+
+    def __init__(self, filename="data/data.jsonl", batch_size=20, flush_interval=1.0, resume=True):
+        self.filename = filename
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.buffer = []
+        self.lock = threading.Lock()
+        self.count = 0
+
+        directory = os.path.dirname(filename)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if not resume and os.path.exists(filename):
+            os.remove(filename)
+            print(f"Le fichier {filename} a été supprimé.")
+        self.repair()
+        self.file = open(filename, "ab")
+        self.last_sync = time.monotonic()
+
+
+    def repair(self):
+        """Supprime la dernière ligne du fichier si elle est incomplète."""
+        if not os.path.exists(self.filename):
+            return
+        with open(self.filename, "rb+") as f:
+            size = f.seek(0, os.SEEK_END)
+            if size == 0:
+                return
+            f.seek(size - 1)
+            if f.read(1) == b"\n":
+                return
+            # Recherche du dernier saut de ligne, par blocs depuis la fin
+            position = size
+            while position > 0:
+                start = max(0, position - 4096)
+                f.seek(start)
+                chunk = f.read(position - start)
+                newline = chunk.rfind(b"\n")
+                if newline != -1:
+                    f.truncate(start + newline + 1)
+                    return
+                position = start
+            f.truncate(0)
+
+
+    def records(self, start=0):
+        """Relit les enregistrements déjà écrits dans le fichier, à partir de la position start."""
+        self.flush()
+        with open(self.filename, "rb") as f:
+            f.seek(start)
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+
+
+    def offset(self):
+        """Écrit le tampon sur le disque et retourne la taille du fichier."""
+        self.flush()
+        return self.file.tell()
+
+
+    def write(self, record):
+        """Ajoute un enregistrement au tampon, et écrit le lot s'il est plein ou trop ancien."""
+        line = json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n"
+        with self.lock:
+            self.buffer.append(line)
+            self.count += 1
+            if len(self.buffer) >= self.batch_size or time.monotonic() - self.last_sync >= self.flush_interval:
+                self.sync()
+
+
+    def sync(self):
+        """Écrit le tampon puis force son enregistrement sur le disque (à appeler avec le verrou)."""
+        if self.buffer:
+            self.file.write(b"".join(self.buffer))
+            self.buffer = []
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.last_sync = time.monotonic()
+
+
+    def flush(self):
+        """Écrit le tampon sur le disque."""
+        with self.lock:
+            self.sync()
+
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *exc):
+        self.close()
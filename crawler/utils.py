@@ -1,25 +1,29 @@
 import urllib.request 
 from bs4 import BeautifulSoup
-import urllib.robotparser
 from urllib.parse import urlparse
+from xml.etree import ElementTree
 import time
-import json
-import os
+from robots import robots_cache
+from fetcher import fetcher, NOT_MODIFIED
 
 
 
-def fetch_page(url, headers=None):
+def fetch_html(url, headers=None):
     """
-    Envoie une requête HTTP GET et retourne l'objet BeautifulSoup si la requête réussit.
+    Télécharge une page avec la couche de téléchargement partagée (connexions persistantes, compression,
+    requêtes conditionnelles) et retourne son contenu HTML si la requête réussit. Les en-têtes donnés
+    sont ajoutés à la requête.
+    Retourne NOT_MODIFIED si la page n'a pas changé depuis la dernière exploration.
     """
     try:
-        response = urllib.request.urlopen(url)
-        if response.status == 200:
-            html = response.read()
-            soup = BeautifulSoup(html, 'html.parser')
-            return soup
+        status, html = fetcher.fetch(url, headers)
+        if status == 304:
+            print(f"Page inchangée : {url}")
+            return NOT_MODIFIED
+        if status == 200:
+            return html
         else:
-            print(f"Erreur HTTP: {response.status}")
+            print(f"Erreur HTTP: {status}")
             return None
     except Exception as e:
         print(f"Une erreur est survenue : {e}")
@@ -27,79 +31,83 @@ def fetch_page(url, headers=None):
 
 
 
+def fetch_page(url, headers=None):
+    """
+    Envoie une requête HTTP GET et retourne l'objet BeautifulSoup si la requête réussit.
+    Retourne NOT_MODIFIED si la page n'a pas changé depuis la dernière exploration, sans l'analyser.
+    """
+    html = fetch_html(url, headers)
+    if html is None or html is NOT_MODIFIED:
+        return html
+    return BeautifulSoup(html, 'html.parser')
+
+
+
 def get_internal_links(soup, base_url):
     """
     Extrait tous les liens internes à partir d'un objet BeautifulSoup.
     """
     links = set()
+    base_netloc = urlparse(base_url).netloc
     for link in soup.find_all("a", href=True):
         href = link["href"]
-        parsed_url = urlparse(href)
-        base_parsed_url = urlparse(base_url)
-        if parsed_url.netloc == base_parsed_url.netloc:
+        if urlparse(href).netloc == base_netloc:
             links.add(href)
     return list(links)
 
 
 
-def polite_request(url, delay=10):
+def polite_request(url, delay=10, fetch=fetch_html):
     """
     Vérifie robots.txt avant de scraper et attend un délai entre les requêtes.
+    Retourne le HTML de la page (fetch_html par défaut, comme crawl_website), NOT_MODIFIED si elle n'a pas
+    changé, ou None en cas d'erreur ou d'accès interdit.
     """
     if can_fetch(url):
         time.sleep(delay)  # Attente avant la requête
-        return fetch_page(url)
+        return fetch(url)
     else:
         print(f"Accès interdit par robots.txt : {url}")
         return None
 
 
 
-def save_data(data, filename="data/data.json"):
+def can_fetch(url, user_agent="*"):
     """
-    Sauvegarde les données collectées dans un fichier JSON.
+    Vérifie si le crawler est autorisé à accéder à une URL en lisant robots.txt (mis en cache par hôte).
+    Si robots.txt ne peut pas être lu, on évite de scraper.
     """
-    try:
-        # Charge le fichier si il existe déjà
-        if os.path.exists(filename):
-            with open(filename, "r", encoding="utf-8") as f:
-                try:
-                    existing_data = json.load(f)
-                except json.JSONDecodeError:
-                    existing_data = []
-        else:
-            existing_data = []
-
-        # Ajoute les nouvelles données
-        existing_data.append(data)
+    return robots_cache.can_fetch(url, user_agent)
 
-        # Sauvegarde dans le fichier JSON
-        with open(filename, "w", encoding="utf-8") as f:
-            json.dump(existing_data, f, indent=4, ensure_ascii=False)
 
-        print(f"Données enregistrées dans {filename}")
 
-    except Exception as e:
-        print(f"Erreur lors de l'enregistrement des données : {e}")
+def get_crawl_delay(url, user_agent="*"):
+    """
+    Retourne le Crawl-delay du robots.txt de l'hôte d'une URL, None s'il n'y en a pas.
+    """
+    return robots_cache.crawl_delay(url, user_agent)
 
 
 
-def can_fetch(url, user_agent="*"):
+def get_sitemaps(url):
     """
-    Vérifie si le crawler est autorisé à accéder à une URL en lisant robots.txt.
+    Retourne les sitemaps déclarés dans le robots.txt de l'hôte d'une URL.
     """
-    try:
-        parsed_url = urlparse(url)
-        robots_url = f"{parsed_url.scheme}://{parsed_url.netloc}/robots.txt"
+    return robots_cache.sitemaps(url)
+
 
-        rp = urllib.robotparser.RobotFileParser()
-        rp.set_url(robots_url)
-        rp.read()
-        return rp.can_fetch(user_agent, url)
 
+def parse_sitemap(sitemap_url):
+    """
+    Retourne les URLs (<loc>) d'un sitemap XML.
+    """
+    try:
+        with urllib.request.urlopen(sitemap_url) as response:
+            root = ElementTree.fromstring(response.read())
+        return [loc.text.strip() for loc in root.iter() if loc.tag.endswith("loc") and loc.text]
     except Exception as e:
-        print(f"Erreur lors de la lecture de robots.txt : {e}")
-        return False  # Par défaut, on évite de scraper si on ne peut pas vérifier
+        print(f"Erreur lors de la lecture du sitemap {sitemap_url} : {e}")
+        return []
 
 
 
@@ -113,7 +121,6 @@ def html_parse(soup, url):
 
 
 
-def add_link(url, to_visit, visited, priority=1):
-    """Fonction pour ajouter un lien à la queue avec priorité"""
-    if url not in visited:
-        to_visit.put((priority, url))
\ No newline at end of file
+def add_link(url, frontier, priority=1):
+    """Fonction pour ajouter un lien à la frontière avec priorité, s'il n'a jamais été vu"""
+    return frontier.add(url, priority)
\ No newline at end of file
@@ -0,0 +1,87 @@
+import string
+from functools import lru_cache
+
+
+# Mots vides anglais de NLTK (nltk.corpus.stopwords.words('english')), embarqués pour ne rien télécharger
+STOPWORDS = frozenset("""
+i me my myself we our ours ourselves you you're you've you'll you'd your yours yourself yourselves
+he him his himself she she's her hers herself it it's its itself they them their theirs themselves
+what which who whom this that that'll these those am is are was were be been being have has had having
+do does did doing a an the and but if or because as until while of at by for with about against between
+into through during before after above below to from up down in out on off over under again further then
+once here there when where why how all any both each few more most other some such no nor not only own
+same so than too very s t can will just don don't should should've now d ll m o re ve y ain aren aren't
+couldn couldn't didn didn't doesn doesn't hadn hadn't hasn hasn't haven haven't isn isn't ma mightn
+mightn't mustn mustn't needn needn't shan shan't shouldn shouldn't wasn wasn't weren weren't won won't
+wouldn wouldn't
+""".split())
+
+PUNCTUATION = str.maketrans('', '', string.punctuation)
+
+
+class Analyzer:
+    def __init__(self, lowercase=True, strip_punctuation=False, stop_words=STOPWORDS, cache_size=65536):
+        """Splits text into tokens, normalizes them and filters stopwords.
+
+        The normalization of each distinct token is kept in an LRU cache, so that the words repeated
+        across products and requests are only normalized once.
+
+        Args:
+            lowercase (bool): Whether tokens are lowercased
+            strip_punctuation (bool): Whether punctuation is removed from tokens
+            stop_words (frozenset): Stopwords, compared to the lowercased token
+            cache_size (int): Number of distinct tokens kept in the cache
+        """
+        self.lowercase = lowercase
+        self.strip_punctuation = strip_punctuation
+        self.stop_words = stop_words
+        self.normalize = lru_cache(maxsize=cache_size)(self.normalize_token)
+
+
+    def normalize_token(self, token):
+        """Normalizes a token.
+
+        Returns:
+            str: The normalized token, None if it is a stopword or nothing is left of it
+        """
+        if token.lower() in self.stop_words:
+            return None
+        if self.lowercase:
+            token = token.lower()
+        if self.strip_punctuation:
+            token = token.translate(PUNCTUATION)
+        return token or None
+
+
+    def tokenize(self, text):
+        """Tokenizes, normalizes and filters stopwords from text.
+
+        Args:
+            text (str): Text
+
+        Returns:
+            list: list of filtered tokens
+        """
+        normalize = self.normalize
+        tokens = []
+        for token in text.split():
+            token = normalize(token)
+            if token is not None:
+                tokens.append(token)
+        return tokens
+
+
+    def cache_info(self):
+        """Hits, misses and size of the token cache.
+        """
+        return self.normalize.cache_info()
+
+
+# Analyseur partagé par l'indexeur et le moteur de recherche
+analyzer = Analyzer()
+
+
+def tokenize(text):
+    """Tokenizes text with the shared analyzer.
+    """
+    return analyzer.tokenize(text)
@@ -0,0 +1,203 @@
+import os
+import json
+import time
+import tempfile
+import tracemalloc
+import contextlib
+from segment import Segment
+from postings import CODECS, encode_postings, BlockPostings
+from analyzer import Analyzer
+from index import index as Index
+
+
+def load_json_indexes(folder_path, fields, tokens):
+    """Loads the JSON doc table, field indexes and statistics, then looks up the tokens."""
+    with open(os.path.join(folder_path, "doc_table.json"), "r", encoding="utf-8") as f:
+        json.load(f)
+    for field in fields:
+        with open(os.path.join(folder_path, f"{field}_index.json"), "r", encoding="utf-8") as f:
+            field_index = {token: dict(postings) for token, postings in json.load(f).items()}
+        with open(os.path.join(folder_path, f"{field}_stats.json"), "r", encoding="utf-8") as f:
+            json.load(f)
+        for token in tokens:
+            field_index.get(token)
+
+
+def load_segment(segment_path, fields, tokens):
+    """Opens the binary segment with mmap, then decodes the postings of the tokens."""
+    segment = Segment(segment_path)
+    for field in fields:
+        for token in tokens:
+            segment.fields[field].index.get(token)
+
+
+def measure(function, repeat, *args):
+    """Returns the mean time in milliseconds and the peak of allocated memory in KB of a function."""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function(*args)
+    elapsed = (time.perf_counter() - start) / repeat * 1000
+
+    tracemalloc.start()
+    function(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / 1024
+
+
+def folder_size(folder_path, names):
+    """Size in KB of the files of a folder whose name starts with one of the names."""
+    total = 0
+    for file_name in os.listdir(folder_path):
+        if any(file_name.startswith(name) for name in names):
+            total += os.path.getsize(os.path.join(folder_path, file_name))
+    return total / 1024
+
+
+def benchmark_loaders(folder_path='index_json/', segment_path='index_segment/', fields=('title', 'description'),
+                      tokens=('shoes', 'running', 'chocolate', 'energy', 'potion'), repeat=20):
+    """Compares the startup of the query side with the JSON indexes and with the binary segment.
+
+    Args:
+        folder_path (str): Folder of the JSON indexes
+        segment_path (str): Folder of the binary segment
+        fields (tuple): Indexed fields
+        tokens (tuple): Tokens looked up after loading, as a query would
+        repeat (int): Number of runs averaged
+    """
+    json_time, json_memory = measure(load_json_indexes, repeat, folder_path, fields, tokens)
+    segment_time, segment_memory = measure(load_segment, repeat, segment_path, fields, tokens)
+    json_size = folder_size(folder_path, ['doc_table'] + [f"{field}_" for field in fields])
+    segment_size = folder_size(segment_path, ['docs'] + list(fields))
+
+    print(f"{'format':<10}{'chargement (ms)':>18}{'mémoire (Ko)':>16}{'disque (Ko)':>15}")
+    print(f"{'json':<10}{json_time:>18.2f}{json_memory:>16.1f}{json_size:>15.1f}")
+    print(f"{'segment':<10}{segment_time:>18.2f}{segment_memory:>16.1f}{segment_size:>15.1f}")
+
+
+def collect_postings(folder_path, fields):
+    """Returns the (doc_ids, tfs, first_positions) of every token of the field and feature indexes of a folder."""
+    postings_lists = []
+    for field in fields:
+        with open(os.path.join(folder_path, f"{field}_index.json"), "r", encoding="utf-8") as f:
+            for postings in json.load(f).values():
+                postings = sorted(postings)
+                postings_lists.append((
+                    [doc_id for doc_id, _ in postings],
+                    [len(positions) for _, positions in postings],
+                    [positions[0] for _, positions in postings]
+                ))
+    for feature in ['brand', 'origin', 'domain']:
+        with open(os.path.join(folder_path, f"{feature}_index.json"), "r", encoding="utf-8") as f:
+            for doc_ids in json.load(f).values():
+                doc_ids = sorted(doc_ids)
+                postings_lists.append((doc_ids, [1] * len(doc_ids), [0] * len(doc_ids)))
+    return postings_lists
+
+
+def benchmark_codecs(folder_path='index_json/', fields=('title', 'description'), repeat=20):
+    """Compares the postings codecs: bytes per posting and decoding throughput.
+
+    Args:
+        folder_path (str): Folder of the JSON indexes built from products.jsonl
+        fields (tuple): Indexed fields
+        repeat (int): Number of decodings averaged
+    """
+    postings_lists = collect_postings(folder_path, fields)
+    number_of_postings = sum(len(doc_ids) for doc_ids, _, _ in postings_lists)
+    longest = max(postings_lists, key=lambda postings: len(postings[0]))
+
+    print(f"{len(postings_lists)} listes, {number_of_postings} postings, liste la plus longue : {len(longest[0])}")
+    print(f"{'codec':<12}{'octets/posting':>16}{'décodage (postings/s)':>24}{'liste longue (octets)':>24}")
+    for name, codec in CODECS.items():
+        encoded = [encode_postings(doc_ids, tfs, first_positions, codec) for doc_ids, tfs, first_positions in postings_lists]
+        size = sum(len(buffer) for buffer in encoded)
+
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for buffer in encoded:
+                BlockPostings(buffer, codec).to_lists()
+        throughput = number_of_postings * repeat / (time.perf_counter() - start)
+
+        longest_size = len(encode_postings(*longest, codec))
+        print(f"{name:<12}{size / number_of_postings:>16.2f}{throughput:>24,.0f}{longest_size:>24}")
+
+
+def benchmark_analyzer(file_path='products.jsonl', fields=('title', 'description'), repeat=20):
+    """Measures the tokens per second of the analyzer on the product fields, with a cold and a warm cache.
+
+    Args:
+        file_path (str): JSONL file of the products
+        fields (tuple): Tokenized fields
+        repeat (int): Number of passes over the products with a warm cache
+    """
+    texts = []
+    with open(file_path, "r", encoding="utf-8") as f:
+        for line in f:
+            product = json.loads(line)
+            texts += [product[field] for field in fields]
+    number_of_tokens = sum(len(text.split()) for text in texts)
+
+    analyzer = Analyzer()
+    start = time.perf_counter()
+    for text in texts:
+        analyzer.tokenize(text)
+    cold = number_of_tokens / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for text in texts:
+            analyzer.tokenize(text)
+    warm = number_of_tokens * repeat / (time.perf_counter() - start)
+
+    info = analyzer.cache_info()
+    print(f"{len(texts)} textes, {number_of_tokens} tokens, {info.currsize} tokens distincts")
+    print(f"{'cache':<10}{'tokens/s':>16}")
+    print(f"{'froid':<10}{cold:>16,.0f}")
+    print(f"{'chaud':<10}{warm:>16,.0f}")
+
+
+def benchmark_parallel_build(file_path='products.jsonl', max_workers=None, copies=20):
+    """Measures the build time of the indexes with 1 to max_workers processes.
+
+    The products are repeated copies times so that the build time is not dominated by the start of
+    the processes.
+
+    Args:
+        file_path (str): JSONL file of the products
+        max_workers (int): Highest number of processes, os.cpu_count() if None
+        copies (int): Number of times the products are repeated
+    """
+    max_workers = max_workers or os.cpu_count()
+    with tempfile.TemporaryDirectory() as folder_path:
+        corpus_path = os.path.join(folder_path, "products.jsonl")
+        with open(file_path, "rb") as source, open(corpus_path, "wb") as corpus:
+            lines = source.read()
+            for _ in range(copies):
+                corpus.write(lines)
+
+        builder = Index(None)
+        with contextlib.redirect_stdout(None):
+            start = time.perf_counter()
+            builder.build_indexes_streaming(corpus_path, None, folder_path)
+            serial = time.perf_counter() - start
+
+        print(f"{len(builder.doc_table)} produits")
+        print(f"{'processus':<12}{'temps (s)':>12}{'accélération':>16}")
+        print(f"{'série':<12}{serial:>12.2f}{1:>16.2f}")
+        for workers in range(1, max_workers + 1):
+            with contextlib.redirect_stdout(None):
+                start = time.perf_counter()
+                builder.build_indexes_parallel(corpus_path, workers, folder_path)
+                elapsed = time.perf_counter() - start
+            print(f"{workers:<12}{elapsed:>12.2f}{serial / elapsed:>16.2f}")
+
+
+if __name__ == "__main__":
+    benchmark_loaders()
+    print()
+    benchmark_codecs()
+    print()
+    benchmark_analyzer()
+    print()
+    benchmark_parallel_build()
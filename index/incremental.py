@@ -0,0 +1,547 @@
+import os
+import json
+import uuid
+import heapq
+import shutil
+import itertools
+import threading
+from collections.abc import Mapping
+from analyzer import analyzer
+from segment import SegmentWriter, Segment, TermView
+from index import index as Index
+
+
+# Dossier des fichiers de lecteurs d'un segment de mise à jour, un par moteur qui l'a ouvert
+READERS = 'readers'
+
+
+def build_delta_statistics(field_index, number_of_documents):
+    """BM25 statistics of a field of an update segment, with local document IDs.
+
+    Args:
+        field_index (dict): Index mapping tokens to {doc_id: [positions]}
+        number_of_documents (int): Number of documents of the update segment
+
+    Returns:
+        dict: N, average document length, document lengths and documents in order of first appearance
+    """
+    doc_lengths = [0] * number_of_documents
+    doc_order = []
+    for postings in field_index.values():
+        for doc_id, positions in postings.items():
+            if doc_lengths[doc_id] == 0:
+                doc_order.append(doc_id)
+            doc_lengths[doc_id] += len(positions)
+    N = len(doc_order)
+    return {
+        'N': N,
+        'avg_doc_length': sum(doc_lengths) / N if N > 0 else 1,
+        'doc_lengths': doc_lengths,
+        'doc_order': doc_order
+    }
+
+
+def review_entry(product):
+    """Reviews of a product in the format of index_json/reviews_index.json.
+    """
+    return Index.review_entry(product.get('product_reviews', []))
+
+
+class IncrementalIndex:
+    def __init__(self, updates_path='index_updates/', base_path='index_json/', fields=('title', 'description'), codec='vbyte', max_segments=8):
+        """Updates of the products written as small segments next to the base indexes.
+
+        Added and changed products (keyed by url) get new document IDs, after the ones of the base doc
+        table, and are written in an update segment with their own records. Deleted and changed
+        products are marked in a deletion bitmap. 'manifest.json' lists the live update segments and
+        the bitmap; it is replaced atomically, so the search engine always reads a consistent state.
+        The segments replaced by a compaction are listed as retired, and deleted only once every search
+        engine reading them has switched to the manifest that replaced them (release): each opened
+        segment holds a reader file per engine in its 'readers' folder.
+
+        Args:
+            updates_path (str): Folder of the update segments
+            base_path (str): Folder of the base JSON indexes (for the doc table)
+            fields (tuple): Indexed fields
+            codec (str): Postings codec of the update segments
+            max_segments (int): Number of update segments above which they are compacted in background
+        """
+        self.updates_path = updates_path
+        self.base_path = base_path
+        self.fields = fields
+        self.codec = codec
+        self.max_segments = max_segments
+        self.lock = threading.Lock()
+        self.segments = {}
+        self.compaction = None
+        # Fichier de lecteur de cette instance dans les segments ouverts, préfixé par le pid du processus
+        self.reader = f"{os.getpid()}_{uuid.uuid4().hex}"
+
+
+    def manifest_path(self):
+        return os.path.join(self.updates_path, 'manifest.json')
+
+
+    def read_manifest(self):
+        """Returns the manifest, or the one of an empty update folder.
+        """
+        try:
+            with open(self.manifest_path(), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            with open(os.path.join(self.base_path, 'doc_table.json'), 'r', encoding='utf-8') as f:
+                number_of_documents = len(json.load(f))
+            return {'generation': 0, 'next_doc_id': number_of_documents, 'segments': [], 'deleted': None, 'retired': []}
+
+
+    def write_manifest(self, manifest):
+        """Replaces the manifest atomically.
+        """
+        os.makedirs(self.updates_path, exist_ok=True)
+        temporary_path = self.manifest_path() + '.tmp'
+        with open(temporary_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=4)
+        os.replace(temporary_path, self.manifest_path())
+
+
+    def read_deleted(self, manifest):
+        """Returns the deletion bitmap of a manifest, one bit per document ID.
+        """
+        bitmap = bytearray((manifest['next_doc_id'] + 7) // 8)
+        if manifest['deleted'] is not None:
+            with open(os.path.join(self.updates_path, manifest['deleted']), 'rb') as f:
+                data = f.read()
+            bitmap[:len(data)] = data
+        return bitmap
+
+
+    @staticmethod
+    def deleted_documents(bitmap):
+        """Returns the set of document IDs marked in a deletion bitmap.
+        """
+        deleted = set()
+        for i, byte in enumerate(bitmap):
+            if byte:
+                for bit in range(8):
+                    if byte & (1 << bit):
+                        deleted.add(i * 8 + bit)
+        return deleted
+
+
+    def open_segment(self, name):
+        """Opens an update segment once, with its reviews and the path of its records.
+
+        Returns:
+            dict: 'segment', 'reviews', 'static_scores' and 'products_path'
+        """
+        if name not in self.segments:
+            path = os.path.join(self.updates_path, name)
+            # Enregistré avant la lecture : un segment retiré n'est pas supprimé pendant son ouverture
+            os.makedirs(os.path.join(path, READERS), exist_ok=True)
+            open(os.path.join(path, READERS, self.reader), 'w').close()
+            with open(os.path.join(path, 'reviews_index.json'), 'r', encoding='utf-8') as f:
+                reviews = json.load(f)
+            try:
+                with open(os.path.join(path, 'static_scores.json'), 'r', encoding='utf-8') as f:
+                    static_scores = json.load(f)
+            except FileNotFoundError:
+                static_scores = Index.build_static_scores(reviews)  # Segment écrit avant les scores statiques
+            self.segments[name] = {
+                'segment': Segment(path),
+                'reviews': reviews,
+                'static_scores': static_scores,
+                'products_path': os.path.join(path, 'products.jsonl')
+            }
+        return self.segments[name]
+
+
+    def close_segment(self, name):
+        """Unmaps an update segment opened by open_segment, and removes the reader file of this instance.
+        """
+        layer = self.segments.pop(name, None)
+        if layer is not None:
+            layer['segment'].close()
+            try:
+                os.remove(os.path.join(self.updates_path, name, READERS, self.reader))
+            except FileNotFoundError:
+                pass
+
+
+    @staticmethod
+    def process_alive(pid):
+        """Checks whether a process is still running. Always true outside POSIX systems.
+        """
+        if pid == os.getpid() or os.name != 'posix':
+            return True
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass
+        return True
+
+
+    def readers(self, name):
+        """Returns the reader files of an update segment, removing those of processes that are gone.
+        """
+        folder = os.path.join(self.updates_path, name, READERS)
+        try:
+            readers = os.listdir(folder)
+        except FileNotFoundError:
+            return []
+        alive = []
+        for reader in readers:
+            pid = reader.split('_', 1)[0]
+            if pid.isdigit() and not self.process_alive(int(pid)):
+                try:
+                    os.remove(os.path.join(folder, reader))
+                except FileNotFoundError:
+                    pass
+            else:
+                alive.append(reader)
+        return alive
+
+
+    def release(self, manifest):
+        """Closes the update segments that are no longer in a manifest, and deletes the ones it retired
+        once no reader is left.
+
+        Called by the search engine once it reads the layers of the manifest: this engine no longer
+        reads the segments retired by a compaction, but other engines, in this process or in others,
+        may still read them until they switch too. The last one to release a segment deletes it.
+
+        Args:
+            manifest (dict): Manifest whose layers are read
+        """
+        live = {entry['path'] for entry in manifest['segments']}
+        for name in list(self.segments):
+            if name not in live:
+                self.close_segment(name)
+        for entry in manifest.get('retired', []):
+            if entry['path'] not in live and not self.readers(entry['path']):
+                shutil.rmtree(os.path.join(self.updates_path, entry['path']), ignore_errors=True)
+
+
+    def layers(self, manifest):
+        """Returns the update segments of a manifest with the first document ID of each one.
+        """
+        return [dict(self.open_segment(entry['path']), first_doc_id=entry['first_doc_id']) for entry in manifest['segments']]
+
+
+    def live_urls(self, manifest, bitmap):
+        """Returns the document ID of each live url, base documents included.
+        """
+        with open(os.path.join(self.base_path, 'doc_table.json'), 'r', encoding='utf-8') as f:
+            doc_table = json.load(f)
+        urls = {entry['url']: doc_id for doc_id, entry in enumerate(doc_table)}
+        for layer in self.layers(manifest):
+            segment_doc_table = layer['segment'].doc_table
+            for doc_id in range(len(segment_doc_table)):
+                url = segment_doc_table[doc_id]['url']
+                if url:
+                    urls[url] = layer['first_doc_id'] + doc_id
+        return {url: doc_id for url, doc_id in urls.items() if not bitmap[doc_id >> 3] & (1 << (doc_id & 7))}
+
+
+    def write_segment(self, name, products):
+        """Writes an update segment holding products with consecutive document IDs.
+
+        Args:
+            name (str): Folder of the segment in the update folder
+            products (list): Products, None for the document IDs of deleted products kept as holes
+        """
+        path = os.path.join(self.updates_path, name)
+        os.makedirs(path, exist_ok=True)
+        doc_table = []
+        reviews = []
+        field_indexes = {field: {} for field in self.fields}
+        offset = 0
+
+        with open(os.path.join(path, 'products.jsonl'), 'wb') as f:
+            for doc_id, product in enumerate(products):
+                if product is None:
+                    doc_table.append({'url': '', 'product_id': None, 'variant': None, 'offset': 0, 'length': 0})
+                    reviews.append(None)
+                    continue
+                line = json.dumps(product, ensure_ascii=False).encode('utf-8') + b'\n'
+                f.write(line)
+                id_var = Index.return_id_var(product['url']) or {'id': None, 'variant': None}
+                doc_table.append({'url': product['url'], 'product_id': id_var['id'], 'variant': id_var['variant'], 'offset': offset, 'length': len(line)})
+                offset += len(line)
+                reviews.append(review_entry(product))
+                for field in self.fields:
+                    # Même analyseur que l'indexeur et les requêtes, positions à partir de 0 comme dans index_json/
+                    for position, token in enumerate(analyzer.tokenize(product.get(field, ''))):
+                        field_indexes[field].setdefault(token, {}).setdefault(doc_id, []).append(position)
+
+        fields = {field: (field_index, build_delta_statistics(field_index, len(products))) for field, field_index in field_indexes.items()}
+        SegmentWriter(path, self.codec).write(doc_table, fields)
+        with open(os.path.join(path, 'reviews_index.json'), 'w', encoding='utf-8') as f:
+            json.dump(reviews, f, ensure_ascii=False)
+        with open(os.path.join(path, 'static_scores.json'), 'w', encoding='utf-8') as f:
+            json.dump(Index.build_static_scores(reviews), f, ensure_ascii=False)
+
+
+    def apply(self, products=(), deleted_urls=()):
+        """Adds, changes and deletes products, keyed by url.
+
+        A product whose url is already indexed replaces it: the old document is marked as deleted
+        and the product gets a new document ID.
+
+        Args:
+            products (list): Added or changed products
+            deleted_urls (list): Urls of the deleted products
+
+        Returns:
+            int: Generation of the index after the update
+        """
+        with self.lock:
+            manifest = self.read_manifest()
+            bitmap = self.read_deleted(manifest)
+            urls = self.live_urls(manifest, bitmap)
+
+            products = list({product['url']: product for product in products}.values())
+            bitmap += bytearray(max(0, (manifest['next_doc_id'] + len(products) + 7) // 8 - len(bitmap)))
+            for url in list(deleted_urls) + [product['url'] for product in products]:
+                if url in urls:
+                    doc_id = urls[url]
+                    bitmap[doc_id >> 3] |= 1 << (doc_id & 7)
+
+            generation = manifest['generation'] + 1
+            if products:
+                name = f"segment_{generation}"
+                self.write_segment(name, products)
+                manifest['segments'].append({'path': name, 'first_doc_id': manifest['next_doc_id'], 'number_of_documents': len(products)})
+                manifest['next_doc_id'] += len(products)
+
+            self.save_manifest(manifest, bitmap, generation)
+
+        if len(manifest['segments']) > self.max_segments:
+            self.compact_in_background()
+        return generation
+
+
+    def save_manifest(self, manifest, bitmap, generation):
+        """Writes the deletion bitmap of a generation, then the manifest pointing to it.
+        """
+        os.makedirs(self.updates_path, exist_ok=True)
+        # Les segments retirés déjà supprimés par le moteur de recherche ne sont plus listés
+        manifest['retired'] = [entry for entry in manifest.get('retired', [])
+                               if os.path.isdir(os.path.join(self.updates_path, entry['path']))]
+        previous = manifest['deleted']
+        manifest['deleted'] = f"deleted_{generation}.bin"
+        manifest['generation'] = generation
+        with open(os.path.join(self.updates_path, manifest['deleted']), 'wb') as f:
+            f.write(bytes(bitmap))
+        self.write_manifest(manifest)
+        if previous is not None and previous != manifest['deleted']:
+            os.remove(os.path.join(self.updates_path, previous))
+
+
+    def compact(self):
+        """Merges the update segments into a single one.
+
+        Document IDs do not change: the products deleted since they were added are left as holes.
+        The search engine keeps reading the old segments until it sees the new manifest, which lists
+        them as retired: they are deleted when the engine releases them.
+
+        Returns:
+            bool: Whether segments were merged
+        """
+        with self.lock:
+            manifest = self.read_manifest()
+            if len(manifest['segments']) < 2:
+                return False
+            bitmap = self.read_deleted(manifest)
+            first_doc_id = manifest['segments'][0]['first_doc_id']
+
+            products = []
+            for layer in self.layers(manifest):
+                segment_doc_table = layer['segment'].doc_table
+                with open(layer['products_path'], 'rb') as f:
+                    for doc_id in range(len(segment_doc_table)):
+                        global_doc_id = layer['first_doc_id'] + doc_id
+                        entry = segment_doc_table[doc_id]
+                        if bitmap[global_doc_id >> 3] & (1 << (global_doc_id & 7)) or entry['length'] == 0:
+                            products.append(None)
+                            continue
+                        f.seek(entry['offset'])
+                        products.append(json.loads(f.read(entry['length'])))
+
+            generation = manifest['generation'] + 1
+            name = f"segment_{generation}"
+            self.write_segment(name, products)
+            old_segments = [entry['path'] for entry in manifest['segments']]
+            manifest['segments'] = [{'path': name, 'first_doc_id': first_doc_id, 'number_of_documents': len(products)}]
+            manifest['retired'] = manifest.get('retired', []) + [{'path': path, 'generation': generation} for path in old_segments]
+            self.save_manifest(manifest, bitmap, generation)
+
+            for old_segment in old_segments:
+                self.close_segment(old_segment)
+        return True
+
+
+    def compact_in_background(self):
+        """Starts the compaction in a thread, unless one is already running.
+
+        Returns:
+            threading.Thread: The compaction thread
+        """
+        if self.compaction is None or not self.compaction.is_alive():
+            self.compaction = threading.Thread(target=self.compact)
+            self.compaction.start()
+        return self.compaction
+
+
+class LayeredIndex(Mapping):
+    def __init__(self, base, layers, deleted):
+        """Positional index of a field merging the base index and the update segments.
+
+        Args:
+            base (Mapping): Base index mapping tokens to {doc_id: [positions]}
+            layers (list): (first_doc_id, index of the update segment) pairs
+            deleted (set): Deleted document IDs
+        """
+        self.base = base
+        self.layers = layers
+        self.deleted = deleted
+        self.cache = {}
+        self.length = None
+
+
+    def __getitem__(self, term):
+        if term not in self.cache:
+            postings = {}
+            if term in self.base:
+                postings = {doc_id: positions for doc_id, positions in self.base[term].items() if doc_id not in self.deleted}
+            for first_doc_id, index in self.layers:
+                if term in index:
+                    for doc_id, positions in index[term].items():
+                        if first_doc_id + doc_id not in self.deleted:
+                            postings[first_doc_id + doc_id] = positions
+            self.cache[term] = postings
+        if len(self.cache[term]) == 0:
+            raise KeyError(term)
+        return self.cache[term]
+
+
+    def __contains__(self, term):
+        try:
+            self[term]
+        except KeyError:
+            return False
+        return True
+
+
+    @staticmethod
+    def sorted_terms(index):
+        """Tokens of an index in sorted order with their number of documents, read from the term
+        dictionary of a segment without decoding the postings.
+        """
+        if isinstance(index, TermView):
+            return ((term, entry[2]) for term, entry in index.field.term_entries())
+        return ((term, len(index[term])) for term in sorted(index))
+
+
+    def __iter__(self):
+        """Iterates over the tokens in sorted order, merging the term dictionaries of the base index
+        and of the update segments.
+
+        Only the postings of a token found in no more documents than the deleted ones are decoded,
+        to check that one of them is still live.
+        """
+        sources = [self.sorted_terms(self.base)] + [self.sorted_terms(index) for _, index in self.layers]
+        merged = heapq.merge(*sources, key=lambda item: item[0])
+        for term, group in itertools.groupby(merged, key=lambda item: item[0]):
+            if sum(count for _, count in group) > len(self.deleted) or term in self:
+                yield term
+
+
+    def __len__(self):
+        if self.length is None:
+            self.length = sum(1 for _ in self)
+        return self.length
+
+
+class LayeredDocTable:
+    def __init__(self, base, layers):
+        """Doc table of the base documents followed by the ones of the update segments.
+
+        The entries of the update segments hold the path of their records ('products_path').
+        """
+        self.base = base
+        self.layers = layers
+
+
+    def __len__(self):
+        if self.layers:
+            last = self.layers[-1]
+            return last['first_doc_id'] + len(last['segment'].doc_table)
+        return len(self.base)
+
+
+    def __getitem__(self, doc_id):
+        if doc_id < len(self.base):
+            return self.base[doc_id]
+        for layer in reversed(self.layers):
+            if doc_id >= layer['first_doc_id']:
+                entry = dict(layer['segment'].doc_table[doc_id - layer['first_doc_id']])
+                entry['products_path'] = layer['products_path']
+                return entry
+        raise IndexError(doc_id)
+
+
+def layered_statistics(base, index, layers, field, deleted):
+    """BM25 statistics of a field over the base documents and the update segments, deleted ones excluded.
+
+    Args:
+        base (dict): Statistics of the base index
+        index (LayeredIndex): Merged index of the field
+        layers (list): Update segments, with their first document ID
+        field (str): Field name
+        deleted (set): Deleted document IDs
+
+    Returns:
+        dict: N, average document length, document lengths, document order, document frequencies
+            and term frequencies
+    """
+    doc_lengths = list(base['doc_lengths'])
+    doc_order = [doc_id for doc_id in base['doc_order'] if doc_id not in deleted]
+    for layer in layers:
+        statistics = layer['segment'].fields[field].statistics
+        doc_lengths += [0] * (layer['first_doc_id'] - len(doc_lengths)) + list(statistics['doc_lengths'])
+        doc_order += [layer['first_doc_id'] + doc_id for doc_id in statistics['doc_order'] if layer['first_doc_id'] + doc_id not in deleted]
+    N = len(doc_order)
+    return {
+        'N': N,
+        'avg_doc_length': sum(doc_lengths[doc_id] for doc_id in doc_order) / N if N > 0 else 1,
+        'doc_lengths': doc_lengths,
+        'doc_order': doc_order,
+        'document_frequencies': TermMap(index, len),
+        'term_frequencies': TermMap(index, lambda postings: {doc_id: len(positions) for doc_id, positions in postings.items()})
+    }
+
+
+class TermMap(Mapping):
+    def __init__(self, index, function):
+        """Value computed from the postings of each token of a merged index.
+        """
+        self.index = index
+        self.function = function
+
+
+    def __getitem__(self, term):
+        return self.function(self.index[term])
+
+
+    def __contains__(self, term):
+        return term in self.index
+
+
+    def __iter__(self):
+        return iter(self.index)
+
+
+    def __len__(self):
+        return len(self.index)
@@ -1,17 +1,26 @@
 import json
+import os
+import math
+import shutil
+from concurrent.futures import ProcessPoolExecutor
 from urllib.parse import urlparse, parse_qs
-from nltk.corpus import stopwords
-from nltk import download
+from analyzer import analyzer, PUNCTUATION
+from segment import SegmentWriter, Segment
+from spimi import POSTING_SIZE, write_run, merge_runs
 
 class index:
     def __init__(self, file_path='products.jsonl'):
         self.data = []
+        self.offsets = []
+        self.doc_table = []
         if file_path:
             self.data = self.parse_jsonl(file_path)
 
     def parse_jsonl(self, file_path):
         """Reads a JSONL file and returns a list of dictionaries.
 
+        The byte offset and length of each record are kept in self.offsets, in the same order.
+
         Args:
             file_path (str): Path to the JSONL file
         
@@ -19,13 +28,37 @@ class index:
             list: A list of JSON objects
         """
         data = []
-        with open(file_path, 'r', encoding='utf-8') as file:
+        self.offsets = []
+        for record, offset, length in self.iter_jsonl(file_path):
+            data.append(record)
+            self.offsets.append((offset, length))
+        return data
+
+    @staticmethod
+    def iter_jsonl(file_path, start=0, end=None):
+        """Reads a JSONL file one record at a time, without keeping the previous ones in memory.
+
+        Args:
+            file_path (str): Path to the JSONL file
+            start (int): Byte offset of the first line read, at the start of a line
+            end (int): Byte offset where reading stops, None to read until the end of the file
+
+        Yields:
+            tuple: The JSON object, and the byte offset and length of its line
+        """
+        offset = start
+        with open(file_path, 'rb') as file:
+            file.seek(start)
             for line in file:
+                if end is not None and offset >= end:
+                    break
                 try:
-                    data.append(json.loads(line))
+                    record = json.loads(line)
                 except json.JSONDecodeError as e:
-                    print(f"Erreur de décodage JSON sur la ligne: {line.strip()}\nErreur: {e}")
-        return data
+                    print(f"Erreur de décodage JSON sur la ligne: {line.decode('utf-8', errors='replace').strip()}\nErreur: {e}")
+                else:
+                    yield record, offset, len(line)
+                offset += len(line)
     
     @staticmethod
     def return_id_var(url):
@@ -41,7 +74,7 @@ class index:
             return {"id": 0, "variant": None}
         parsed_url = urlparse(url)
         
-        if parsed_url.netloc != "web-scraping.dev" or not parsed_url.path.startswith("/products/"):
+        if parsed_url.netloc != "web-scraping.dev" or not parsed_url.path.startswith(("/products/", "/product/")):
             return None
         
         path_parts = parsed_url.path.split('/')
@@ -55,7 +88,7 @@ class index:
 
     @staticmethod
     def tokenize(text):
-        """Tokenizes and filters stopwords from text.
+        """Tokenizes, normalizes and filters stopwords from text with the shared analyzer.
 
             Args:
                 char (char): char
@@ -63,28 +96,24 @@ class index:
             Returns:
                 list: list of filtered tokens
             """
-        download('stopwords')
-        stop_words = set(stopwords.words('english'))
-        tokens = text.split()
-        return [token for token in tokens if token.lower() not in stop_words]
+        return analyzer.tokenize(text)
     
     def build_inverted_index_title(self):
         """
         Builds an inverted index for product title.
         
         Returns:
-            dict: An inverted index mapping tokens to document IDs.
+            dict: An inverted index mapping tokens to document IDs (positions in the doc table).
         """
         inverted_index = {}
         
         for i in range(len(self.data)):
             char = self.data[i]['title']
             filtered_tokens = self.tokenize(char)
-            url = self.data[i]['url']
             for token in filtered_tokens:
                 if token not in inverted_index:
                     inverted_index[token] = []
-                inverted_index[token].append(url)
+                inverted_index[token].append(i)
         return inverted_index
     
 
@@ -93,18 +122,17 @@ class index:
         Builds an inverted index for product description.
         
         Returns:
-            dict: An inverted index mapping tokens to document IDs.
+            dict: An inverted index mapping tokens to document IDs (positions in the doc table).
         """
         inverted_index = {}
         
         for i in range(len(self.data)):
             char = self.data[i]['description']
             filtered_tokens = self.tokenize(char)
-            url = self.data[i]['url']
             for token in filtered_tokens:
                 if token not in inverted_index:
                     inverted_index[token] = []
-                inverted_index[token].append(url)
+                inverted_index[token].append(i)
         return inverted_index
     
     
@@ -113,21 +141,64 @@ class index:
         Builds an index for reviews.
         
         Returns:
-            dict: An index for reviews for each product.
+            list: Reviews of each product, indexed by document ID, in the format of
+                index_json/reviews_index.json read by the search engine.
         """
-        index = {}
+        index = []
         
         for i in range(len(self.data)):
-            mean = 0
-            total = len(self.data[i]['product_reviews'])
-            last_rating = 0
-            for j in range(total):
-                mean += self.data[i]['product_reviews'][j]['rating'] / total
-                if j == total - 1:
-                    last_rating = self.data[i]['product_reviews'][j]['rating']
-            index[self.data[i]['url']] = {'mean': mean, 'total': total, 'last_rating': last_rating}
+            index.append(self.review_entry(self.data[i]['product_reviews']))
 
         return index
+
+
+    @staticmethod
+    def review_entry(reviews):
+        """Number of reviews, mean mark and last rating of a product.
+
+        Args:
+            reviews (list): Reviews of the product.
+
+        Returns:
+            dict: 'total_reviews', 'mean_mark' and 'last_rating', as in index_json/reviews_index.json.
+        """
+        ratings = [review['rating'] for review in reviews]
+        return {
+            'total_reviews': len(ratings),
+            'mean_mark': sum(ratings) / len(ratings) if ratings else 0,
+            'last_rating': ratings[-1] if ratings else 0
+        }
+
+
+    @staticmethod
+    def static_score(reviews):
+        """Static quality score of a document, from its reviews and independent of the request.
+
+        Args:
+            reviews (dict): Entry of the reviews index, None for a document without one.
+
+        Returns:
+            float: (mean * total + last) * log(1 + total) / (total + 1), None without reviews entry.
+        """
+        if reviews is None:
+            return None
+        mean = reviews.get("mean_mark", 0)
+        total_reviews = reviews.get("total_reviews", 0)
+        last = reviews.get("last_rating", 0)
+        return (mean * total_reviews + last) * math.log(1 + total_reviews) / (total_reviews + 1)
+
+
+    @classmethod
+    def build_static_scores(cls, reviews_index):
+        """Builds the dense array of the static scores of the documents.
+
+        Args:
+            reviews_index (list): Reviews index, indexed by document ID.
+
+        Returns:
+            list: Static score of each document ID, None for the documents without reviews entry.
+        """
+        return [cls.static_score(reviews) for reviews in reviews_index]
     
     def build_inverted_index_features(self, list_features=['brand', 'made in']):
         """
@@ -151,12 +222,11 @@ class index:
                 if feature in self.data[i]['product_features']:
                     char = self.data[i]['product_features'][feature]
                     filtered_tokens = self.tokenize(char)
-                    url = self.data[i]['url']
 
                     for token in filtered_tokens:
                         if token not in inverted_index:
                             inverted_index[token] = []
-                        inverted_index[token].append(url)
+                        inverted_index[token].append(i)
                 else:
                     # Si la clé n'existe pas, afficher un message (optionnel) ou ignorer
                     print(f"Clé '{feature}' introuvable pour l'élément {self.data[i]['url']}")
@@ -181,37 +251,700 @@ class index:
 
             char = self.data[i]['title']
             filtered_tokens = self.tokenize(char)
-            url = self.data[i]['url']
 
             for position, token in enumerate(filtered_tokens):
                 if token not in inverted_index:
                     inverted_index[token] = []
-                inverted_index[token].append((url, position + 1))
+                inverted_index[token].append((i, position + 1))
 
 
             char = self.data[i]['description']
             filtered_tokens = self.tokenize(char)
-            url = self.data[i]['url']
 
             for position, token in enumerate(filtered_tokens):
                 if token not in inverted_index:
                     inverted_index[token] = []
-                inverted_index[token].append((url, position + 1))
+                inverted_index[token].append((i, position + 1))
 
 
         return inverted_index
 
 
+    @staticmethod
+    def new_indexes(list_features=['brand', 'made in']):
+        """Returns the empty title, description, review, features and position indexes.
+
+        Args:
+            list_features (list): List of product features.
+
+        Returns:
+            dict: The indexes, under the names of their JSON files.
+        """
+        return {
+            "inverted_index_title": {},
+            "inverted_index_description": {},
+            "index_review": [],
+            "inverted_index_features": {feature: {} for feature in list_features},
+            "inverted_index_position": {}
+        }
+
+
+    def index_document(self, indexes, i, document, list_features=['brand', 'made in']):
+        """Adds a document to the indexes returned by new_indexes.
+
+        Each field of the document is tokenized once, and its tokens feed every index using that field.
+
+        Args:
+            indexes (dict): Indexes returned by new_indexes.
+            i (int): Document ID.
+            document (dict): Product.
+            list_features (list): List of product features.
+
+        Returns:
+            int: Number of tokens indexed.
+        """
+        position_index = indexes["inverted_index_position"]
+        number_of_tokens = 0
+
+        for field in ('title', 'description'):
+            field_index = indexes[f"inverted_index_{field}"]
+            # Les pages du crawler n'ont pas de description : leur premier paragraphe en tient lieu
+            filtered_tokens = self.tokenize(document.get(field, document.get('first_paragraph', '')) or '')
+            for position, token in enumerate(filtered_tokens):
+                if token not in field_index:
+                    field_index[token] = []
+                field_index[token].append(i)
+                if token not in position_index:
+                    position_index[token] = []
+                position_index[token].append((i, position + 1))
+            number_of_tokens += len(filtered_tokens)
+
+        product_features = document.get('product_features', {})
+        for feature in list_features:
+            if feature in product_features:
+                inverted_index = indexes["inverted_index_features"][feature]
+                filtered_tokens = self.tokenize(product_features[feature])
+                for token in filtered_tokens:
+                    if token not in inverted_index:
+                        inverted_index[token] = []
+                    inverted_index[token].append(i)
+                number_of_tokens += len(filtered_tokens)
+            else:
+                print(f"Clé '{feature}' introuvable pour l'élément {document['url']}")
+
+        indexes["index_review"].append(self.review_entry(document.get('product_reviews', [])))
+
+        return number_of_tokens
+
+
+    def build_all_indexes(self, list_features=['brand', 'made in']):
+        """
+        Builds the title, description, review, features and position indexes in a single pass.
+
+        The indexes are identical to the ones of the separate build_* methods.
+
+        Args:
+            list_features (list): List of product features.
+
+        Returns:
+            dict: The indexes, under the names of their JSON files.
+        """
+        indexes = self.new_indexes(list_features)
+        for i in range(len(self.data)):
+            self.index_document(indexes, i, self.data[i], list_features)
+        return indexes
+
+
+    def build_indexes_streaming(self, file_path='products.jsonl', memory_limit=None, folder_path='.', list_features=['brand', 'made in']):
+        """Builds and saves the indexes from a JSONL file read one record at a time (SPIMI).
+
+        The partial indexes in memory are flushed to a run on disk each time their estimated size
+        reaches memory_limit. The runs are then merged, with a k-way merge of their tokens, into the
+        same JSON files as save_indexes. Only the doc table stays in memory (self.doc_table).
+
+        Args:
+            file_path (str): Path to the JSONL file.
+            memory_limit (int): Memory budget of the partial indexes in bytes, None for no limit.
+            folder_path (str): Destination folder of the JSON files.
+            list_features (list): List of product features.
+
+        Returns:
+            int: Number of runs written.
+        """
+        run_folder = os.path.join(folder_path, 'runs')
+        run_paths = []
+        indexes = self.new_indexes(list_features)
+        used_memory = 0
+        self.doc_table = []
+
+        for i, (document, offset, length) in enumerate(self.iter_jsonl(file_path)):
+            used_memory += self.index_document(indexes, i, document, list_features) * POSTING_SIZE
+            self.doc_table.append(self.doc_table_entry(document['url'], offset, length))
+            if memory_limit is not None and used_memory >= memory_limit:
+                run_paths.append(write_run(os.path.join(run_folder, f"run_{len(run_paths)}"), len(run_paths), indexes))
+                indexes = self.new_indexes(list_features)
+                used_memory = 0
+
+        if used_memory > 0 or len(run_paths) == 0:
+            run_paths.append(write_run(os.path.join(run_folder, f"run_{len(run_paths)}"), len(run_paths), indexes))
+
+        merge_runs(run_paths, folder_path, self.new_indexes(list_features))
+        with open(os.path.join(folder_path, "doc_table.json"), "w", encoding="utf-8") as f:
+            json.dump(self.doc_table, f, ensure_ascii=False, indent=4)
+        shutil.rmtree(run_folder)
+        return len(run_paths)
+
+
+    @staticmethod
+    def shard_ranges(file_path, number_of_shards):
+        """Splits a JSONL file into byte ranges of about the same size, each starting at a line start.
+
+        Args:
+            file_path (str): Path to the JSONL file.
+            number_of_shards (int): Number of ranges wanted.
+
+        Returns:
+            list: (start, end) byte offsets of each non-empty range, in the order of the file.
+        """
+        size = os.path.getsize(file_path)
+        boundaries = [0]
+        with open(file_path, 'rb') as file:
+            for k in range(1, number_of_shards):
+                file.seek(max(size * k // number_of_shards - 1, boundaries[-1]))
+                file.readline()
+                boundaries.append(max(file.tell(), boundaries[-1]))
+        boundaries.append(size)
+        return [(start, end) for start, end in zip(boundaries, boundaries[1:]) if end > start]
+
+
+    def build_indexes_parallel(self, file_path='products.jsonl', workers=None, folder_path='.', list_features=['brand', 'made in']):
+        """Builds and saves the indexes with several processes.
+
+        The JSONL file is split into byte ranges, one per worker. Each worker indexes its range into a
+        run, with document IDs starting at 0, and the runs are merged with a k-way merge that shifts
+        the document IDs of each run by the number of documents of the previous ones. The JSON files
+        are byte-identical to the ones of save_indexes.
+
+        Args:
+            file_path (str): Path to the JSONL file.
+            workers (int): Number of processes, os.cpu_count() if None.
+            folder_path (str): Destination folder of the JSON files.
+            list_features (list): List of product features.
+
+        Returns:
+            int: Number of shards.
+        """
+        workers = workers or os.cpu_count()
+        run_folder = os.path.join(folder_path, 'runs')
+        ranges = self.shard_ranges(file_path, workers)
+        run_paths = [os.path.join(run_folder, f"shard_{k}") for k in range(len(ranges))]
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(build_shard, file_path, start, end, run_paths[k], k, list_features)
+                for k, (start, end) in enumerate(ranges)
+            ]
+            doc_tables = [future.result() for future in futures]
+
+        self.doc_table = []
+        doc_id_offsets = []
+        for doc_table in doc_tables:
+            doc_id_offsets.append(len(self.doc_table))
+            self.doc_table += doc_table
+
+        if len(run_paths) == 0:
+            run_paths.append(write_run(os.path.join(run_folder, "shard_0"), 0, self.new_indexes(list_features)))
+            doc_id_offsets.append(0)
+
+        merge_runs(run_paths, folder_path, self.new_indexes(list_features), doc_id_offsets=doc_id_offsets)
+        with open(os.path.join(folder_path, "doc_table.json"), "w", encoding="utf-8") as f:
+            json.dump(self.doc_table, f, ensure_ascii=False, indent=4)
+        shutil.rmtree(run_folder)
+        return len(ranges)
+
+
+    def build_doc_table(self):
+        """
+        Builds the doc table: the position of a product in the table is its document ID.
+
+        Without loaded products, returns the doc table kept by build_indexes_streaming.
+
+        Returns:
+            list: For each document, its url, product ID and variant, and the byte offset and length
+                of its record in the JSONL file (to read its title and description).
+        """
+        if len(self.data) == 0:
+            return self.doc_table
+
+        doc_table = []
+        for i in range(len(self.data)):
+            offset, length = self.offsets[i]
+            doc_table.append(self.doc_table_entry(self.data[i]['url'], offset, length))
+        return doc_table
+
+
+    @classmethod
+    def doc_table_entry(cls, url, offset, length):
+        """Entry of a document in the doc table.
+
+        Args:
+            url (str): Product URL.
+            offset (int): Byte offset of the record in the JSONL file.
+            length (int): Byte length of the record.
+
+        Returns:
+            dict
+        """
+        id_var = cls.return_id_var(url) or {'id': None, 'variant': None}
+        return {
+            'url': url,
+            'product_id': id_var['id'],
+            'variant': id_var['variant'],
+            'offset': offset,
+            'length': length
+        }
+
+
+    def save_doc_table(self, folder_path='.', doc_table=None):
+        """Saves the doc table in 'doc_table.json'.
+
+        Args:
+            folder_path (str): Destination folder.
+            doc_table (list): Doc table to save, the one of the products (build_doc_table) if None.
+        """
+        if doc_table is None:
+            doc_table = self.build_doc_table()
+        with open(os.path.join(folder_path, "doc_table.json"), "w", encoding="utf-8") as f:
+            json.dump(doc_table, f, ensure_ascii=False)
+
+
+    @staticmethod
+    def uses_doc_ids(index):
+        """Checks whether an index already references the documents by ID rather than by url.
+
+        Args:
+            index (dict or list): A loaded JSON index.
+
+        Returns:
+            bool
+        """
+        if isinstance(index, list):
+            return True
+        for postings in index.values():
+            if isinstance(postings, dict):
+                return False
+            if len(postings) > 0:
+                return not isinstance(postings[0], str)
+        return True
+
+
+    def convert_indexes_to_doc_ids(self, folder_path='index_json/'):
+        """Replaces the urls of the indexes of a folder by the document IDs of the doc table.
+
+        Positional indexes ('{field}_index.json') become {token: [[doc_id, [positions]], ...]} in the
+        same order, feature indexes {value: [doc_id, ...]} and the reviews index a list indexed by
+        document ID. Indexes already converted are left unchanged.
+
+        Args:
+            folder_path (str): Folder containing the JSON indexes.
+        """
+        doc_ids = {entry['url']: i for i, entry in enumerate(self.build_doc_table())}
+
+        for json_file in sorted(os.listdir(folder_path)):
+            name = os.path.splitext(json_file)[0]
+            if not json_file.endswith('_index.json'):
+                continue
+            with open(os.path.join(folder_path, json_file), "r", encoding="utf-8") as f:
+                index = json.load(f)
+
+            if self.uses_doc_ids(index):
+                continue
+
+            unknown = set()
+            if name == 'reviews_index':
+                converted = [None] * len(doc_ids)
+                for url, reviews in index.items():
+                    if url in doc_ids:
+                        converted[doc_ids[url]] = reviews
+                    else:
+                        unknown.add(url)
+            else:
+                converted = {}
+                for token, urls in index.items():
+                    postings = []
+                    for url in urls:
+                        if url not in doc_ids:
+                            unknown.add(url)
+                        elif isinstance(urls, dict):
+                            postings.append([doc_ids[url], urls[url]])
+                        else:
+                            postings.append(doc_ids[url])
+                    converted[token] = postings
+
+            for url in sorted(unknown):
+                print(f"URL {url} absente de la table des documents ({json_file})")
+
+            with open(os.path.join(folder_path, json_file), "w", encoding="utf-8") as f:
+                json.dump(converted, f, ensure_ascii=False)
+
+
+    @staticmethod
+    def load_folder_indexes(folder_path='index_json/'):
+        """Loads the '*_index.json' files of a folder.
+
+        Args:
+            folder_path (str): Folder containing the JSON indexes.
+
+        Returns:
+            dict: The indexes, by name of their JSON file.
+        """
+        indexes = {}
+        for json_file in sorted(os.listdir(folder_path)):
+            if json_file.endswith('_index.json'):
+                with open(os.path.join(folder_path, json_file), "r", encoding="utf-8") as f:
+                    indexes[os.path.splitext(json_file)[0]] = json.load(f)
+        return indexes
+
+
+    @staticmethod
+    def indexed_documents(indexes):
+        """Returns the document IDs found in the indexes of a folder (postings or reviews entry).
+
+        Args:
+            indexes (dict): Indexes returned by load_folder_indexes.
+
+        Returns:
+            set
+        """
+        doc_ids = set()
+        for index in indexes.values():
+            if isinstance(index, list):
+                doc_ids.update(doc_id for doc_id, entry in enumerate(index) if entry is not None)
+                continue
+            for postings in index.values():
+                doc_ids.update(posting[0] if isinstance(posting, list) else posting for posting in postings)
+        return doc_ids
+
+
+    @staticmethod
+    def remove_documents(indexes, doc_ids):
+        """Removes documents from the indexes of a folder, in place.
+
+        Args:
+            indexes (dict): Indexes returned by load_folder_indexes.
+            doc_ids (set): Document IDs to remove.
+        """
+        for name, index in indexes.items():
+            if isinstance(index, list):
+                for doc_id in doc_ids:
+                    if doc_id < len(index):
+                        index[doc_id] = None
+                continue
+            for token in list(index):
+                postings = [posting for posting in index[token]
+                            if (posting[0] if isinstance(posting, list) else posting) not in doc_ids]
+                if postings:
+                    index[token] = postings
+                else:
+                    del index[token]
+
+
+    def add_document(self, indexes, doc_id, document, fields=['title', 'description']):
+        """Adds a product to the indexes of a folder, in place.
+
+        The fields are tokenized with the shared analyzer, positions starting at 0 as in index_json/.
+        Brands and origins are lowercased like the facet values of the search engine.
+
+        Args:
+            indexes (dict): Indexes returned by load_folder_indexes.
+            doc_id (int): Document ID of the product.
+            document (dict): Product.
+            fields (list): List of indexed fields.
+        """
+        for field in fields:
+            positions = {}
+            # Les pages du crawler n'ont pas de description : leur premier paragraphe en tient lieu
+            for position, token in enumerate(self.tokenize(document.get(field, document.get('first_paragraph', '')) or '')):
+                positions.setdefault(token, []).append(position)
+            field_index = indexes.setdefault(f"{field}_index", {})
+            for token, token_positions in positions.items():
+                field_index.setdefault(token, []).append([doc_id, token_positions])
+
+        features = document.get('product_features', {})
+        values = {
+            'brand_index': "".join(features['brand'].lower().split()) if 'brand' in features else None,
+            'origin_index': " ".join(features['made in'].lower().split()) if 'made in' in features else None,
+            'domain_index': urlparse(document['url']).netloc.lower().translate(PUNCTUATION)
+        }
+        for name, value in values.items():
+            if value:
+                indexes.setdefault(name, {}).setdefault(value, []).append(doc_id)
+
+        reviews_index = indexes.setdefault('reviews_index', [])
+        reviews_index += [None] * (doc_id + 1 - len(reviews_index))
+        reviews_index[doc_id] = self.review_entry(document.get('product_reviews', []))
+
+
+    def update_indexes(self, file_path='products.jsonl', folder_path='index_json/', fields=['title', 'description']):
+        """Aligns the indexes of a folder and their doc table with the products of the JSONL file.
+
+        The first time, the urls of the indexes are replaced by the document IDs of the products, in
+        the order of the file (convert_indexes_to_doc_ids). Once the indexes use document IDs, the
+        saved doc table is kept: its documents keep their ID (with the offset of their record in the
+        file), the products added to the file get the next IDs, and the ones removed from it are left
+        as holes (an empty url) and removed from every index. The products missing from the indexes
+        are then indexed (add_document).
+
+        Args:
+            file_path (str): Path to the JSONL file of the products.
+            folder_path (str): Folder containing the JSON indexes.
+            fields (list): List of indexed fields.
+
+        Returns:
+            dict: The doc table and the indexes of the folder, by name of their JSON file.
+        """
+        products = self.build_doc_table()
+        doc_table_path = os.path.join(folder_path, "doc_table.json")
+        indexes = self.load_folder_indexes(folder_path)
+
+        if not os.path.exists(doc_table_path) or not all(self.uses_doc_ids(index) for index in indexes.values()):
+            doc_table = products
+            self.save_doc_table(folder_path, doc_table)
+            self.convert_indexes_to_doc_ids(folder_path)
+            indexes = self.load_folder_indexes(folder_path)
+        else:
+            with open(doc_table_path, "r", encoding="utf-8") as f:
+                previous = json.load(f)
+            doc_ids = {entry['url']: doc_id for doc_id, entry in enumerate(previous) if entry['url']}
+            doc_table = [self.doc_table_entry('', 0, 0) for _ in previous]
+            for entry in products:
+                if entry['url'] not in doc_ids:
+                    doc_ids[entry['url']] = len(doc_table)
+                    doc_table.append(entry)
+                elif not doc_table[doc_ids[entry['url']]]['url']:
+                    doc_table[doc_ids[entry['url']]] = entry
+            self.remove_documents(indexes, {doc_id for doc_id, entry in enumerate(doc_table) if not entry['url']})
+
+        indexed = self.indexed_documents(indexes)
+        missing = [doc_id for doc_id, entry in enumerate(doc_table) if entry['url'] and doc_id not in indexed]
+        if missing:
+            print(f"{len(missing)} produit(s) ajouté(s) aux index")
+            with open(file_path, 'rb') as file:
+                for doc_id in missing:
+                    file.seek(doc_table[doc_id]['offset'])
+                    self.add_document(indexes, doc_id, json.loads(file.read(doc_table[doc_id]['length'])), fields)
+        if 'reviews_index' in indexes:
+            indexes['reviews_index'] += [None] * (len(doc_table) - len(indexes['reviews_index']))
+
+        for name, index in indexes.items():
+            with open(os.path.join(folder_path, f"{name}.json"), "w", encoding="utf-8") as f:
+                json.dump(index, f, ensure_ascii=False)
+        self.save_doc_table(folder_path, doc_table)
+        indexes['doc_table'] = doc_table
+        return indexes
+
+
+    @staticmethod
+    def build_field_statistics(field_index, number_of_documents, k1=1.5, b=0.75):
+        """
+        Builds the BM25 statistics of a positional field index.
+
+        Args:
+            field_index (dict): An index mapping tokens to [[doc_id, [positions]], ...].
+            number_of_documents (int): Number of documents of the doc table.
+            k1 (float): BM25 parameter used for the maximum term weights.
+            b (float): BM25 parameter used for the maximum term weights.
+
+        Returns:
+            dict: Number of documents, average document length, length of each document (0 when
+                absent from the field), documents in order of first appearance, document frequency,
+                term frequencies and maximum term weight of each token.
+        """
+        doc_lengths = [0] * number_of_documents
+        doc_order = []
+        document_frequencies = {}
+        term_frequencies = {}
+
+        for token, postings in field_index.items():
+            document_frequencies[token] = len(postings)
+            term_frequencies[token] = []
+            for doc_id, positions in postings:
+                if doc_lengths[doc_id] == 0:
+                    doc_order.append(doc_id)
+                doc_lengths[doc_id] += len(positions)
+                term_frequencies[token].append([doc_id, len(positions)])
+
+        N = len(doc_order)
+        avg_doc_length = sum(doc_lengths) / N if N > 0 else 1
+
+        # Borne supérieure du score de chaque token (sans l'idf), utilisée pour élaguer le top k
+        max_term_weights = {}
+        for token, postings in field_index.items():
+            max_weight = 0
+            for doc_id, positions in postings:
+                tf = len(positions)
+                weight = tf * (k1 + 1) / (tf + k1 * (1 - b + b * (doc_lengths[doc_id] / avg_doc_length)))
+                weight *= 1 + (1 / (1 + math.log(positions[0] + 1)))
+                max_weight = max(max_weight, weight)
+            max_term_weights[token] = max_weight
+
+        return {
+            'N': N,
+            'avg_doc_length': avg_doc_length,
+            'doc_lengths': doc_lengths,
+            'doc_order': doc_order,
+            'document_frequencies': document_frequencies,
+            'term_frequencies': term_frequencies,
+            'k1': k1,
+            'b': b,
+            'max_term_weights': max_term_weights
+        }
+
+
+    def save_field_statistics(self, folder_path='index_json/', fields=['title', 'description'], indexes=None):
+        """Saves the BM25 statistics of each field index next to it, in '{field}_stats.json'.
+
+        Args:
+            folder_path (str): Folder containing the doc table and the '{field}_index.json' files.
+            fields (list): List of indexed fields.
+            indexes (dict): Doc table and indexes returned by update_indexes, from which the statistics
+                are computed instead of the files of the folder. The statistics are added to it, under
+                '{field}_stats'.
+        """
+        if indexes is not None:
+            number_of_documents = len(indexes['doc_table'])
+        else:
+            with open(os.path.join(folder_path, "doc_table.json"), "r", encoding="utf-8") as f:
+                number_of_documents = len(json.load(f))
+
+        for field in fields:
+            file_path = os.path.join(folder_path, f"{field}_index.json")
+            if indexes is not None and f"{field}_index" in indexes:
+                field_index = indexes[f"{field}_index"]
+            else:
+                try:
+                    with open(file_path, "r", encoding="utf-8") as f:
+                        field_index = json.load(f)
+                except FileNotFoundError:
+                    print(f"Fichier {file_path} introuvable.")
+                    continue
+
+            statistics = self.build_field_statistics(field_index, number_of_documents)
+            if indexes is not None:
+                indexes[f"{field}_stats"] = statistics
+            with open(os.path.join(folder_path, f"{field}_stats.json"), "w", encoding="utf-8") as f:
+                json.dump(statistics, f, ensure_ascii=False)
+
+
+    def save_static_scores(self, folder_path='index_json/'):
+        """Saves the static score of each document next to the doc table, in 'static_scores.json'.
+
+        The search engine reads one float per document instead of computing it from the reviews.
+
+        Args:
+            folder_path (str): Folder containing 'doc_table.json' and 'reviews_index.json' (by document ID).
+        """
+        with open(os.path.join(folder_path, "doc_table.json"), "r", encoding="utf-8") as f:
+            number_of_documents = len(json.load(f))
+        file_path = os.path.join(folder_path, "reviews_index.json")
+        try:
+            with open(file_path, "r", encoding="utf-8") as f:
+                reviews_index = json.load(f)
+        except FileNotFoundError:
+            print(f"Fichier {file_path} introuvable.")
+            return
+
+        static_scores = self.build_static_scores(reviews_index)
+        static_scores += [None] * (number_of_documents - len(static_scores))
+        with open(os.path.join(folder_path, "static_scores.json"), "w", encoding="utf-8") as f:
+            json.dump(static_scores, f, ensure_ascii=False)
+
+
+    @staticmethod
+    def read_index_version(folder_path='index_json/'):
+        """Returns the version of the indexes of a folder, read from its 'version' file.
+
+        Args:
+            folder_path (str): Folder of the indexes.
+
+        Returns:
+            int: The version, 0 when the indexes were never versioned
+        """
+        try:
+            with open(os.path.join(folder_path, "version"), "r", encoding="utf-8") as f:
+                return int(f.read())
+        except (FileNotFoundError, ValueError):
+            return 0
+
+
+    @staticmethod
+    def save_index_version(folder_path='index_json/'):
+        """Increments the version of the indexes of a folder, once all of them are saved.
+
+        The file is replaced atomically, so a reader sees either the old or the new version.
+
+        Args:
+            folder_path (str): Folder of the indexes.
+
+        Returns:
+            int: The new version
+        """
+        version = index.read_index_version(folder_path) + 1
+        temporary_path = os.path.join(folder_path, "version.tmp")
+        with open(temporary_path, "w", encoding="utf-8") as f:
+            f.write(str(version))
+        os.replace(temporary_path, os.path.join(folder_path, "version"))
+        return version
+
+
+    def save_segment(self, folder_path='index_json/', segment_path='index_segment/', fields=['title', 'description'], codec='vbyte', indexes=None):
+        """Writes the doc table and the field indexes of a folder, with their statistics, as a binary segment.
+
+        Args:
+            folder_path (str): Folder containing 'doc_table.json', '{field}_index.json' and '{field}_stats.json'.
+            segment_path (str): Destination folder of the segment.
+            fields (list): List of indexed fields.
+            codec (str): Postings codec, 'vbyte' or 'bitpacked'.
+            indexes (dict): Doc table, indexes and statistics returned by update_indexes and
+                save_field_statistics, written instead of the files of the folder.
+        """
+        if indexes is not None:
+            doc_table = indexes['doc_table']
+        else:
+            with open(os.path.join(folder_path, "doc_table.json"), "r", encoding="utf-8") as f:
+                doc_table = json.load(f)
+
+        segment_fields = {}
+        for field in fields:
+            if indexes is not None:
+                field_index = indexes[f"{field}_index"]
+                statistics = indexes.get(f"{field}_stats") or self.build_field_statistics(field_index, len(doc_table))
+            else:
+                with open(os.path.join(folder_path, f"{field}_index.json"), "r", encoding="utf-8") as f:
+                    field_index = json.load(f)
+                with open(os.path.join(folder_path, f"{field}_stats.json"), "r", encoding="utf-8") as f:
+                    statistics = json.load(f)
+            segment_fields[field] = ({token: dict(postings) for token, postings in field_index.items()}, statistics)
+
+        SegmentWriter(segment_path, codec).write(doc_table, segment_fields)
+
+
+    @staticmethod
+    def export_segment(segment_path='index_segment/', folder_path='index_segment/json/'):
+        """Exports a binary segment as JSON files, for debugging.
+
+        Args:
+            segment_path (str): Folder of the segment.
+            folder_path (str): Destination folder of the JSON files.
+        """
+        Segment(segment_path).export_json(folder_path)
+
+
     def save_indexes(self):
         """Saves each index to a separate JSON file."""
-        indexes = {
-            "inverted_index_title": self.build_inverted_index_title(),
-            "inverted_index_description": self.build_inverted_index_description(),
-            "index_review": self.build_index_review(),
-            "inverted_index_features": self.build_inverted_index_features(),
-            "inverted_index_position": self.build_inverted_index_position()
-        }
-        
+        indexes = self.build_all_indexes()
+        indexes["doc_table"] = self.build_doc_table()
+
         for name, index in indexes.items():
             with open(f"{name}.json", "w", encoding="utf-8") as f:
                 json.dump(index, f, ensure_ascii=False, indent=4)
@@ -219,10 +952,36 @@ class index:
     def load_indexes(self):
         """Loads each saved index from JSON files."""
         indexes = {}
-        for name in ["inverted_index_title", "inverted_index_description", "index_review", "inverted_index_features", "inverted_index_position"]:
+        for name in ["inverted_index_title", "inverted_index_description", "index_review", "inverted_index_features", "inverted_index_position", "doc_table"]:
             try:
                 with open(f"{name}.json", "r", encoding="utf-8") as f:
                     indexes[name] = json.load(f)
             except FileNotFoundError:
                 print(f"Fichier {name}.json introuvable.")
         return indexes
+
+
+def build_shard(file_path, start, end, run_path, run_number, list_features=['brand', 'made in']):
+    """Indexes the records of a byte range of a JSONL file into a run, in a worker process.
+
+    Document IDs start at 0 in each shard and are shifted when the runs are merged.
+
+    Args:
+        file_path (str): Path to the JSONL file
+        start (int): Byte offset of the first record of the shard
+        end (int): Byte offset of the end of the shard
+        run_path (str): Folder of the run
+        run_number (int): Position of the shard in the file
+        list_features (list): List of product features
+
+    Returns:
+        list: Doc table of the shard
+    """
+    builder = index(None)
+    indexes = builder.new_indexes(list_features)
+    doc_table = []
+    for i, (document, offset, length) in enumerate(builder.iter_jsonl(file_path, start, end)):
+        builder.index_document(indexes, i, document, list_features)
+        doc_table.append(builder.doc_table_entry(document['url'], offset, length))
+    write_run(run_path, run_number, indexes)
+    return doc_table
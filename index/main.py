@@ -1,17 +1,71 @@
+import argparse
 from index import index as Index
+from incremental import IncrementalIndex
 
-def generate_and_save_indexes(file_path='products.jsonl'):
-    index_instance = Index(file_path)
+def generate_and_save_indexes(file_path='products.jsonl', memory_limit=None, workers=None):
+    """Builds and saves every index.
 
-    print("Génération des index...")
-    inverted_index_title = index_instance.build_inverted_index_title()
-    inverted_index_description = index_instance.build_inverted_index_description()
-    index_review = index_instance.build_index_review()
-    inverted_index_features = index_instance.build_inverted_index_features()
-    inverted_index_position = index_instance.build_inverted_index_position()
+    Args:
+        file_path (str): Path to the JSONL file of the products
+        memory_limit (int): Memory budget of the indexes in MB. When given, the products are read one
+            at a time and the indexes are built by runs flushed to disk then merged.
+        workers (int): Number of processes. When given, the file is split into byte ranges indexed
+            in parallel then merged.
+    """
+    if workers is not None:
+        index_instance = Index(None)
+        print(f"Génération et sauvegarde des index avec {workers} processus...")
+        number_of_shards = index_instance.build_indexes_parallel(file_path, workers)
+        print(f"{number_of_shards} partie(s) fusionnée(s)")
+    elif memory_limit is None:
+        index_instance = Index(file_path)
+        print("Génération et sauvegarde des index...")
+        index_instance.save_indexes()
+    else:
+        index_instance = Index(None)
+        print(f"Génération et sauvegarde des index par blocs de {memory_limit} Mo...")
+        number_of_runs = index_instance.build_indexes_streaming(file_path, memory_limit * 1024 * 1024)
+        print(f"{number_of_runs} bloc(s) fusionné(s)")
 
-    print("Sauvegarde des index...")
-    index_instance.save_indexes()
+    print("Alignement des index sur la table des documents...")
+    indexes = index_instance.update_indexes(file_path, 'index_json/')
+
+    print("Calcul des statistiques BM25...")
+    index_instance.save_field_statistics('index_json/', indexes=indexes)
+
+    print("Calcul des scores statiques des documents...")
+    index_instance.save_static_scores('index_json/')
+
+    print("Écriture du segment binaire...")
+    index_instance.save_segment('index_json/', 'index_segment/', indexes=indexes)
+
+    # Écrite en dernier : les moteurs rechargent les index quand elle change
+    version = Index.save_index_version('index_json/')
+    print(f"Version des index : {version}")
+
+def apply_updates(file_path, updates_path='index_updates/', compact=False):
+    """Applies added, changed and deleted products on top of the indexes, without rebuilding them.
+
+    Args:
+        file_path (str): JSONL file of the updates: a product to add or replace (keyed by url),
+            or {"url": ..., "deleted": true} to delete one
+        updates_path (str): Folder of the update segments
+        compact (bool): Whether the update segments are merged afterwards
+    """
+    products = []
+    deleted_urls = []
+    for record, _, _ in Index.iter_jsonl(file_path):
+        if record.get('deleted'):
+            deleted_urls.append(record['url'])
+        else:
+            products.append(record)
+
+    incremental_index = IncrementalIndex(updates_path)
+    generation = incremental_index.apply(products, deleted_urls)
+    print(f"{len(products)} produit(s) ajouté(s) ou modifié(s), {len(deleted_urls)} supprimé(s) : génération {generation}")
+    if compact:
+        incremental_index.compact_in_background().join()
+        print("Segments de mise à jour fusionnés")
 
 def load_indexes():
     index_instance = Index()
@@ -21,7 +75,23 @@ def load_indexes():
     return indexes
 
 def main():
-    generate_and_save_indexes('products.jsonl')
+    parser = argparse.ArgumentParser(description="Génération des index des produits")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--memory-limit', type=int, default=None,
+                      help="mémoire maximale des index en construction, en Mo (lecture en flux et fusion de blocs)")
+    mode.add_argument('--workers', type=int, default=None,
+                      help="nombre de processus de construction (découpage du fichier et fusion)")
+    mode.add_argument('--update', default=None,
+                      help="fichier JSONL de produits ajoutés, modifiés ou supprimés, appliqué sans tout reconstruire")
+    parser.add_argument('--compact', action='store_true',
+                        help="avec --update, fusionne ensuite les segments de mise à jour")
+    args = parser.parse_args()
+
+    if args.update is not None:
+        apply_updates(args.update, compact=args.compact)
+        return
+
+    generate_and_save_indexes('products.jsonl', args.memory_limit, args.workers)
     
     loaded_indexes = load_indexes()
     
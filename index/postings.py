@@ -0,0 +1,293 @@
+from bisect import bisect_left
+
+
+BLOCK_SIZE = 128
+
+
+def encode_varint(value, out):
+    """Appends an unsigned integer to a bytearray, 7 bits per byte.
+
+    Args:
+        value (int): Unsigned integer
+        out (bytearray): Destination buffer
+    """
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def decode_varint(buffer, position):
+    """Reads an unsigned integer written by encode_varint.
+
+    Args:
+        buffer (bytes): Source buffer
+        position (int): Position of the first byte
+
+    Returns:
+        tuple: The integer and the position of the next byte
+    """
+    value = 0
+    shift = 0
+    while True:
+        byte = buffer[position]
+        position += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, position
+        shift += 7
+
+
+class VByteCodec:
+    """Each value is written on as many bytes as needed, 7 bits per byte."""
+
+    name = 'vbyte'
+
+    @staticmethod
+    def encode(values, out):
+        """Appends a block of unsigned integers to a bytearray.
+        """
+        for value in values:
+            encode_varint(value, out)
+
+    @staticmethod
+    def decode(buffer, position, count):
+        """Reads a block of count unsigned integers.
+
+        Returns:
+            tuple: The values and the position of the next byte
+        """
+        values = []
+        for _ in range(count):
+            value, position = decode_varint(buffer, position)
+            values.append(value)
+        return values, position
+
+
+class BitPackedCodec:
+    """PForDelta-style codec: every value of a block is packed on the same number of bits,
+    chosen so that most values fit, and the few larger ones are stored apart as exceptions."""
+
+    name = 'bitpacked'
+
+    def __init__(self, exception_ratio=0.1):
+        """
+        Args:
+            exception_ratio (float): Highest share of values of a block stored as exceptions
+        """
+        self.exception_ratio = exception_ratio
+
+    def bit_width(self, values):
+        """Smallest number of bits such that the values that do not fit stay under the exception ratio.
+        """
+        widths = sorted(value.bit_length() for value in values)
+        return widths[min(len(widths) - 1, int(len(widths) * (1 - self.exception_ratio)))] if widths else 0
+
+    def encode(self, values, out):
+        """Appends a block of unsigned integers to a bytearray: bit width, exceptions, then packed bits.
+        """
+        width = self.bit_width(values)
+        mask = (1 << width) - 1
+        exceptions = [(i, value >> width) for i, value in enumerate(values) if value > mask]
+
+        out.append(width)
+        encode_varint(len(exceptions), out)
+        for i, high in exceptions:
+            encode_varint(i, out)
+            encode_varint(high, out)
+
+        packed = 0
+        for i, value in enumerate(values):
+            packed |= (value & mask) << (i * width)
+        out += packed.to_bytes((len(values) * width + 7) // 8, 'little')
+
+    def decode(self, buffer, position, count):
+        """Reads a block of count unsigned integers.
+
+        Returns:
+            tuple: The values and the position of the next byte
+        """
+        width = buffer[position]
+        number_of_exceptions, position = decode_varint(buffer, position + 1)
+        exceptions = []
+        for _ in range(number_of_exceptions):
+            i, position = decode_varint(buffer, position)
+            high, position = decode_varint(buffer, position)
+            exceptions.append((i, high))
+
+        length = (count * width + 7) // 8
+        packed = int.from_bytes(buffer[position:position + length], 'little')
+        mask = (1 << width) - 1
+        values = [(packed >> (i * width)) & mask for i in range(count)]
+        for i, high in exceptions:
+            values[i] |= high << width
+        return values, position + length
+
+
+CODECS = {
+    VByteCodec.name: VByteCodec(),
+    BitPackedCodec.name: BitPackedCodec()
+}
+
+
+def get_codec(name):
+    """Returns the postings codec registered under a name.
+    """
+    if name not in CODECS:
+        raise ValueError(f"Codec de postings inconnu : {name}")
+    return CODECS[name]
+
+
+def encode_postings(doc_ids, tfs, first_positions, codec, block_size=BLOCK_SIZE):
+    """Encodes a postings list by blocks.
+
+    The list starts with the number of documents, the number of blocks and a skip table giving the
+    last document ID and the byte length of each block. Each block then holds the document ID gaps,
+    the term frequencies and the first positions, encoded with the codec.
+
+    Args:
+        doc_ids (list): Sorted document IDs
+        tfs (list): Term frequency of each document
+        first_positions (list): First position of the token in each document
+        codec: Codec of the blocks (VByteCodec, BitPackedCodec)
+        block_size (int): Number of documents per block
+
+    Returns:
+        bytes
+    """
+    blocks = []
+    previous = 0
+    for start in range(0, len(doc_ids), block_size):
+        block_doc_ids = doc_ids[start:start + block_size]
+        gaps = []
+        for doc_id in block_doc_ids:
+            gaps.append(doc_id - previous)
+            previous = doc_id
+        block = bytearray()
+        codec.encode(gaps, block)
+        codec.encode(tfs[start:start + block_size], block)
+        codec.encode(first_positions[start:start + block_size], block)
+        blocks.append((block_doc_ids[-1], block))
+
+    out = bytearray()
+    encode_varint(len(doc_ids), out)
+    encode_varint(len(blocks), out)
+    previous_last = 0
+    for last_doc_id, block in blocks:
+        encode_varint(last_doc_id - previous_last, out)
+        encode_varint(len(block), out)
+        previous_last = last_doc_id
+    for _, block in blocks:
+        out += block
+    return bytes(out)
+
+
+class BlockPostings:
+    def __init__(self, buffer, codec, block_size=BLOCK_SIZE):
+        """Postings list encoded by encode_postings, decoded one block at a time.
+
+        Only the skip table is read when the list is opened. seek() jumps over the blocks whose last
+        document ID is lower than the target without decoding them.
+
+        Args:
+            buffer (bytes): Encoded postings list
+            codec: Codec of the blocks
+            block_size (int): Number of documents per block
+        """
+        self.buffer = buffer
+        self.codec = codec
+        self.block_size = block_size
+        self.count, position = decode_varint(buffer, 0)
+        number_of_blocks, position = decode_varint(buffer, position)
+
+        self.last_doc_ids = []
+        lengths = []
+        last_doc_id = 0
+        for _ in range(number_of_blocks):
+            delta, position = decode_varint(buffer, position)
+            length, position = decode_varint(buffer, position)
+            last_doc_id += delta
+            self.last_doc_ids.append(last_doc_id)
+            lengths.append(length)
+
+        self.block_offsets = []
+        for length in lengths:
+            self.block_offsets.append(position)
+            position += length
+
+        self.decoded = {}
+        self.block = 0
+        self.position = 0
+
+
+    def __len__(self):
+        return self.count
+
+
+    def block_count(self, block):
+        """Number of documents of a block.
+        """
+        return min(self.block_size, self.count - block * self.block_size)
+
+
+    def decode_block(self, block):
+        """Decodes a block into its document IDs, term frequencies and first positions.
+        """
+        if block not in self.decoded:
+            count = self.block_count(block)
+            position = self.block_offsets[block]
+            gaps, position = self.codec.decode(self.buffer, position, count)
+            tfs, position = self.codec.decode(self.buffer, position, count)
+            first_positions, _ = self.codec.decode(self.buffer, position, count)
+            doc_id = self.last_doc_ids[block - 1] if block > 0 else 0
+            doc_ids = []
+            for gap in gaps:
+                doc_id += gap
+                doc_ids.append(doc_id)
+            self.decoded[block] = (doc_ids, tfs, first_positions)
+        return self.decoded[block]
+
+
+    def __iter__(self):
+        """Iterates over (doc_id, tf, first_position), block by block.
+        """
+        for block in range(len(self.block_offsets)):
+            yield from zip(*self.decode_block(block))
+
+
+    def to_lists(self):
+        """Returns the document IDs, term frequencies and first positions of the whole list.
+        """
+        doc_ids, tfs, first_positions = [], [], []
+        for block in range(len(self.block_offsets)):
+            block_doc_ids, block_tfs, block_first_positions = self.decode_block(block)
+            doc_ids += block_doc_ids
+            tfs += block_tfs
+            first_positions += block_first_positions
+        return doc_ids, tfs, first_positions
+
+
+    def seek(self, target):
+        """Moves forward to the first document ID greater than or equal to target.
+
+        The cursor only moves forward, so targets must be given in increasing order.
+
+        Returns:
+            tuple: (doc_id, tf, first_position), None when the end of the list is reached
+        """
+        block = bisect_left(self.last_doc_ids, target, self.block)
+        if block == len(self.last_doc_ids):
+            self.block = block
+            return None
+        if block != self.block:
+            self.block, self.position = block, 0
+        doc_ids, tfs, first_positions = self.decode_block(block)
+        self.position = bisect_left(doc_ids, target, self.position)
+        return doc_ids[self.position], tfs[self.position], first_positions[self.position]
+
+
+    def reset(self):
+        """Moves the cursor back to the start of the list.
+        """
+        self.block = 0
+        self.position = 0
@@ -0,0 +1,489 @@
+import os
+import json
+import mmap
+import struct
+from array import array
+from collections.abc import Mapping
+from functools import lru_cache
+from postings import encode_varint, decode_varint, encode_postings, BlockPostings, get_codec, BLOCK_SIZE
+
+
+MAGIC = b'IWSG'
+VERSION = 2
+
+HEADER = struct.Struct('<4sII')
+# term_offset, term_length, df, postings_offset, postings_length, positions_offset, positions_length, max_term_weight
+TERM_ENTRY = struct.Struct('<IIIQIQId')
+# N, number of documents, avg_doc_length, k1, b
+STATS_HEADER = struct.Struct('<IIddd')
+# url_offset, url_length, record_offset, record_length, product_id, variant_offset, variant_length
+DOC_ENTRY = struct.Struct('<IIQIqII')
+NO_VALUE = 0xFFFFFFFF
+
+
+def encode_positions(positions_lists):
+    """Encodes the positions of a token in each document: count, then zigzag delta-encoded positions.
+
+    Args:
+        positions_lists (list): List of positions for each document of the postings list
+
+    Returns:
+        bytes
+    """
+    out = bytearray()
+    for positions in positions_lists:
+        encode_varint(len(positions), out)
+        previous = 0
+        for position in positions:
+            delta = position - previous
+            encode_varint((delta << 1) ^ (delta >> 63), out)
+            previous = position
+    return bytes(out)
+
+
+def decode_positions(buffer, count, position=0):
+    """Decodes the positions of a token written by encode_positions.
+
+    Args:
+        buffer (bytes): Source buffer
+        count (int): Number of documents of the postings list
+
+    Returns:
+        list: List of positions for each document
+    """
+    positions_lists = []
+    for _ in range(count):
+        length, position = decode_varint(buffer, position)
+        positions = []
+        previous = 0
+        for _ in range(length):
+            zigzag, position = decode_varint(buffer, position)
+            previous += (zigzag >> 1) ^ -(zigzag & 1)
+            positions.append(previous)
+        positions_lists.append(positions)
+    return positions_lists
+
+
+class SegmentWriter:
+    def __init__(self, path, codec='vbyte', block_size=BLOCK_SIZE):
+        """Writes a binary index segment in a folder.
+
+        The segment contains a doc table ('docs.bin') and, for each field, a sorted term dictionary
+        ('{field}.dict'), the postings lists encoded by blocks ('{field}.post'), the positions
+        ('{field}.pos') and the BM25 statistics ('{field}.stats'). 'segment.json' lists the fields
+        and the postings codec.
+
+        Args:
+            path (str): Destination folder
+            codec (str): Postings codec, 'vbyte' or 'bitpacked'
+            block_size (int): Number of documents per postings block
+        """
+        self.path = path
+        self.codec = get_codec(codec)
+        self.block_size = block_size
+        os.makedirs(path, exist_ok=True)
+
+
+    def write_doc_table(self, doc_table):
+        """Writes the doc table.
+
+        Args:
+            doc_table (list): Entries with url, product_id, variant, offset and length
+        """
+        entries = bytearray()
+        blob = bytearray()
+        for entry in doc_table:
+            url = entry['url'].encode('utf-8')
+            url_offset = len(blob)
+            blob += url
+            if entry.get('variant') is None:
+                variant_offset, variant_length = NO_VALUE, NO_VALUE
+            else:
+                variant = str(entry['variant']).encode('utf-8')
+                variant_offset, variant_length = len(blob), len(variant)
+                blob += variant
+            product_id = -1 if entry.get('product_id') is None else entry['product_id']
+            entries += DOC_ENTRY.pack(url_offset, len(url), entry['offset'], entry['length'], product_id, variant_offset, variant_length)
+
+        with open(os.path.join(self.path, 'docs.bin'), 'wb') as f:
+            f.write(HEADER.pack(MAGIC, VERSION, len(doc_table)))
+            f.write(entries)
+            f.write(blob)
+
+
+    def write_field(self, field, field_index, statistics):
+        """Writes the term dictionary, postings, positions and statistics of a field.
+
+        Args:
+            field (str): Field name, for example 'title'
+            field_index (dict): Index mapping tokens to {doc_id: [positions]}
+            statistics (dict): BM25 statistics of the field ('N', 'avg_doc_length', 'doc_lengths',
+                'doc_order', 'k1', 'b', 'max_term_weights')
+        """
+        entries = bytearray()
+        blob = bytearray()
+        postings_data = bytearray()
+        positions_data = bytearray()
+        max_term_weights = statistics.get('max_term_weights', {})
+
+        for term in sorted(field_index, key=lambda token: token.encode('utf-8')):
+            postings = field_index[term]
+            doc_ids = sorted(postings)
+            encoded_postings = encode_postings(
+                doc_ids,
+                [len(postings[doc_id]) for doc_id in doc_ids],
+                [postings[doc_id][0] for doc_id in doc_ids],
+                self.codec, self.block_size
+            )
+            encoded_positions = encode_positions([postings[doc_id] for doc_id in doc_ids])
+            term_bytes = term.encode('utf-8')
+            entries += TERM_ENTRY.pack(
+                len(blob), len(term_bytes), len(doc_ids),
+                len(postings_data), len(encoded_postings),
+                len(positions_data), len(encoded_positions),
+                max_term_weights.get(term, 0.0)
+            )
+            blob += term_bytes
+            postings_data += encoded_postings
+            positions_data += encoded_positions
+
+        with open(os.path.join(self.path, f"{field}.dict"), 'wb') as f:
+            f.write(HEADER.pack(MAGIC, VERSION, len(field_index)))
+            f.write(entries)
+            f.write(blob)
+        with open(os.path.join(self.path, f"{field}.post"), 'wb') as f:
+            f.write(postings_data)
+        with open(os.path.join(self.path, f"{field}.pos"), 'wb') as f:
+            f.write(positions_data)
+
+        doc_lengths = array('I', statistics['doc_lengths'])
+        doc_order = array('I', statistics['doc_order'])
+        with open(os.path.join(self.path, f"{field}.stats"), 'wb') as f:
+            f.write(HEADER.pack(MAGIC, VERSION, len(doc_lengths)))
+            f.write(STATS_HEADER.pack(statistics['N'], len(doc_lengths), statistics['avg_doc_length'], statistics.get('k1', 0.0), statistics.get('b', 0.0)))
+            f.write(doc_lengths.tobytes())
+            f.write(doc_order.tobytes())
+
+
+    def write(self, doc_table, fields):
+        """Writes a whole segment.
+
+        Args:
+            doc_table (list): Doc table entries
+            fields (dict): For each field name, its positional index {token: {doc_id: [positions]}}
+                and its statistics
+        """
+        self.write_doc_table(doc_table)
+        for field, (field_index, statistics) in fields.items():
+            self.write_field(field, field_index, statistics)
+        with open(os.path.join(self.path, 'segment.json'), 'w', encoding='utf-8') as f:
+            json.dump({'version': VERSION, 'fields': list(fields), 'codec': self.codec.name, 'block_size': self.block_size}, f, indent=4)
+
+
+def open_mmap(file_path):
+    """Maps a file in memory, read only. Empty files are returned as empty bytes.
+    """
+    with open(file_path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return b''
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def close_mmap(buffer):
+    """Unmaps a file mapped by open_mmap. A map still exported to a memoryview is left to the
+    garbage collector, which releases it with the last view.
+    """
+    if isinstance(buffer, mmap.mmap):
+        try:
+            buffer.close()
+        except BufferError:
+            pass
+
+
+def check_header(buffer, file_path):
+    """Checks the magic number and version of a segment file and returns its item count.
+    """
+    magic, version, count = HEADER.unpack_from(buffer, 0)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"Fichier de segment invalide : {file_path}")
+    return count
+
+
+class DocTable:
+    def __init__(self, file_path):
+        """Doc table of a segment, read from a memory-mapped file.
+
+        Args:
+            file_path (str): Path of 'docs.bin'
+        """
+        self.buffer = open_mmap(file_path)
+        self.count = check_header(self.buffer, file_path)
+        self.blob_offset = HEADER.size + self.count * DOC_ENTRY.size
+
+
+    def __len__(self):
+        return self.count
+
+
+    def close(self):
+        close_mmap(self.buffer)
+
+
+    def __getitem__(self, doc_id):
+        if not 0 <= doc_id < self.count:
+            raise IndexError(doc_id)
+        url_offset, url_length, offset, length, product_id, variant_offset, variant_length = DOC_ENTRY.unpack_from(
+            self.buffer, HEADER.size + doc_id * DOC_ENTRY.size)
+        start = self.blob_offset + url_offset
+        variant = None
+        if variant_offset != NO_VALUE:
+            variant_start = self.blob_offset + variant_offset
+            variant = bytes(self.buffer[variant_start:variant_start + variant_length]).decode('utf-8')
+        return {
+            'url': bytes(self.buffer[start:start + url_length]).decode('utf-8'),
+            'product_id': None if product_id == -1 else product_id,
+            'variant': variant,
+            'offset': offset,
+            'length': length
+        }
+
+
+class SegmentField:
+    def __init__(self, path, field, codec='vbyte', block_size=BLOCK_SIZE, cache_size=1024):
+        """Term dictionary, postings, positions and statistics of a field, read from memory-mapped files.
+
+        Only the postings of the looked up tokens are decoded, the last cache_size ones are kept.
+
+        Args:
+            path (str): Segment folder
+            field (str): Field name
+            codec (str): Postings codec of the segment
+            block_size (int): Number of documents per postings block
+            cache_size (int): Number of decoded tokens kept in memory
+        """
+        self.codec = get_codec(codec)
+        self.block_size = block_size
+        dict_path = os.path.join(path, f"{field}.dict")
+        self.dictionary = open_mmap(dict_path)
+        self.number_of_terms = check_header(self.dictionary, dict_path)
+        self.blob_offset = HEADER.size + self.number_of_terms * TERM_ENTRY.size
+        self.postings_data = open_mmap(os.path.join(path, f"{field}.post"))
+        self.positions_data = open_mmap(os.path.join(path, f"{field}.pos"))
+
+        stats_path = os.path.join(path, f"{field}.stats")
+        self.stats_data = open_mmap(stats_path)
+        check_header(self.stats_data, stats_path)
+        N, number_of_documents, avg_doc_length, k1, b = STATS_HEADER.unpack_from(self.stats_data, HEADER.size)
+        start = HEADER.size + STATS_HEADER.size
+        doc_lengths = memoryview(self.stats_data)[start:start + 4 * number_of_documents].cast('I')
+        doc_order = memoryview(self.stats_data)[start + 4 * number_of_documents:start + 4 * (number_of_documents + N)].cast('I')
+
+        self.decode_postings = lru_cache(maxsize=cache_size)(self.decode_postings)
+        self.decode_positions = lru_cache(maxsize=cache_size)(self.decode_positions)
+
+        self.index = PositionalView(self)
+        self.statistics = {
+            'N': N,
+            'avg_doc_length': avg_doc_length,
+            'doc_lengths': doc_lengths,
+            'doc_order': doc_order,
+            'document_frequencies': TermView(self, lambda entry: entry[2]),
+            'term_frequencies': FrequencyView(self),
+            'k1': k1,
+            'b': b,
+            'max_term_weights': TermView(self, lambda entry: entry[7]),
+            'postings': TermView(self, self.open_postings)
+        }
+
+
+    def term(self, i):
+        """Returns the i-th token of the sorted term dictionary.
+        """
+        term_offset, term_length = struct.unpack_from('<II', self.dictionary, HEADER.size + i * TERM_ENTRY.size)
+        start = self.blob_offset + term_offset
+        return bytes(self.dictionary[start:start + term_length]).decode('utf-8')
+
+
+    def find(self, term):
+        """Binary search of a token in the term dictionary.
+
+        Returns:
+            tuple: Dictionary entry of the token, None if it is absent
+        """
+        target = term.encode('utf-8')
+        low, high = 0, self.number_of_terms
+        while low < high:
+            middle = (low + high) // 2
+            term_offset, term_length = struct.unpack_from('<II', self.dictionary, HEADER.size + middle * TERM_ENTRY.size)
+            start = self.blob_offset + term_offset
+            current = self.dictionary[start:start + term_length]
+            if current < target:
+                low = middle + 1
+            elif current > target:
+                high = middle
+            else:
+                return TERM_ENTRY.unpack_from(self.dictionary, HEADER.size + middle * TERM_ENTRY.size)
+        return None
+
+
+    def terms(self):
+        """Iterates over the tokens in sorted order.
+        """
+        for i in range(self.number_of_terms):
+            yield self.term(i)
+
+
+    def term_entries(self):
+        """Iterates over the tokens in sorted order with their dictionary entry, without decoding
+        their postings.
+        """
+        for i in range(self.number_of_terms):
+            entry = TERM_ENTRY.unpack_from(self.dictionary, HEADER.size + i * TERM_ENTRY.size)
+            start = self.blob_offset + entry[0]
+            yield bytes(self.dictionary[start:start + entry[1]]).decode('utf-8'), entry
+
+
+    def close(self):
+        """Drops the decoded tokens and unmaps the files of the field.
+        """
+        self.decode_postings.cache_clear()
+        self.decode_positions.cache_clear()
+        for name in ('doc_lengths', 'doc_order'):
+            try:
+                self.statistics[name].release()
+            except BufferError:
+                pass  # Vecteur encore utilisé, le fichier sera libéré avec lui
+        for buffer in (self.dictionary, self.postings_data, self.positions_data, self.stats_data):
+            close_mmap(buffer)
+
+
+    def open_postings(self, entry):
+        """Opens the postings list of a dictionary entry, its blocks are decoded on demand.
+        """
+        postings_offset, postings_length = entry[3], entry[4]
+        return BlockPostings(memoryview(self.postings_data)[postings_offset:postings_offset + postings_length], self.codec, self.block_size)
+
+
+    def decode_postings(self, term):
+        """Decodes the document IDs, term frequencies and first positions of a token, None if it is absent.
+        """
+        entry = self.find(term)
+        if entry is None:
+            return None
+        return self.open_postings(entry).to_lists()
+
+
+    def decode_positions(self, term):
+        """Decodes the {doc_id: [positions]} dictionary of a token, None if it is absent.
+        """
+        entry = self.find(term)
+        if entry is None:
+            return None
+        doc_ids = self.decode_postings(term)[0]
+        positions_offset, positions_length = entry[5], entry[6]
+        positions_lists = decode_positions(self.positions_data[positions_offset:positions_offset + positions_length], len(doc_ids))
+        return dict(zip(doc_ids, positions_lists))
+
+
+class TermView(Mapping):
+    def __init__(self, field, getter):
+        """Read-only {token: value} view over a field dictionary entry.
+        """
+        self.field = field
+        self.getter = getter
+
+    def __getitem__(self, term):
+        entry = self.field.find(term)
+        if entry is None:
+            raise KeyError(term)
+        return self.getter(entry)
+
+    def __contains__(self, term):
+        return self.field.find(term) is not None
+
+    def __iter__(self):
+        return self.field.terms()
+
+    def __len__(self):
+        return self.field.number_of_terms
+
+
+class FrequencyView(TermView):
+    def __init__(self, field):
+        """Read-only {token: {doc_id: tf}} view over the postings of a field.
+        """
+        super().__init__(field, None)
+
+    def __getitem__(self, term):
+        postings = self.field.decode_postings(term)
+        if postings is None:
+            raise KeyError(term)
+        return dict(zip(postings[0], postings[1]))
+
+
+class PositionalView(TermView):
+    def __init__(self, field):
+        """Read-only {token: {doc_id: [positions]}} view over the positions of a field.
+        """
+        super().__init__(field, None)
+
+    def __getitem__(self, term):
+        positions = self.field.decode_positions(term)
+        if positions is None:
+            raise KeyError(term)
+        return positions
+
+
+class Segment:
+    def __init__(self, path):
+        """Binary index segment opened with mmap.
+
+        Args:
+            path (str): Segment folder written by SegmentWriter
+        """
+        self.path = path
+        with open(os.path.join(path, 'segment.json'), 'r', encoding='utf-8') as f:
+            self.metadata = json.load(f)
+        self.doc_table = DocTable(os.path.join(path, 'docs.bin'))
+        codec = self.metadata.get('codec', 'vbyte')
+        block_size = self.metadata.get('block_size', BLOCK_SIZE)
+        self.fields = {field: SegmentField(path, field, codec, block_size) for field in self.metadata['fields']}
+
+
+    def close(self):
+        """Unmaps the files of the segment, which must no longer be read.
+        """
+        self.doc_table.close()
+        for field in self.fields.values():
+            field.close()
+
+
+    def export_json(self, folder_path):
+        """Writes the segment as JSON files, in the format of index_json/, for debugging.
+
+        Args:
+            folder_path (str): Destination folder
+        """
+        os.makedirs(folder_path, exist_ok=True)
+        with open(os.path.join(folder_path, 'doc_table.json'), 'w', encoding='utf-8') as f:
+            json.dump([self.doc_table[doc_id] for doc_id in range(len(self.doc_table))], f, ensure_ascii=False, indent=2)
+
+        for name, field in self.fields.items():
+            field_index = {}
+            term_frequencies = {}
+            for term in field.terms():
+                positions = field.index[term]
+                field_index[term] = [[doc_id, positions[doc_id]] for doc_id in positions]
+                term_frequencies[term] = [[doc_id, len(positions[doc_id])] for doc_id in positions]
+            statistics = dict(field.statistics)
+            statistics['doc_lengths'] = statistics['doc_lengths'].tolist()
+            statistics['doc_order'] = statistics['doc_order'].tolist()
+            statistics['document_frequencies'] = dict(statistics['document_frequencies'])
+            statistics['term_frequencies'] = term_frequencies
+            statistics['max_term_weights'] = dict(statistics['max_term_weights'])
+            del statistics['postings']
+
+            with open(os.path.join(folder_path, f"{name}_index.json"), 'w', encoding='utf-8') as f:
+                json.dump(field_index, f, ensure_ascii=False, indent=2)
+            with open(os.path.join(folder_path, f"{name}_stats.json"), 'w', encoding='utf-8') as f:
+                json.dump(statistics, f, ensure_ascii=False, indent=2)
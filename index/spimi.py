@@ -0,0 +1,193 @@
+import os
+import json
+import heapq
+from itertools import groupby
+
+
+# Taille approximative en mémoire d'un token indexé (entrées des listes de l'index et de l'index des positions)
+POSTING_SIZE = 100
+
+
+def run_file(run_path, name, feature=None):
+    """Path of the file of an index (or of one feature of a nested index) in a run.
+    """
+    if feature is None:
+        return os.path.join(run_path, f"{name}.jsonl")
+    return os.path.join(run_path, f"{name}.{feature}.jsonl")
+
+
+def write_sorted_postings(file_path, index, run_number):
+    """Writes an inverted index sorted by token, one line [token, first_seen, postings] per token.
+
+    first_seen is [run_number, rank of the token in the index] and keeps the order in which the tokens
+    were first met, so that the merged index can be written in that same order.
+    """
+    ranks = {token: rank for rank, token in enumerate(index)}
+    with open(file_path, "w", encoding="utf-8") as f:
+        for token in sorted(index):
+            f.write(json.dumps([token, [run_number, ranks[token]], index[token]], ensure_ascii=False) + "\n")
+
+
+def write_run(run_path, run_number, indexes, nested=('inverted_index_features',)):
+    """Flushes in-memory partial indexes to a run folder.
+
+    Args:
+        run_path (str): Folder of the run
+        run_number (int): Position of the run among the runs of the build
+        indexes (dict): Partial indexes, under the names of their JSON files. Lists (one entry per
+            document) are written as they are, inverted indexes sorted by token.
+        nested (tuple): Names of the indexes holding one inverted index per feature
+
+    Returns:
+        str: The run folder
+    """
+    os.makedirs(run_path, exist_ok=True)
+    for name, index in indexes.items():
+        if isinstance(index, list):
+            with open(run_file(run_path, name), "w", encoding="utf-8") as f:
+                for entry in index:
+                    f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        elif name in nested:
+            for feature, feature_index in index.items():
+                write_sorted_postings(run_file(run_path, name, feature), feature_index, run_number)
+        else:
+            write_sorted_postings(run_file(run_path, name), index, run_number)
+    return run_path
+
+
+def read_lines(file_path):
+    """Iterates over the JSON lines of a run file, nothing if the file does not exist.
+    """
+    if not os.path.exists(file_path):
+        return
+    with open(file_path, "r", encoding="utf-8") as f:
+        for line in f:
+            yield json.loads(line)
+
+
+def shift_postings(entries, doc_id_offset):
+    """Adds an offset to the document IDs of the lines of a run file.
+
+    Postings are either document IDs or [doc_id, position] pairs.
+    """
+    for token, first_seen, postings in entries:
+        yield token, first_seen, [
+            posting + doc_id_offset if isinstance(posting, int) else [posting[0] + doc_id_offset] + posting[1:]
+            for posting in postings
+        ]
+
+
+def merge_postings(file_paths, merged_path, doc_id_offsets=None):
+    """k-way merge of sorted run files into a file holding the full postings list of each token.
+
+    Only one line per run is in memory at a time. The postings lists of a token are concatenated in
+    the order of the runs, so the document IDs stay increasing.
+
+    Args:
+        file_paths (list): Run files of the same index, in the order of the runs
+        merged_path (str): Destination file, one JSON postings list per line
+        doc_id_offsets (list): Offset added to the document IDs of each run, None if the runs already
+            use global document IDs
+
+    Returns:
+        dict: For each token, its first_seen and the byte offset of its postings list in merged_path
+    """
+    vocabulary = {}
+    streams = [read_lines(file_path) for file_path in file_paths]
+    if doc_id_offsets is not None:
+        streams = [shift_postings(stream, doc_id_offset) for stream, doc_id_offset in zip(streams, doc_id_offsets)]
+    with open(merged_path, "wb") as out:
+        for token, entries in groupby(heapq.merge(*streams, key=lambda entry: entry[0]), key=lambda entry: entry[0]):
+            postings = []
+            first_seen = None
+            for _, seen, run_postings in entries:
+                if first_seen is None:
+                    first_seen = seen
+                postings += run_postings
+            vocabulary[token] = (first_seen, out.tell())
+            out.write(json.dumps(postings, ensure_ascii=False).encode("utf-8") + b"\n")
+    return vocabulary
+
+
+def dump_value(value, level):
+    """JSON text of a value as json.dump(indent=4) writes it at a nesting level.
+    """
+    return json.dumps(value, ensure_ascii=False, indent=4).replace("\n", "\n" + " " * 4 * level)
+
+
+def write_items(f, items, level=0, keyed=True):
+    """Writes a JSON object (keyed) or array item by item, with the layout of json.dump(indent=4).
+
+    Args:
+        f: Destination text file
+        items: Iterable of (key, value) pairs, or of values. A callable value writes itself: it is
+            called with the file and its nesting level.
+        level (int): Nesting level of the object
+        keyed (bool): Whether items are (key, value) pairs
+    """
+    opening, closing = ("{", "}") if keyed else ("[", "]")
+    indent = " " * 4 * (level + 1)
+    f.write(opening)
+    empty = True
+    for item in items:
+        f.write(("\n" if empty else ",\n") + indent)
+        if keyed:
+            key, value = item
+            f.write(json.dumps(key, ensure_ascii=False) + ": ")
+        else:
+            value = item
+        if callable(value):
+            value(f, level + 1)
+        else:
+            f.write(dump_value(value, level + 1))
+        empty = False
+    if not empty:
+        f.write("\n" + " " * 4 * level)
+    f.write(closing)
+
+
+def merged_index_writer(file_paths, merged_path, doc_id_offsets=None):
+    """Merges the run files of an inverted index and returns a function writing it as a JSON object,
+    with its tokens in the order in which they were first met.
+    """
+    vocabulary = merge_postings(file_paths, merged_path, doc_id_offsets)
+
+    def write(f, level):
+        with open(merged_path, "rb") as merged:
+            def items():
+                for token, (_, offset) in sorted(vocabulary.items(), key=lambda item: item[1][0]):
+                    merged.seek(offset)
+                    yield token, json.loads(merged.readline())
+            write_items(f, items(), level)
+    return write
+
+
+def merge_runs(run_paths, folder_path, template, nested=('inverted_index_features',), doc_id_offsets=None):
+    """Merges the runs of a build into one JSON file per index.
+
+    Args:
+        run_paths (list): Run folders, in the order of the documents (at least one)
+        folder_path (str): Destination folder of the '{name}.json' files, the merged postings
+            lists are written next to the runs
+        template (dict): Empty indexes giving the names and the layout of the indexes
+        nested (tuple): Names of the indexes holding one inverted index per feature
+        doc_id_offsets (list): Offset added to the document IDs of each run, when each run numbers
+            its documents from 0
+    """
+    merge_path = os.path.join(os.path.dirname(os.path.normpath(run_paths[0])), "merged")
+    for name, index in template.items():
+        with open(os.path.join(folder_path, f"{name}.json"), "w", encoding="utf-8") as f:
+            if isinstance(index, list):
+                entries = (entry for run_path in run_paths for entry in read_lines(run_file(run_path, name)))
+                write_items(f, entries, keyed=False)
+            elif name in nested:
+                features = [
+                    (feature, merged_index_writer([run_file(run_path, name, feature) for run_path in run_paths],
+                                                  f"{merge_path}.{name}.{feature}.jsonl", doc_id_offsets))
+                    for feature in index
+                ]
+                write_items(f, features)
+            else:
+                write = merged_index_writer([run_file(run_path, name) for run_path in run_paths], f"{merge_path}.{name}.jsonl",
+                                             doc_id_offsets)
+                write(f, 0)
@@ -0,0 +1,120 @@
+import os
+import time
+import argparse
+from engine import SearchEngine
+from requests import Requests
+from scoring import TermAtATimeScorer
+from vectorized import VectorizedScorer
+
+
+REQUESTS = ["Box of Chocolate Candy", "Chocolate", "Energy Potion", "Hiking Boots", "Women's Sandals",
+            "Running Shoes for Men", "Shoes", "Kids' Sneakers", "Classic Sneakers", "Outdoor"]
+
+
+def replicate_fields(engine, copies, weights={'title': 2.0, 'description': 1.0}):
+    """Builds scoring fields whose documents are those of the engine repeated copies times.
+
+    Returns:
+        list: One field dict per field, as given to TermAtATimeScorer.accumulate
+    """
+    number_of_documents = len(engine.doc_table)
+    fields = []
+    for name, weight in weights.items():
+        index = {}
+        for token, postings in engine.indexes[f"{name}_index"].items():
+            index[token] = {copy * number_of_documents + doc_id: positions
+                            for copy in range(copies) for doc_id, positions in postings.items()}
+        fields.append({
+            'name': name,
+            'weight': weight,
+            'index': index,
+            'statistics': Requests.compute_statistics(index, number_of_documents * copies),
+            'allowed': None
+        })
+    return fields
+
+
+def throughput(scorer, fields, requests, static_scores, repeat, k):
+    """Number of requests per second scored by a scorer."""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for tokens in requests:
+            scorer.score_documents(fields, tokens, k, static_scores)
+    return len(requests) * repeat / (time.perf_counter() - start)
+
+
+def max_difference(scorers, fields, requests, static_scores):
+    """Largest difference between the scores given by two scorers to the same documents."""
+    difference = 0.0
+    for tokens in requests:
+        first, second = [scorer.score_documents(fields, tokens, None, static_scores) for scorer in scorers]
+        if first.keys() != second.keys():
+            return float('inf')
+        difference = max([difference] + [abs(first[doc_id] - second[doc_id]) for doc_id in first])
+    return difference
+
+
+def benchmark_batch(folder_path='index_json/', products_path='products.jsonl', segment_path=None, repeat=20, workers=(None, 2)):
+    """Compares the throughput of requests ranked one at a time and in a batch sharing the work on
+    their common tokens, without the query cache, and checks that the results are the same.
+
+    Args:
+        folder_path (str): Folder containing the JSON indexes
+        products_path (str): Path to the JSONL file of products
+        segment_path (str): Binary segment folder, None to use the JSON indexes
+        repeat (int): Number of times the requests are repeated in the batch
+        workers (tuple): Numbers of processes of the batches, None for a batch ranked in this process
+    """
+    engine = SearchEngine(folder_path=folder_path, products_path=products_path, segment_path=segment_path, cache_size=0)
+    requests = REQUESTS * repeat
+    start = time.perf_counter()
+    single = [engine.search(request) for request in requests]
+    one_at_a_time = len(requests) / (time.perf_counter() - start)
+    print(f"{len(requests)} requêtes")
+    print(f"{'mode':<20}{'req/s':>12}{'accélération':>16}{'identique':>12}")
+    print(f"{'une par une':<20}{one_at_a_time:>12,.1f}{1:>16.2f}{'oui':>12}")
+    for count in workers:
+        start = time.perf_counter()
+        batch = engine.search_batch(requests, workers=count)
+        batched = len(requests) / (time.perf_counter() - start)
+        mode = "lot" if count is None else f"lot, {count} processus"
+        print(f"{mode:<20}{batched:>12,.1f}{batched / one_at_a_time:>16.2f}{'oui' if batch == single else 'non':>12}")
+
+
+def benchmark_scorers(folder_path='index_json/', products_path='products.jsonl', copies=(1, 10, 100), repeat=5, k=10):
+    """Compares the throughput of the pure Python scorer and of the NumPy scorer on corpora of
+    growing size, made of the indexed products repeated, and checks that their scores match.
+
+    Args:
+        folder_path (str): Folder containing the JSON indexes
+        products_path (str): Path to the JSONL file of products
+        copies (tuple): Numbers of times the products are repeated
+        repeat (int): Number of passes over the requests
+        k (int): Number of documents needed per request, None to score all of them
+    """
+    if not VectorizedScorer.available():
+        print("NumPy n'est pas installé, seul le score en Python est disponible")
+        return
+    engine = SearchEngine(folder_path=folder_path, products_path=products_path, cache_size=0)
+    requests = [Requests.tokenize(request) for request in REQUESTS]
+    scorers = [TermAtATimeScorer(), VectorizedScorer()]
+    print(f"{'documents':<12}{'python (req/s)':>18}{'numpy (req/s)':>18}{'accélération':>16}{'écart max':>14}")
+    for count in copies:
+        fields = replicate_fields(engine, count)
+        number_of_documents = len(engine.doc_table)
+        static_scores = {copy * number_of_documents + doc_id: score
+                         for copy in range(count) for doc_id, score in engine.review_scores.items()}
+        difference = max_difference(scorers, fields, requests, static_scores)  # Construit aussi les colonnes
+        python, vectorized = [throughput(scorer, fields, requests, static_scores, repeat, k) for scorer in scorers]
+        print(f"{number_of_documents * count:<12}{python:>18,.1f}{vectorized:>18,.1f}{vectorized / python:>16.2f}{difference:>14.1e}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Débit du score BM25 en Python et avec NumPy, et des lots de requêtes")
+    parser.add_argument("--copies", type=int, nargs="+", default=[1, 10, 100], help="Nombres de copies des produits")
+    parser.add_argument("--repeat", type=int, default=5, help="Nombre de passages sur les requêtes")
+    parser.add_argument("--k", type=int, default=10, help="Nombre de documents par requête, 0 pour tous")
+    args = parser.parse_args()
+    benchmark_scorers(copies=tuple(args.copies), repeat=args.repeat, k=args.k or None)
+    print()
+    benchmark_batch(segment_path='index_segment/' if os.path.isdir('index_segment/') else None)
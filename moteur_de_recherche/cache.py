@@ -0,0 +1,86 @@
+import time
+from collections import OrderedDict
+
+
+class QueryCache:
+    def __init__(self, max_size=1024, ttl=None, clock=time.monotonic):
+        """LRU cache of the results of the requests, with an optional time to live.
+
+        The entries are tied to a version of the indexes: when the version changes, every entry
+        is dropped, so that no result computed on older indexes is returned.
+
+        Args:
+            max_size (int): Number of results kept, the least recently used one is dropped first
+            ttl (float): Lifetime of a result in seconds, None to keep it until it is evicted
+            clock (function): Current time in seconds, used for the time to live
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.clock = clock
+        self.entries = OrderedDict()
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+
+    def check_version(self, version):
+        """Drops every entry when the version of the indexes changed.
+        """
+        if version != self.version:
+            self.entries.clear()
+            self.version = version
+
+
+    def get(self, key, version=None):
+        """Returns the cached result of a key, None when it is missing or expired.
+
+        Args:
+            key: Hashable key of the request
+            version: Version of the indexes the result must have been computed on
+
+        Returns:
+            The cached result, or None
+        """
+        self.check_version(version)
+        entry = self.entries.get(key)
+        if entry is not None and self.ttl is not None and self.clock() - entry[0] > self.ttl:
+            del self.entries[key]
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+
+    def put(self, key, value, version=None):
+        """Stores the result of a key, evicting the least recently used entries beyond max_size.
+        """
+        self.check_version(version)
+        self.entries[key] = (self.clock(), value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+
+    def clear(self):
+        self.entries.clear()
+
+
+    def stats(self):
+        """Returns the hit and miss counters of the cache.
+
+        Returns:
+            dict: Hits, misses, hit rate, evictions and number of cached results
+        """
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'evictions': self.evictions,
+            'size': len(self.entries)
+        }
@@ -0,0 +1,438 @@
+import os
+import sys
+import json
+import contextlib
+from concurrent.futures import ProcessPoolExecutor
+from requests import Requests
+from scoring import TermAtATimeScorer
+from vectorized import VectorizedScorer
+from cache import QueryCache
+from synonyms import SynonymTable
+from facets import FacetIndex, to_bitset, from_bitset
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'index'))
+from segment import Segment
+from incremental import IncrementalIndex, LayeredIndex, LayeredDocTable, layered_statistics
+from index import index as Index
+
+
+class SearchEngine:
+    def __init__(self, folder_path='index_json/', products_path='products.jsonl', fields=('title', 'description'), segment_path=None, updates_path=None,
+                 cache_size=1024, cache_ttl=None, vectorized=False):
+        """Loads the indexes, the doc table and the BM25 statistics once.
+
+        Args:
+            folder_path (str): Folder containing the JSON indexes
+            products_path (str): Path to the JSONL file of products
+            fields (tuple): Indexed fields used for ranking
+            segment_path (str): Binary segment folder; when given, the doc table, the field indexes
+                and their statistics are memory-mapped from it instead of being loaded from JSON
+            updates_path (str): Folder of the incremental updates (IncrementalIndex); when given, the
+                updates are applied on top of the base indexes and refresh() picks up the new ones
+            cache_size (int): Number of request results kept in the query cache, 0 to disable it
+            cache_ttl (float): Lifetime of a cached result in seconds, None to keep it until evicted
+            vectorized (bool): Scores with NumPy (VectorizedScorer) when it is installed, otherwise
+                with the pure Python scorer
+        """
+        # Arguments du moteur, pour en recréer un dans chaque processus d'un lot de requêtes
+        self.options = {'folder_path': folder_path, 'products_path': products_path, 'fields': fields, 'segment_path': segment_path,
+                        'updates_path': updates_path, 'cache_size': cache_size, 'cache_ttl': cache_ttl, 'vectorized': vectorized}
+        self.folder_path = folder_path
+        self.products_path = products_path
+        self.segment_path = segment_path
+        self.fields = fields
+        self.indexes = {}
+        self.statistics = {}
+        self.review_scores = None
+        self.static_orders = {}
+        self.sorted_postings = {}
+        self.impact_postings = {}
+        self.number_of_documents = None
+        self.scorer = TermAtATimeScorer()
+        if vectorized:
+            if VectorizedScorer.available():
+                self.scorer = VectorizedScorer()
+            else:
+                print("NumPy n'est pas installé, le score BM25 est calculé en Python")
+        self.segment = None
+        self.updates = None
+        self.base_version = None
+        self.version_mtime = None
+        self.generation = None
+        # Résultats des requêtes, invalidés quand la version des index de base ou la génération des mises à jour change
+        self.cache = QueryCache(cache_size, cache_ttl) if cache_size else None
+        self.batch_documents = None  # Produits déjà lus pendant un lot de requêtes
+
+        self.load_base()
+        if updates_path is not None:
+            self.updates = IncrementalIndex(updates_path, folder_path, fields)
+            self.manifest_mtime = None
+            if self.apply_updates():
+                return
+        self.prepare()
+
+
+    def load_base(self):
+        """Loads the base indexes, the doc table and the BM25 statistics, and records their version.
+        """
+        # Version lue avant les index : si de nouveaux index sont écrits pendant le chargement, ils
+        # seront rechargés au prochain refresh()
+        self.version_mtime = self.stat_version()
+        self.base_version = Index.read_index_version(self.folder_path)
+        self.indexes = {}
+        self.statistics = {}
+        if self.segment_path is not None:
+            if self.segment is not None:
+                self.segment.close()
+            self.segment = Segment(self.segment_path)
+            self.load_indexes(exclude=['doc_table'] + [f"{field}_{kind}" for field in self.fields for kind in ('index', 'stats')])
+            self.indexes['doc_table'] = self.segment.doc_table
+            for field in self.fields:
+                self.indexes[f"{field}_index"] = self.segment.fields[field].index
+                self.statistics[field] = self.segment.fields[field].statistics
+        else:
+            self.load_indexes()
+        self.doc_table = self.indexes['doc_table']
+        for field in self.fields:
+            if field in self.statistics:
+                continue
+            # Statistiques écrites à l'indexation, recalculées seulement si le fichier est absent
+            statistics = self.indexes.get(f"{field}_stats")
+            if statistics is None:
+                statistics = Requests.compute_statistics(self.indexes.get(f"{field}_index", {}), len(self.doc_table))
+            self.statistics[field] = statistics
+
+        # Scores statiques écrits à l'indexation, recalculés seulement si le fichier est absent
+        if 'static_scores' not in self.indexes:
+            self.indexes['static_scores'] = Index.build_static_scores(self.indexes.get('reviews_index', []))
+
+        self.facets = FacetIndex(self.indexes, self.synonyms)
+
+        # Index de base, sur lesquels les mises à jour incrémentales sont superposées
+        self.base_indexes = dict(self.indexes)
+        self.base_statistics = dict(self.statistics)
+
+
+    def stat_version(self):
+        """Returns the modification time of the version file of the base indexes, None if it is missing.
+        """
+        try:
+            return os.stat(os.path.join(self.folder_path, 'version')).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+
+    def version(self):
+        """Version of the indexes the results are computed on, the key of the query cache entries.
+
+        Returns:
+            tuple: Version of the base indexes and generation of the incremental updates
+        """
+        return (self.base_version, self.generation)
+
+
+    def prepare(self):
+        """Computes the review scores and static order of the documents, shared by every request.
+        """
+        self.review_scores = None
+        self.static_orders = {}
+        self.sorted_postings = {}
+        self.impact_postings = {}
+        self.number_of_documents = None
+        loader = Requests(None, folder_path=self.folder_path, engine=self)
+        self.review_scores = loader.get_review_scores()
+        for field in self.fields:
+            loader.get_static_order(field)
+        self.number_of_documents = loader.get_number_of_documents()
+
+
+    def refresh(self):
+        """Reloads the base indexes when a new version of them was saved, then applies the incremental
+        updates written since the last call.
+
+        Returns:
+            bool: Whether the indexes changed
+        """
+        if not self.reload_base():
+            return self.apply_updates()
+        self.generation = None
+        self.manifest_mtime = None
+        if not self.apply_updates():
+            self.prepare()
+        return True
+
+
+    def reload_base(self):
+        """Reloads the base indexes when generate_and_save_indexes wrote a new version of them.
+
+        Only the modification time of the version file is read when it did not change.
+
+        Returns:
+            bool: Whether the base indexes were reloaded
+        """
+        version_mtime = self.stat_version()
+        if version_mtime == self.version_mtime:
+            return False
+        self.version_mtime = version_mtime
+        if Index.read_index_version(self.folder_path) == self.base_version:
+            return False
+        self.load_base()
+        return True
+
+
+    def apply_updates(self):
+        """Applies the incremental updates written since the last call.
+
+        Only the manifest and the new update segments are read: the base indexes stay as they were
+        loaded, and the update segments and deleted documents are merged over them.
+
+        Returns:
+            bool: Whether the indexes changed
+        """
+        if self.updates is None:
+            return False
+        try:
+            manifest_mtime = os.stat(self.updates.manifest_path()).st_mtime_ns
+        except FileNotFoundError:
+            return False
+        if manifest_mtime == self.manifest_mtime:
+            return False
+        self.manifest_mtime = manifest_mtime
+
+        manifest = self.updates.read_manifest()
+        if manifest['generation'] == self.generation:
+            return False
+        layers = self.updates.layers(manifest)
+        deleted = self.updates.deleted_documents(self.updates.read_deleted(manifest))
+
+        self.doc_table = LayeredDocTable(self.base_indexes['doc_table'], layers)
+        self.indexes['doc_table'] = self.doc_table
+        for field in self.fields:
+            index = LayeredIndex(self.base_indexes.get(f"{field}_index", {}),
+                                 [(layer['first_doc_id'], layer['segment'].fields[field].index) for layer in layers], deleted)
+            self.indexes[f"{field}_index"] = index
+            self.statistics[field] = layered_statistics(self.base_statistics[field], index, layers, field, deleted)
+
+        static_scores = list(self.base_indexes['static_scores'])
+        for layer in layers:
+            static_scores += [None] * (layer['first_doc_id'] - len(static_scores)) + layer['static_scores']
+        self.indexes['static_scores'] = [None if doc_id in deleted else score for doc_id, score in enumerate(static_scores)]
+
+        # Facettes : les documents des segments de mise à jour sont lus dans leurs produits
+        self.facets = FacetIndex(self.base_indexes, self.synonyms)
+        for layer in layers:
+            for doc_id in range(layer['first_doc_id'], layer['first_doc_id'] + len(layer['segment'].doc_table)):
+                if doc_id not in deleted and self.doc_table[doc_id]['url']:
+                    self.facets.add_document(doc_id, self.get_document(doc_id))
+        self.facets.remove_documents(deleted)
+
+        self.generation = manifest['generation']
+        self.prepare()
+        # Segments des manifestes précédents : fermés, et supprimés s'ils ont été remplacés par une fusion
+        self.updates.release(manifest)
+        return True
+
+
+    def load_indexes(self, exclude=()):
+        """Loads each saved index from JSON files.
+
+        Args:
+            exclude (list): Names of the indexes not to load
+        """
+        json_files = [f for f in os.listdir(self.folder_path) if f.endswith('.json')]
+        for json_file in json_files:
+            file_path = os.path.join(self.folder_path, json_file)
+            name = os.path.splitext(json_file)[0]
+            if name in exclude:
+                continue
+            try:
+                with open(file_path, "r", encoding="utf-8") as f:
+                    self.indexes[name] = json.load(f)
+            except FileNotFoundError:
+                print(f"Fichier {name}.json introuvable.")
+        Requests.decode_indexes(self.indexes, self.fields)
+        self.synonyms = self.indexes.get('origin_synonyms', {})
+        self.synonym_table = SynonymTable(self.synonyms, Requests.tokenize)
+
+
+    def get_document(self, doc_id):
+        """Reads the product of a document ID at its offset in the JSONL file.
+
+        Args:
+            doc_id (int): Document ID in the doc table
+
+        Returns:
+            dict: The product
+        """
+        if self.batch_documents is not None and doc_id in self.batch_documents:
+            return self.batch_documents[doc_id]
+        entry = self.doc_table[doc_id]
+        with open(entry.get('products_path', self.products_path), 'rb') as file:
+            file.seek(entry['offset'])
+            product = json.loads(file.read(entry['length']))
+        if self.batch_documents is not None:
+            self.batch_documents[doc_id] = product
+        return product
+
+
+    def search(self, request, k=None, filters=None, facets=False):
+        """Ranks the products for a request using the loaded indexes.
+
+        Args:
+            request (str): User request
+            k (int): Number of products to return, None to rank all of them
+            filters (dict): Facet filters, for example {'brand': 'ChocoDelight', 'origin': ['usa', 'italy']}
+            facets (bool): Whether to return the number of ranked documents of each brand and origin, counted
+                on all of them whatever k
+
+        Returns:
+            dict: Ranked documents, total number of documents and number of filtered documents, and
+                the facet counts when asked
+        """
+        self.refresh()
+        return self.rank_request(request, k, filters, facets)
+
+
+    def rank_request(self, request, k=None, filters=None, facets=False):
+        """Ranks the products for a request on the current indexes, without looking for updates.
+
+        Takes the same arguments and returns the same results as search.
+        """
+        req = Requests(request, folder_path=self.folder_path, engine=self)
+        req.tokenize_request()
+        req.add_synonyms()
+        filter_bits = self.facets.filter(filters)
+
+        # Les requêtes qui donnent les mêmes tokens, poids, clauses et contraintes de position après
+        # normalisation et synonymes ont le même classement
+        key = (frozenset(req.term_weights.items()), frozenset(req.clauses), frozenset(req.constraints), k,
+               filter_bits, facets, self.scorer.k1, self.scorer.b)
+        if self.cache is not None:
+            results = self.cache.get(key, self.version())
+            if results is not None:
+                return self.copy_results(results)
+
+        if filter_bits is not None:
+            req.filter_set = from_bitset(filter_bits)
+        number_of_documents, number_of_filtered_documents = req.number_of_filtered_doc()
+        ranked_products = req.rank_products_bm25(k)
+
+        documents = [
+            {
+                "title": product[2],
+                "url": product[0],
+                "description": product[3],
+                "ranking_score": product[1]
+            } for product in ranked_products
+        ]
+
+        results = {
+            "documents": documents,
+            "total_documents": number_of_documents,
+            "filtered_documents": number_of_filtered_documents
+        }
+        if facets:
+            # Comptes sur tous les documents classés pour la requête, quel que soit k
+            results["facets"] = self.facets.counts(to_bitset(req.result_documents()))
+        if self.cache is not None:
+            self.cache.put(key, results, self.version())
+        return self.copy_results(results)
+
+
+    def search_batch(self, requests, k=None, filters=None, facets=False, workers=None):
+        """Ranks the products for a list of requests, sharing the work on the tokens they have in common.
+
+        The postings of each distinct token of the batch are decoded once and scored once, and each
+        product is read once, then every request is ranked with them. With workers, the batch is split into chunks ranked by a pool of
+        processes, each loading its own engine.
+
+        Args:
+            requests (list): User requests
+            k (int): Number of products to return per request, None to rank all of them
+            filters (dict): Facet filters applied to every request
+            facets (bool): Whether to return the facet counts of each request
+            workers (int): Number of processes, None to rank the batch in this process
+
+        Returns:
+            list: Results of each request, as returned by search, in the order of the requests
+        """
+        self.refresh()
+        requests = list(requests)
+        if workers is not None and workers > 1 and len(requests) > 1:
+            chunk_size = -(-len(requests) // workers)
+            chunks = [requests[start:start + chunk_size] for start in range(0, len(requests), chunk_size)]
+            with ProcessPoolExecutor(max_workers=len(chunks), initializer=init_worker, initargs=(self.options,)) as executor:
+                futures = [executor.submit(search_chunk, chunk, k, filters, facets) for chunk in chunks]
+                return [results for future in futures for results in future.result()]
+        with self.shared_work(requests):
+            return [self.rank_request(request, k, filters, facets) for request in requests]
+
+
+    @contextlib.contextmanager
+    def shared_work(self, requests):
+        """Replaces, for the duration of a batch, the field indexes and statistics by dictionaries holding
+        only the decoded postings of the tokens of the requests, and shares the token scores and the
+        products read between the requests.
+
+        Args:
+            requests (list): User requests of the batch
+        """
+        tokens = set()
+        for request in requests:
+            req = Requests(request, folder_path=self.folder_path, engine=self)
+            req.tokenize_request()
+            req.add_synonyms()
+            tokens.update(req.tokens_request)
+
+        indexes, statistics = self.indexes, self.statistics
+        self.indexes, self.statistics = dict(indexes), dict(statistics)
+        for field in self.fields:
+            index = indexes.get(f"{field}_index", {})
+            field_statistics = statistics[field]
+            present = [token for token in tokens if token in field_statistics['term_frequencies']]
+            self.indexes[f"{field}_index"] = {token: index[token] for token in present}
+            batch_statistics = dict(field_statistics)
+            batch_statistics.pop('postings', None)  # Listes lues dans l'index déjà décodé
+            for name in ('document_frequencies', 'term_frequencies', 'max_term_weights'):
+                if name in field_statistics:
+                    values = field_statistics[name]
+                    batch_statistics[name] = {token: values[token] for token in present if token in values}
+            self.statistics[field] = batch_statistics
+        self.scorer.term_cache = {}
+        self.batch_documents = {}
+        try:
+            yield
+        finally:
+            self.indexes, self.statistics = indexes, statistics
+            self.scorer.term_cache = None
+            self.batch_documents = None
+
+
+    @staticmethod
+    def copy_results(results):
+        """Copies the results of a request, so that the caller cannot modify the cached ones.
+        """
+        return dict(results, documents=[dict(document) for document in results["documents"]])
+
+
+    def cache_stats(self):
+        """Returns the hit and miss counters of the query cache, None when it is disabled.
+        """
+        return self.cache.stats() if self.cache is not None else None
+
+
+# Moteur de chaque processus du pool de search_batch, chargé une seule fois par processus
+worker_engine = None
+
+
+def init_worker(options):
+    """Loads the engine of a process of the pool.
+    """
+    global worker_engine
+    worker_engine = SearchEngine(**options)
+
+
+def search_chunk(requests, k=None, filters=None, facets=False):
+    """Ranks a chunk of a batch of requests in a process of the pool.
+    """
+    return worker_engine.search_batch(requests, k, filters, facets)
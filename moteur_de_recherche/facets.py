@@ -0,0 +1,123 @@
+# Index des facettes dans index_json, et caractéristique des produits qui donne leur valeur
+FACETS = {'brand': 'brand_index', 'origin': 'origin_index'}
+FEATURES = {'brand': 'brand', 'origin': 'made in'}
+
+
+def to_bitset(doc_ids):
+    """Builds the bitset (an integer, bit i for document i) of a list of document IDs.
+    """
+    doc_ids = list(doc_ids)
+    if len(doc_ids) == 0:
+        return 0
+    bitmap = bytearray(max(doc_ids) // 8 + 1)
+    for doc_id in doc_ids:
+        bitmap[doc_id >> 3] |= 1 << (doc_id & 7)
+    return int.from_bytes(bitmap, 'little')
+
+
+def from_bitset(bits):
+    """Returns the set of document IDs of a bitset.
+    """
+    doc_ids = set()
+    for i, byte in enumerate(bits.to_bytes((bits.bit_length() + 7) // 8, 'little')):
+        if byte:
+            for bit in range(8):
+                if byte & (1 << bit):
+                    doc_ids.add(i * 8 + bit)
+    return doc_ids
+
+
+class FacetIndex:
+    def __init__(self, indexes, synonyms=None):
+        """Bitsets of the documents of each brand and origin, built once from the facet indexes.
+
+        Filtering and counting are bitwise operations on these bitsets. Origins are resolved
+        through the origin synonyms, so that 'united states' filters on 'usa'.
+
+        Args:
+            indexes (dict): Loaded indexes, with 'brand_index' and 'origin_index' mapping each value
+                to its document IDs
+            synonyms (dict): Origin synonyms, each origin mapped to its list of synonyms
+        """
+        self.bitsets = {facet: {value: to_bitset(doc_ids) for value, doc_ids in indexes.get(name, {}).items()}
+                        for facet, name in FACETS.items()}
+        self.aliases = {}
+        for origin, values in (synonyms or {}).items():
+            for value in [origin] + list(values):
+                self.aliases[self.normalize(value)] = self.normalize(origin)
+
+
+    @staticmethod
+    def normalize(value):
+        """Lowercases a facet value and collapses its spaces.
+        """
+        return " ".join(str(value).lower().split())
+
+
+    def resolve(self, facet, value):
+        """Returns the indexed value matching a filter value, None if there is none.
+        """
+        values = self.bitsets[facet]
+        value = self.normalize(value)
+        for candidate in (value, value.replace(" ", ""), self.aliases.get(value)):
+            if candidate in values:
+                return candidate
+        return None
+
+
+    def add_document(self, doc_id, product):
+        """Adds a document to the bitsets of its brand and origin, read from its product features.
+        """
+        features = product.get('product_features', {})
+        for facet, feature in FEATURES.items():
+            if feature in features:
+                value = self.normalize(features[feature])
+                value = self.aliases.get(value, value) if facet == 'origin' else value.replace(" ", "")
+                self.bitsets[facet][value] = self.bitsets[facet].get(value, 0) | (1 << doc_id)
+
+
+    def remove_documents(self, doc_ids):
+        """Removes documents (deleted ones) from every bitset.
+        """
+        mask = ~to_bitset(doc_ids)
+        for values in self.bitsets.values():
+            for value in values:
+                values[value] &= mask
+
+
+    def filter(self, filters):
+        """Returns the bitset of the documents matching filters.
+
+        Args:
+            filters (dict): For each facet, a value or a list of values; a document must match one
+                of the values of every facet
+
+        Returns:
+            int: Bitset of the matching documents, None when there is no filter
+        """
+        if not filters:
+            return None
+        bits = None
+        for facet, values in filters.items():
+            if isinstance(values, str):
+                values = [values]
+            facet_bits = 0
+            for value in values:
+                resolved = self.resolve(facet, value)
+                if resolved is not None:
+                    facet_bits |= self.bitsets[facet][resolved]
+            bits = facet_bits if bits is None else bits & facet_bits
+        return bits
+
+
+    def counts(self, bits):
+        """Counts the documents of a bitset for each value of each facet.
+
+        Returns:
+            dict: For each facet, the number of documents of each value, by decreasing count
+        """
+        counts = {}
+        for facet, values in self.bitsets.items():
+            facet_counts = [(value, (bits & value_bits).bit_count()) for value, value_bits in values.items()]
+            counts[facet] = {value: count for value, count in sorted(facet_counts, key=lambda x: -x[1]) if count > 0}
+        return counts
@@ -0,0 +1,90 @@
+from bisect import bisect_left
+
+
+def galloping_search(array, target, low=0):
+    """Finds the first position of a sorted array holding a value greater than or equal to target.
+
+    The search gallops from low with steps of 1, 2, 4, ... then finishes with a binary search,
+    so that the cost depends on the distance to the result and not on the length of the array.
+
+    Args:
+        array (list): Sorted list
+        target: Searched value
+        low (int): Position where the search starts
+
+    Returns:
+        int: Position of the first value >= target, len(array) if there is none
+    """
+    n = len(array)
+    bound = 1
+    while low + bound < n and array[low + bound] < target:
+        bound *= 2
+    return bisect_left(array, target, low + bound // 2, min(low + bound + 1, n))
+
+
+def intersect_pair(short, long):
+    """Intersects two sorted lists by galloping in the longest one.
+
+    Args:
+        short (list): Shortest sorted list
+        long (list): Longest sorted list
+
+    Returns:
+        list: Sorted values present in both lists
+    """
+    result = []
+    position = 0
+    for value in short:
+        position = galloping_search(long, value, position)
+        if position == len(long):
+            break
+        if long[position] == value:
+            result.append(value)
+            position += 1
+    return result
+
+
+def intersect_blocks(values, postings):
+    """Intersects a sorted list with a postings list decoded by blocks.
+
+    The blocks of the postings list whose last document is lower than the searched value are skipped
+    without being decoded.
+
+    Args:
+        values (list): Sorted list
+        postings: Postings list with a seek(target) cursor (BlockPostings)
+
+    Returns:
+        list: Sorted values present in both lists
+    """
+    result = []
+    for value in values:
+        found = postings.seek(value)
+        if found is None:
+            break
+        if found[0] == value:
+            result.append(value)
+    return result
+
+
+def intersect(postings_lists):
+    """Intersects sorted postings lists, starting with the shortest ones.
+
+    Args:
+        postings_lists (list): Sorted postings lists, as lists or as postings lists decoded by blocks
+
+    Returns:
+        list: Sorted values present in every list
+    """
+    if len(postings_lists) == 0:
+        return []
+    lists = sorted(postings_lists, key=len)
+    result = lists[0].to_lists()[0] if hasattr(lists[0], 'seek') else list(lists[0])
+    for postings in lists[1:]:
+        if len(result) == 0:
+            break
+        if hasattr(postings, 'seek'):
+            result = intersect_blocks(result, postings)
+        else:
+            result = intersect_pair(result, postings)
+    return result
@@ -1,8 +1,9 @@
 import os
 import json
-from requests import Requests
+import time
+from engine import SearchEngine
 
-def test_requests():
+def test_requests(workers=None):
     product_requests = [
         "Box of Chocolate Candy",
         "Chocolate",
@@ -27,38 +28,26 @@ def test_requests():
     ]
 
     folder_path = 'index_json/'
+    segment_path = 'index_segment/' if os.path.isdir('index_segment/') else None
+    updates_path = 'index_updates/' if os.path.isdir('index_updates/') else None
     results_dict = {}
 
-    for request in product_requests:
-        req = Requests(request, folder_path=folder_path)
-        req.load_indexes()
-        req.parse_jsonl("products.jsonl")
-        req.tokenize_request()
-        req.add_synonyms()
+    # Les index et les produits sont chargés une seule fois pour toutes les requêtes
+    engine = SearchEngine(folder_path=folder_path, products_path="products.jsonl", segment_path=segment_path, updates_path=updates_path)
 
-        number_of_documents = req.number_of_filtered_doc()[0]
-        number_of_filtered_documents = req.number_of_filtered_doc()[1]
-        ranked_products = req.rank_products_bm25()
-        
-        documents = [
-            {
-                "title": product[2],
-                "url": product[0],
-                "description": product[3],
-                "ranking_score": product[1]
-            } for product in ranked_products
-        ]
-        
-        results_dict[request] = {
-            "documents": documents,
-            "total_documents": number_of_documents,
-            "filtered_documents": number_of_filtered_documents
-        }
+    # Les requêtes sont classées en un seul lot, les mots communs ne sont décodés et notés qu'une fois
+    start = time.perf_counter()
+    results = engine.search_batch(product_requests, workers=workers)
+    elapsed = time.perf_counter() - start
+    for request, results_request in zip(product_requests, results):
+        results_dict[request] = results_request
 
     with open("request_results.json", "w", encoding="utf-8") as json_file:
         json.dump(results_dict, json_file, indent=4, ensure_ascii=False)
     
     print("Les résultats ont été enregistrés dans request_results.json")
+    print(f"{len(product_requests)} requêtes en {elapsed * 1000:.1f} ms, soit {len(product_requests) / elapsed:.0f} requêtes/s")
+    print(f"Cache des requêtes : {engine.cache_stats()}")
 
 if __name__ == "__main__":
     test_requests()
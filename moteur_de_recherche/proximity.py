@@ -0,0 +1,125 @@
+import re
+from bisect import bisect_left
+
+
+# Expressions entre guillemets, opérateurs NEAR/k et mots
+QUERY_PATTERN = re.compile(r'"([^"]*)"|\bNEAR/(\d+)\b|(\S+)')
+
+
+def has_operators(request):
+    """Checks whether a request holds a quoted phrase or a NEAR/k operator.
+    """
+    return '"' in request or 'NEAR/' in request
+
+
+def parse_request(request, tokenize):
+    """Splits a request into its tokens and its positional constraints.
+
+    "a b" asks for the tokens a and b next to each other and in this order. a NEAR/k b asks for a
+    and b (words or quoted phrases) at most k positions apart, in any order.
+
+    Args:
+        request (str): User request
+        tokenize (function): Analyzer of the requests
+
+    Returns:
+        tuple: Tokens of the request, in order, and constraints: ('phrase', tokens) or
+            ('near', k, left tokens, right tokens)
+    """
+    tokens = []
+    constraints = []
+    operands = []  # Mots et expressions déjà lus
+    near = None
+    for phrase, distance, word in QUERY_PATTERN.findall(request):
+        if distance:
+            near = int(distance)
+            continue
+        operand = tuple(tokenize(phrase if phrase else word))
+        if len(operand) == 0:
+            continue
+        tokens += operand
+        if phrase and len(operand) > 1:
+            constraints.append(('phrase', operand))
+        if near is not None and operands:
+            constraints.append(('near', near, operands[-1], operand))
+        operands.append(operand)
+        near = None
+    return tokens, list(dict.fromkeys(constraints))
+
+
+def phrase_occurrences(positions_lists):
+    """Start positions of a phrase in a document, from the sorted positions of each of its tokens.
+
+    The positions of the first token are walked once; the following tokens are searched with a
+    binary search starting after the previous match.
+    """
+    starts = []
+    cursors = [0] * len(positions_lists)
+    for start in positions_lists[0]:
+        for i in range(1, len(positions_lists)):
+            positions = positions_lists[i]
+            cursors[i] = bisect_left(positions, start + i, cursors[i])
+            if cursors[i] == len(positions):
+                return starts
+            if positions[cursors[i]] != start + i:
+                break
+        else:
+            starts.append(start)
+    return starts
+
+
+def min_distance(left, right, left_length, right_length):
+    """Smallest number of positions between the occurrences of two operands, in any order.
+
+    Args:
+        left (list): Sorted start positions of the left operand
+        right (list): Sorted start positions of the right operand
+        left_length (int): Number of tokens of the left operand
+        right_length (int): Number of tokens of the right operand
+
+    Returns:
+        int: Distance between the end of the first occurrence and the start of the second one
+            (1 when they are next to each other), None if there is no pair of occurrences that do
+            not overlap
+    """
+    best = None
+    for start in left:
+        # Première occurrence de droite après la fin de celle de gauche
+        j = bisect_left(right, start + left_length)
+        if j < len(right):
+            distance = right[j] - (start + left_length - 1)
+            best = distance if best is None else min(best, distance)
+        # Dernière occurrence de droite terminée avant le début de celle de gauche
+        j = bisect_left(right, start - right_length + 1) - 1
+        if j >= 0:
+            distance = start - (right[j] + right_length - 1)
+            best = distance if best is None else min(best, distance)
+    return best
+
+
+def proximity_score(constraints, positions):
+    """Checks the constraints of a request on a document and scores how close its tokens are.
+
+    Args:
+        constraints (list): Constraints returned by parse_request
+        positions (function): Returns the sorted positions of a token in the document
+
+    Returns:
+        float: Sum over the constraints of 1 for a phrase and 1 / distance for NEAR/k, None if a
+            constraint is not satisfied
+    """
+    score = 0.0
+    for constraint in constraints:
+        if constraint[0] == 'phrase':
+            if not phrase_occurrences([positions(token) for token in constraint[1]]):
+                return None
+            score += 1.0
+        else:
+            _, k, left, right = constraint
+            left_starts = phrase_occurrences([positions(token) for token in left])
+            right_starts = phrase_occurrences([positions(token) for token in right])
+            distance = min_distance(left_starts, right_starts, len(left), len(right))
+            if distance is None or distance > k:
+                return None
+            score += 1.0 / distance
+    return score
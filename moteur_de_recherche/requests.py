@@ -1,54 +1,72 @@
 import os
-import json
-import math
-from nltk.corpus import stopwords
-from nltk import download
-import copy
+import sys
+import heapq
+import itertools
+import functools
+from scoring import TermAtATimeScorer
+from intersection import intersect
+from synonyms import SynonymTable
+from proximity import has_operators, parse_request, proximity_score
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'index'))
+from analyzer import analyzer
+from index import index as Index
 
 
 class Requests:
-    def __init__(self, request, folder_path='index_json/'):
+    def __init__(self, request, folder_path='index_json/', engine=None):
         self.request = request
         self.folder_path = folder_path
-        self.json_files = [f for f in os.listdir(self.folder_path) if f.endswith('.json')]
         self.indexes = {}
+        self.statistics = {}
+        self.review_scores = None
+        self.static_orders = {}
+        self.exact_matches = {}
+        self.sorted_postings = {}
+        self.impact_postings = {}
+        self.number_of_documents = None
+        self.scorer = TermAtATimeScorer()
+        self.synonym_table = None
+        self.term_weights = None
+        self.clauses = None
+        self.constraints = []
+        self.proximity_scores = {}
+        self.proximity_weight = 2.0
+        self.filter_set = None  # Documents des filtres de facettes, None sans filtre
+        self.engine = engine
+        if engine is not None:
+            # Réutilise les index, documents et statistiques déjà chargés par le moteur
+            self.indexes = engine.indexes
+            self.synonyms = engine.synonyms
+            self.synonym_table = engine.synonym_table
+            self.statistics = engine.statistics
+            self.review_scores = engine.review_scores
+            self.static_orders = engine.static_orders
+            self.sorted_postings = engine.sorted_postings
+            self.impact_postings = engine.impact_postings
+            self.number_of_documents = engine.number_of_documents
+            self.scorer = engine.scorer
     
 
-    def load_indexes(self):
-        """Loads each saved index from JSON files.
-        """
-        for json_file in self.json_files:
-            file_path = os.path.join(self.folder_path, json_file)
-            name = os.path.splitext(json_file)[0]
-            try:
-                with open(file_path, "r", encoding="utf-8") as f:
-                    self.indexes[name] = json.load(f)
-            except FileNotFoundError:
-                print(f"Fichier {name}.json introuvable.")
-        self.synonyms = self.indexes['origin_synonyms']
-    
-
-    def parse_jsonl(self, file_path):
-        """Reads a JSONL file and returns a list of dictionaries.
+    @staticmethod
+    def decode_indexes(indexes, fields=('title', 'description')):
+        """Turns the postings lists of the loaded field indexes and statistics into {doc_id: value} dictionaries.
 
         Args:
-            file_path (str): Path to the JSONL file
-        
-        Returns:
-            list: A list of JSON objects
+            indexes (dict): Loaded JSON indexes, modified in place
+            fields (tuple): Indexed fields
         """
-        data = []
-        with open(file_path, 'r', encoding='utf-8') as file:
-            for line in file:
-                try:
-                    data.append(json.loads(line))
-                except json.JSONDecodeError as e:
-                    print(f"Erreur de décodage JSON sur la ligne: {line.strip()}\nErreur: {e}")
-        self.products = data
+        for field in fields:
+            if f"{field}_index" in indexes:
+                indexes[f"{field}_index"] = {token: dict(postings) for token, postings in indexes[f"{field}_index"].items()}
+            if f"{field}_stats" in indexes:
+                term_frequencies = indexes[f"{field}_stats"]['term_frequencies']
+                indexes[f"{field}_stats"]['term_frequencies'] = {token: dict(postings) for token, postings in term_frequencies.items()}
+    
 
     @staticmethod
     def tokenize(text):
-        """Tokenizes, normalizes and filters stopwords from text.
+        """Tokenizes, normalizes and filters stopwords from text with the analyzer shared with the indexer.
 
             Args:
                 char (char): char
@@ -56,187 +74,363 @@ class Requests:
             Returns:
                 list: list of filtered tokens
             """
-        download('stopwords')
-        stop_words = set(stopwords.words('english'))
-        tokens = text.split()
-        return [token.lower() for token in tokens if token.lower() not in stop_words]
+        return analyzer.tokenize(text)
 
 
     def tokenize_request(self):
         """Tokenizes request.
+
+        Quoted phrases and NEAR/k operators become positional constraints, checked on the exact matches.
         """
-        self.tokens_request = self.tokenize(self.request)
+        if has_operators(self.request):
+            self.tokens_request, self.constraints = parse_request(self.request, self.tokenize)
+        else:
+            self.tokens_request = self.tokenize(self.request)
     
 
     def add_synonyms(self):
-        """Add synonyms
-        """
-        expanded_list = []
+        """Adds the synonyms of the request tokens, with the synonym table compiled once.
 
-        for key, synonyms in self.synonyms.items():
-            synonym_group = synonyms + [key]
-            for i in range(len(self.tokens_request)):
-                if self.tokens_request[i] in synonym_group:
-                    expanded_list += synonym_group
-
-        expanded_list = list(set(self.tokens_request + expanded_list))
-        self.tokens_request = expanded_list
+        Multi-word entries match consecutive request tokens. The added tokens get a lower BM25 weight
+        than the request tokens, and each part of the request becomes a clause matched by any of its
+        synonyms for the exact matches.
+        """
+        if self.synonym_table is None:
+            self.synonym_table = SynonymTable(self.synonyms, self.tokenize)
+        self.tokens_request, self.term_weights, self.clauses = self.synonym_table.expand(self.tokens_request)
 
     
 
-    def verify_one_token(self, request_type):
-        """Checks whether at least one element of the list is a dictionary key.
-        
-        Returns:
-                bool
+    def get_sorted_postings(self, request_type, token):
+        """Returns the sorted list of documents containing a token, computed once per token.
         """
-        file = f"{request_type}_index"
-        return any(key in self.indexes[file] for key in self.tokens_request)
+        postings = self.sorted_postings.setdefault(request_type, {})
+        if token not in postings:
+            postings[token] = sorted(self.indexes[f"{request_type}_index"][token])
+        return postings[token]
 
-    
 
-    def verify_all_tokens(self, request_type):
-        """Checks if all elements of the list is a dictionary key.
-        
-        Returns:
-                bool
+    def get_impact_postings(self, request_type, token):
+        """Returns the (doc_id, tf, first_position) of a token by decreasing static score, computed once per token.
+
+        With these postings, the scorer stops adding new documents to the top k as soon as their static
+        score is too low for them to reach it.
         """
-        file = f"{request_type}_index"
-        return all(key in self.indexes[file] for key in self.tokens_request)
-    
+        postings = self.impact_postings.setdefault(request_type, {})
+        if token not in postings:
+            review_scores = self.get_review_scores()
+            field = {'index': self.indexes.get(f"{request_type}_index", {}), 'statistics': self.get_statistics(request_type)}
+            postings[token] = sorted(TermAtATimeScorer.postings(field, token), key=lambda entry: (-review_scores.get(entry[0], 0), entry[0]))
+        return postings[token]
+
 
     def exact_match(self, request_type):
         """Finds exact matches for the request in the index.
 
+        The sorted postings lists of the tokens are intersected, shortest first, with a galloping search.
+
         Args:
             request_type (char): request type for example : 'title', 'description'
 
         Returns:
             list: list of pages with each term of the request for the request type selected
         """
-        if not self.verify_all_tokens(request_type):
+        if self.clauses is None:
+            self.clauses = [((token,),) for token in dict.fromkeys(self.tokens_request)]
+        if len(self.clauses) == 0:
             return []
 
-        file = f"{request_type}_index"
-        if len(self.tokens_request) == 0:
-            return []
-        list_sites = list(self.indexes[file][self.tokens_request[0]])
-        if len(list_sites) == 0:
-            return []
-        list_sites_final = copy.deepcopy(list_sites)
+        index = self.indexes[f"{request_type}_index"]
+        statistics = self.get_statistics(request_type)
+        postings_lists = []
+        for clause in self.clauses:
+            phrases = [phrase for phrase in clause if all(token in index for token in phrase)]
+            if len(phrases) == 0:
+                return []
+            if len(clause) == 1 and len(clause[0]) == 1:
+                token = clause[0][0]
+                if 'postings' in statistics:
+                    # Listes décodées par blocs : les blocs sans candidat ne sont pas décodés
+                    postings_lists.append(statistics['postings'][token])
+                else:
+                    postings_lists.append(self.get_sorted_postings(request_type, token))
+            else:
+                # Union des documents de chacun des synonymes de la clause
+                documents = set()
+                for phrase in phrases:
+                    documents.update(intersect([self.get_sorted_postings(request_type, token) for token in phrase]))
+                postings_lists.append(sorted(documents))
+        matches = intersect(postings_lists)
+        if self.constraints:
+            matches = self.positional_filter(request_type, matches)
+        return matches
+
+
+    def positional_filter(self, request_type, doc_ids):
+        """Keeps the documents satisfying the phrases and NEAR/k operators of the request, and stores
+        their proximity score.
+
+        Only the documents of the conjunctive match are visited, with the positions of the index.
+
+        Args:
+            request_type (char): request type for example : 'title', 'description'
+            doc_ids (list): Sorted documents containing the request tokens
+
+        Returns:
+            list: Sorted documents satisfying every constraint
+        """
+        index = self.indexes[f"{request_type}_index"]
+        tokens = {token for constraint in self.constraints for operand in constraint[1:]
+                  if isinstance(operand, tuple) for token in operand}
+        postings = {token: index[token] if token in index else {} for token in tokens}
+        scores = self.proximity_scores.setdefault(request_type, {})
+
+        matches = []
+        for doc_id in doc_ids:
+            score = proximity_score(self.constraints, lambda token: postings[token].get(doc_id, []))
+            if score is not None:
+                scores[doc_id] = score
+                matches.append(doc_id)
+        return matches
 
-        for k in range(len(self.tokens_request)):
-            for i in range(len(list_sites)):
-                if list_sites[i] not in self.indexes[file][self.tokens_request[k]] and list_sites[i] in list_sites_final:
-                    list_sites_final.remove(list_sites[i])
 
-        return list_sites_final
-    
     @staticmethod
-    def idf(term, inverted_index, N):
-        """Calculates idf part
+    def compute_statistics(index, number_of_documents):
+        """Computes the BM25 statistics of a positional index.
+
+        Args:
+            index (dict): Index mapping tokens to {doc_id: [positions]}
+            number_of_documents (int): Number of documents of the doc table
+
+        Returns:
+            dict: Number of documents, average document length, document lengths, documents in order
+                of first appearance, document frequencies and term frequencies
+        """
+        doc_lengths = [0] * number_of_documents
+        doc_order = []
+        document_frequencies = {}
+        term_frequencies = {}
+        for token, postings in index.items():
+            document_frequencies[token] = len(postings)
+            term_frequencies[token] = {}
+            for doc_id, positions in postings.items():
+                if doc_lengths[doc_id] == 0:
+                    doc_order.append(doc_id)
+                doc_lengths[doc_id] += len(positions)
+                term_frequencies[token][doc_id] = len(positions)
+        N = len(doc_order)
+        avg_doc_length = sum(doc_lengths) / N if N > 0 else 1
+        return {
+            'N': N,
+            'avg_doc_length': avg_doc_length,
+            'doc_lengths': doc_lengths,
+            'doc_order': doc_order,
+            'document_frequencies': document_frequencies,
+            'term_frequencies': term_frequencies
+        }
+
+
+    def get_statistics(self, request_type):
+        """Returns the BM25 statistics of a field, written at index time when available.
+
+        Args:
+            request_type (char): request type for example : 'title', 'description'
+
+        Returns:
+            dict: BM25 statistics of the field
+        """
+        if request_type not in self.statistics:
+            statistics = self.indexes.get(f"{request_type}_stats")
+            if statistics is None:
+                index = self.indexes.get(f"{request_type}_index", {})
+                statistics = self.compute_statistics(index, len(self.indexes['doc_table']))
+            self.statistics[request_type] = statistics
+        return self.statistics[request_type]
+
+
+    def get_review_scores(self):
+        """Returns the review score of each document, read from the static scores written at index time.
+
+        Returns:
+            dict: review score for each document ID
+        """
+        if self.review_scores is None:
+            static_scores = self.indexes.get('static_scores')
+            if static_scores is None:
+                # Index sans scores statiques : ils sont calculés à partir des avis
+                static_scores = Index.build_static_scores(self.indexes.get('reviews_index', []))
+            self.review_scores = {doc_id: score for doc_id, score in enumerate(static_scores) if score is not None}
+        return self.review_scores
+
+
+    def get_static_order(self, request_type):
+        """Returns the documents of a field ordered by review score, then by order of appearance in the index.
+
+        Args:
+            request_type (char): request type for example : 'title', 'description'
+
+        Returns:
+            dict: rank of each document in the index and documents sorted by review score
         """
-        df = len(inverted_index.get(term, {}))
-        return math.log(1 + (N - df + 0.5) / (df + 0.5)) if df > 0 else 0
+        if request_type not in self.static_orders:
+            review_scores = self.get_review_scores()
+            ranks = {doc_id: rank for rank, doc_id in enumerate(self.get_statistics(request_type)['doc_order'])}
+            order = sorted(ranks, key=lambda doc_id: (-review_scores.get(doc_id, 0), ranks[doc_id]))
+            self.static_orders[request_type] = {'ranks': ranks, 'order': order}
+        return self.static_orders[request_type]
 
     
-    def compute_bm25_scores(self, index):
-        """Calculates the BM25 score for each document in a given index, considering token position"""
-        k1, b = 1.5, 0.75
-        doc_lengths = {}
-        for token, dico_url in index.items():
-            for url in dico_url.keys():
-                if url not in doc_lengths.keys():
-                    doc_lengths[url] = len(dico_url[url])
-                else:
-                    doc_lengths[url] += len(dico_url[url])
-        N = len(doc_lengths)
-        avg_doc_length = sum(doc_lengths.values()) / N if N > 0 else 1
-
-        inverted_index = {}
-        for token, dico_url in index.items():
-            dico_url_int = copy.deepcopy(dico_url)
-            inverted_index[token] = dico_url_int
-            for url in dico_url_int.keys():
-                inverted_index[token][url] = len(inverted_index[token][url])
-                
-        scores = {}
-        for doc_id in doc_lengths.keys():
-            score = 0
-            doc_length = doc_lengths.get(doc_id, 0)
-            for term in self.tokens_request:
-                if term in inverted_index and doc_id in inverted_index[term]:
-                    tf = inverted_index[term][doc_id]
-                    term_idf = self.idf(term, inverted_index, N)
-                    num = tf * (k1 + 1)
-                    denom = tf + k1 * (1 - b + b * (doc_length / avg_doc_length))
-                    bm25_term_score = term_idf * (num / denom)
-
-                    position_boost = 1
-                    dico_url = index[term]
-                    if doc_id in dico_url.keys():
-                        first_position = index[term][doc_id][0]  
-                        position_boost = 1 + (1 / (1 + math.log(first_position + 1)))
-
-                    score += bm25_term_score * position_boost 
-
-            scores[doc_id] = score
-        return scores
-
-
-    def rank_products_bm25(self):
-        """Classifies products by combining BM25, reviews, and exact matches"""
+    def compute_bm25_scores(self, request_type):
+        """Calculates the BM25 score of the documents containing a token of the request, considering token position.
+
+        Only the postings of the request tokens are visited, the other documents of the field have a score of 0.
+
+        Args:
+            request_type (char): request type for example : 'title', 'description'
+
+        Returns:
+            dict: BM25 score for each document containing at least one token of the request
+        """
+        field = {
+            'name': request_type,
+            'weight': 1.0,
+            'index': self.indexes.get(f"{request_type}_index", {}),
+            'statistics': self.get_statistics(request_type),
+            'allowed': None
+        }
+        return self.scorer.accumulate([field], self.tokens_request, term_weights=self.term_weights)[request_type]
+
+
+    def get_exact_match(self, request_type):
+        """Returns the exact matches of the request for a field, computed once per request.
+        """
+        if request_type not in self.exact_matches:
+            exact_match = self.exact_match(request_type)
+            if self.filter_set is not None:
+                exact_match = [doc_id for doc_id in exact_match if doc_id in self.filter_set]
+            self.exact_matches[request_type] = exact_match
+        return self.exact_matches[request_type]
+
+
+    def result_documents(self):
+        """Returns the documents ranked for the request when k is None, within the facet filters.
+
+        A field with exact matches only ranks them. A field without any ranks all of its documents,
+        the ones holding no token of the request by their review score alone.
+        """
+        documents = set()
+        for request_type in ['title', 'description']:
+            exact_match = self.get_exact_match(request_type)
+            if len(exact_match) > 0:
+                documents.update(exact_match)
+            elif self.filter_set is None:
+                documents.update(self.get_static_order(request_type)['ranks'])
+            else:
+                documents.update(doc_id for doc_id in self.get_static_order(request_type)['ranks'] if doc_id in self.filter_set)
+        return documents
+
+
+    def rank_products_bm25(self, k=None):
+        """Classifies products by combining BM25, reviews, and exact matches.
+
+        When a field has exact matches, only those documents are scored on this field. Otherwise every
+        document of the field is kept, the ones without any token of the request only get their review score.
+
+        Args:
+            k (int): Number of products to return, None to rank all of them
+
+        Returns:
+            list: [url, score, title, description] for each product, by decreasing score, empty when k is 0 or less
+        """
+        if k is not None and k <= 0:
+            return []
         weights = {'title': 2.0, 'description': 1.0}
-        scores = {}
+        review_scores = self.get_review_scores()
 
+        fields = []
         for request_type, weight in weights.items():
-            file = f"{request_type}_index"
-            index = self.indexes.get(file, {})
-            bm25_scores = self.compute_bm25_scores(index)
-            for url, score in bm25_scores.items():
-                if len(self.exact_match(request_type)) == 0:
-                    scores[url] = scores.get(url, 0) + score * weight
-
-                elif url in self.exact_match(request_type):
-                    scores[url] = scores.get(url, 0) + score * weight
-        
-        reviews_index = self.indexes.get('reviews_index', {})
-        for url, base_score in scores.items():
-            if url in reviews_index:
-                mean = reviews_index[url].get("mean_mark", 0)
-                total_reviews = reviews_index[url].get("total_reviews", 0)
-                last = reviews_index[url].get("last_rating", 0)
-                review_score = (mean * total_reviews + last) * math.log(1 + total_reviews) / (total_reviews + 1)
-                scores[url] += review_score
-
-        
-        list_ranked = [[url, base_score] for url, base_score in scores.items()]        
-        list_ranked.sort(key=lambda x: x[1], reverse = True)
+            exact_match = self.get_exact_match(request_type)
+            fields.append({
+                'name': request_type,
+                'weight': weight,
+                'index': self.indexes.get(f"{request_type}_index", {}),
+                'statistics': self.get_statistics(request_type),
+                'allowed': set(exact_match) if len(exact_match) > 0 else None,
+                'static_order': self.get_static_order(request_type),
+                # Sans contrainte de position, le score statique est celui des avis qui ordonne ces listes
+                'impact_postings': None if self.constraints else functools.partial(self.get_impact_postings, request_type)
+            })
+
+        def insertion_key(doc_id):
+            # Les égalités de score sont départagées par l'ordre d'apparition dans les index
+            for phase, field in enumerate(fields):
+                ranks = field['static_order']['ranks']
+                if (doc_id in field['allowed']) if field['allowed'] is not None else (doc_id in ranks):
+                    return (phase, ranks[doc_id])
+
+        static_scores = review_scores
+        if self.constraints:
+            # Score de proximité des documents qui respectent les expressions et NEAR/k de la requête
+            proximity = {}
+            for field in fields:
+                for doc_id, score in self.proximity_scores.get(field['name'], {}).items():
+                    if field['allowed'] is not None and doc_id in field['allowed']:
+                        proximity[doc_id] = proximity.get(doc_id, 0) + self.proximity_weight * score * field['weight']
+            static_scores = {doc_id: review_scores.get(doc_id, 0) + proximity.get(doc_id, 0)
+                             for doc_id in set(review_scores) | set(proximity)}
+
+        scoring_fields = fields
+        if self.filter_set is not None:
+            # Les correspondances exactes sont déjà filtrées, les autres champs sont limités aux filtres
+            scoring_fields = [dict(field, allowed=self.filter_set if field['allowed'] is None else field['allowed'])
+                              for field in fields]
+
+        scores = self.scorer.score_documents(scoring_fields, self.tokens_request, k, static_scores, self.term_weights)
+
+        candidates = set(scores)
+        scored = [(-score, insertion_key(doc_id), doc_id) for doc_id, score in scores.items()]
+
+        def fillers(phase):
+            # Documents sans aucun token de la requête, déjà triés par score d'avis
+            for doc_id in fields[phase]['static_order']['order']:
+                key = insertion_key(doc_id)
+                if doc_id in candidates or key[0] != phase:
+                    continue
+                if self.filter_set is None or doc_id in self.filter_set:
+                    yield (-review_scores.get(doc_id, 0), key, doc_id)
+
+        phases = [phase for phase, field in enumerate(fields) if field['allowed'] is None]
+        unscored = heapq.merge(*[fillers(phase) for phase in phases])
+        if k is not None:
+            unscored = itertools.islice(unscored, k)
 
         list_ranked_final = []
-        for i in range(len(list_ranked)):
-            for j in range(len(self.products)):
-                if self.products[j]['url'] == list_ranked[i][0]:
-                    title, description = self.products[j]['title'], self.products[j]['description']
-                    list_ranked_final.append(list_ranked[i] + [title, description])
+        for neg_score, _, doc_id in self.scorer.top_k(scored + list(unscored), k, key=lambda x: (x[0], x[1])):
+            product = self.engine.get_document(doc_id)
+            if product is not None:
+                title, description = product['title'], product['description']
+                list_ranked_final.append([product['url'], -neg_score, title, description])
         return list_ranked_final
     
 
+    def get_number_of_documents(self):
+        """Returns the number of documents present in the title or description index.
+        """
+        if self.number_of_documents is None:
+            list_doc = set()
+            for request_type in ['title', 'description']:
+                list_doc.update(self.get_statistics(request_type)['doc_order'])
+            self.number_of_documents = len(list_doc)
+        return self.number_of_documents
+
+
     def number_of_filtered_doc(self):
         """Gives the number of documents and the number of filtered documents
         """
         weights = {'title': 2.0, 'description': 1.0}
-        list_doc = []
-        filtered_doc = []
+        filtered_doc = set()
 
         for request_type, weight in weights.items():
-            file = f"{request_type}_index"
-            index = self.indexes.get(file, {})
-            for token, dico_url in index.items():
-                for url in dico_url.keys():
-                    if url not in list_doc:
-                        list_doc.append(url)
-                    if url in self.exact_match(request_type) and url not in filtered_doc:
-                        filtered_doc.append(url)
-
-        return [len(list_doc),len(filtered_doc)]
+            filtered_doc.update(self.get_exact_match(request_type))
+
+        return [self.get_number_of_documents(), len(filtered_doc)]
@@ -0,0 +1,264 @@
+import math
+import heapq
+
+
+class TermAtATimeScorer:
+    def __init__(self, k1=1.5, b=0.75):
+        """Term-at-a-time BM25 scorer.
+
+        The postings of the request tokens are walked one token at a time and added into
+        a score accumulator per field. When only the k best documents are needed, tokens
+        are visited by decreasing upper bound (MaxScore) and, once the remaining tokens can
+        no longer bring a new document into the top k, they only update the documents
+        already in the accumulator.
+
+        While term_cache is a dict (during a batch of requests), the scores of the postings of each
+        token are computed once and reused by every request of the batch.
+
+        Args:
+            k1 (float): BM25 term frequency saturation
+            b (float): BM25 length normalization
+        """
+        self.k1 = k1
+        self.b = b
+        self.term_cache = None
+
+
+    @staticmethod
+    def idf(df, N):
+        """Calculates idf part
+        """
+        return math.log(1 + (N - df + 0.5) / (df + 0.5)) if df > 0 else 0
+
+
+    @staticmethod
+    def position_boost(first_position):
+        """Boost given to a token according to its first position in the document
+        """
+        return 1 + (1 / (1 + math.log(first_position + 1)))
+
+
+    def term_weight(self, tf, doc_length, avg_doc_length):
+        """BM25 term frequency part, without idf
+        """
+        num = tf * (self.k1 + 1)
+        denom = tf + self.k1 * (1 - self.b + self.b * (doc_length / avg_doc_length))
+        return num / denom
+
+
+    def upper_bound(self, term, statistics):
+        """Highest score a token can give to a document of a field.
+
+        Uses the maximum written at index time when it was computed with the same parameters,
+        otherwise the theoretical maximum of the BM25 term frequency part and of the position boost.
+        """
+        max_term_weights = statistics.get('max_term_weights', {})
+        if statistics.get('k1') == self.k1 and statistics.get('b') == self.b and term in max_term_weights:
+            max_weight = max_term_weights[term]
+        else:
+            max_weight = (self.k1 + 1) * 2
+        return self.idf(statistics['document_frequencies'][term], statistics['N']) * max_weight
+
+
+    def ordered_terms(self, fields, tokens, k=None, term_weights=None):
+        """Lists the (field, token, upper bound) to score, by decreasing upper bound when only the k
+        best documents are needed (MaxScore), otherwise in the order of the fields and of the request.
+        """
+        term_weights = term_weights or {}
+        terms = []
+        for field in fields:
+            term_frequencies = field['statistics']['term_frequencies']
+            for term in tokens:
+                if term in term_frequencies:
+                    upper_bound = field['weight'] * term_weights.get(term, 1.0) * self.upper_bound(term, field['statistics'])
+                    terms.append((field, term, upper_bound))
+        if k is not None:
+            # MaxScore : les tokens au plus fort impact sont traités en premier
+            terms.sort(key=lambda x: x[2], reverse=True)
+        return terms
+
+
+    def accumulate(self, fields, tokens, k=None, static_scores=None, term_weights=None):
+        """Accumulates the BM25 scores of the documents containing the request tokens.
+
+        Args:
+            fields (list): One dict per field with 'name', 'weight', 'index' (positional index),
+                'statistics', 'allowed' (set of documents allowed to be scored, or None) and optionally
+                'impact_postings' (function returning the postings of a token by decreasing static score)
+            tokens (list): Request tokens
+            k (int): Number of documents needed, None to score every matching document, none of
+                them when 0 or less
+            static_scores (dict): Score added to each document independently of the request
+            term_weights (dict): Weight of the score of each token (1 for the tokens missing), lower for
+                the tokens added by the synonym expansion
+
+        Returns:
+            dict: For each field name, the BM25 score of the documents in the accumulator
+        """
+        static_scores = static_scores or {}
+        term_weights = term_weights or {}
+        accumulators = {field['name']: {} for field in fields}
+        if k is not None and k <= 0:
+            return accumulators
+
+        terms = self.ordered_terms(fields, tokens, k, term_weights)
+        remaining = [0] * (len(terms) + 1)
+        for i in range(len(terms) - 1, -1, -1):
+            remaining[i] = remaining[i + 1] + terms[i][2]
+        max_static = max(static_scores.values(), default=0)
+
+        candidates = set()
+        essential = True
+        for i, (field, term, upper_bound) in enumerate(terms):
+            cutoff = None
+            if k is not None and essential and len(candidates) >= k > 0:
+                threshold = self.threshold(accumulators, fields, candidates, k, static_scores)
+                if remaining[i] + max_static < threshold:
+                    essential = False
+                # Un nouveau document n'entre dans le top k que si son score statique atteint cutoff
+                cutoff = threshold - remaining[i]
+
+            impact_postings = field.get('impact_postings')
+            allowed = field['allowed']
+            term_weight = term_weights.get(term, 1.0)
+            accumulator = accumulators[field['name']]
+
+            if self.term_cache is not None:
+                entries = self.term_scores(field, term)
+                if not essential:
+                    entries = [entry for entry in entries if entry[0] in candidates]
+            elif essential and cutoff is not None and impact_postings is not None:
+                entries = self.score_postings(field, term, self.impact_walk(impact_postings(term), candidates, static_scores, cutoff))
+            elif essential:
+                entries = self.score_postings(field, term, self.postings(field, term))
+            else:
+                # Les documents absents de l'accumulateur ne peuvent plus entrer dans le top k
+                entries = self.score_postings(field, term, self.probe(field, term, candidates))
+
+            for doc, score, boost in entries:
+                if allowed is not None and doc not in allowed:
+                    continue
+                score *= boost * term_weight
+                accumulator[doc] = accumulator.get(doc, 0) + score
+                candidates.add(doc)
+
+        return accumulators
+
+
+    def score_documents(self, fields, tokens, k=None, static_scores=None, term_weights=None):
+        """Final score of the documents containing the request tokens: weighted sum of their field
+        scores, plus their static score.
+
+        Takes the same arguments as accumulate; a field only counts for the documents it allows.
+
+        Returns:
+            dict: Score of each document of the accumulators
+        """
+        static_scores = static_scores or {}
+        accumulators = self.accumulate(fields, tokens, k, static_scores, term_weights)
+        candidates = set()
+        for field in fields:
+            candidates.update(accumulators[field['name']])
+        scores = {}
+        for doc_id in candidates:
+            score = 0
+            for field in fields:
+                if field['allowed'] is None or doc_id in field['allowed']:
+                    score = score + accumulators[field['name']].get(doc_id, 0) * field['weight']
+            if doc_id in static_scores:
+                score += static_scores[doc_id]
+            scores[doc_id] = score
+        return scores
+
+
+    def score_postings(self, field, term, entries):
+        """Iterates over the (doc_id, BM25 score, position boost) of postings of a token, the score
+        not yet weighted by the position boost and the weight of the token.
+        """
+        statistics = field['statistics']
+        doc_lengths = statistics['doc_lengths']
+        avg_doc_length = statistics['avg_doc_length']
+        term_idf = self.idf(statistics['document_frequencies'][term], statistics['N'])
+        for doc, tf, first_position in entries:
+            yield doc, term_idf * self.term_weight(tf, doc_lengths[doc], avg_doc_length), self.position_boost(first_position)
+
+
+    def term_scores(self, field, term):
+        """Returns the (doc_id, BM25 score, position boost) of all the postings of a token, computed
+        once per batch of requests.
+        """
+        key = (field['name'], term)
+        if key not in self.term_cache:
+            self.term_cache[key] = list(self.score_postings(field, term, self.postings(field, term)))
+        return self.term_cache[key]
+
+
+    @staticmethod
+    def impact_walk(entries, candidates, static_scores, cutoff):
+        """Walks postings ordered by decreasing static score. Once the static score of the documents drops
+        below cutoff, only the documents already in the accumulator are returned.
+        """
+        for position, entry in enumerate(entries):
+            if static_scores.get(entry[0], 0) < cutoff:
+                yield from (entry for entry in entries[position:] if entry[0] in candidates)
+                return
+            yield entry
+
+
+    @staticmethod
+    def postings(field, term):
+        """Iterates over the (doc_id, tf, first_position) of a token in a field.
+        """
+        block_postings = field['statistics'].get('postings')
+        if block_postings is not None:
+            return iter(block_postings[term])
+        positions = field['index'][term]
+        return ((doc, tf, positions[doc][0]) for doc, tf in field['statistics']['term_frequencies'][term].items())
+
+
+    @staticmethod
+    def probe(field, term, docs):
+        """Returns the (doc_id, tf, first_position) of a token for the given documents only.
+
+        With postings decoded by blocks, the documents are searched in increasing order and the blocks
+        without any of them are skipped.
+        """
+        block_postings = field['statistics'].get('postings')
+        if block_postings is not None:
+            cursor = block_postings[term]
+            entries = []
+            for doc in sorted(docs):
+                found = cursor.seek(doc)
+                if found is None:
+                    break
+                if found[0] == doc:
+                    entries.append(found)
+            return entries
+        postings = field['statistics']['term_frequencies'][term]
+        positions = field['index'][term]
+        return [(doc, postings[doc], positions[doc][0]) for doc in docs if doc in postings]
+
+
+    @staticmethod
+    def threshold(accumulators, fields, candidates, k, static_scores):
+        """Score of the k-th best document of the accumulator, a lower bound of the final k-th score,
+        minus infinity while there are fewer than k documents
+        """
+        if k <= 0 or len(candidates) < k:
+            return -math.inf
+        lower_bounds = []
+        for doc in candidates:
+            score = 0
+            for field in fields:
+                score += accumulators[field['name']].get(doc, 0) * field['weight']
+            lower_bounds.append(score + static_scores.get(doc, 0))
+        return heapq.nlargest(k, lower_bounds)[-1]
+
+
+    @staticmethod
+    def top_k(items, k, key):
+        """Returns the k smallest items according to key through a bounded heap, or all of them sorted.
+        """
+        if k is None:
+            return sorted(items, key=key)
+        return heapq.nsmallest(max(k, 0), items, key=key)
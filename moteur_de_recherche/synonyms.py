@@ -0,0 +1,78 @@
+# Clé des nœuds du trie qui terminent une expression : groupes de synonymes de l'expression
+END = None
+
+
+class SynonymTable:
+    def __init__(self, synonyms, tokenize, weight=0.5):
+        """Synonym table compiled once: every entry is tokenized with the request analyzer and stored
+        in a trie of tokens, so that multi-word entries ("united states of america") match the tokens
+        of a request.
+
+        Args:
+            synonyms (dict): Synonym groups, each key mapped to its list of synonyms
+            tokenize (function): Analyzer of the requests, applied to every entry
+            weight (float): BM25 weight of the tokens added by the expansion, the tokens of the
+                request keep a weight of 1
+        """
+        self.weight = weight
+        self.groups = []
+        self.trie = {}
+        for key, values in synonyms.items():
+            phrases = [tuple(tokenize(phrase)) for phrase in [key] + list(values)]
+            phrases = [phrase for phrase in dict.fromkeys(phrases) if phrase]
+            group_id = len(self.groups)
+            self.groups.append(phrases)
+            for phrase in phrases:
+                node = self.trie
+                for token in phrase:
+                    node = node.setdefault(token, {})
+                node.setdefault(END, []).append(group_id)
+
+
+    def match(self, tokens, start):
+        """Finds the longest entry of the table starting at a position of the request.
+
+        Args:
+            tokens (list): Request tokens
+            start (int): Position of the first token
+
+        Returns:
+            tuple: Number of tokens matched (0 if none) and synonym groups of the entry
+        """
+        node = self.trie
+        length, groups = 0, []
+        for position in range(start, len(tokens)):
+            node = node.get(tokens[position])
+            if node is None:
+                break
+            if END in node:
+                length, groups = position - start + 1, node[END]
+        return length, groups
+
+
+    def expand(self, tokens):
+        """Expands the request tokens with their synonyms in one pass.
+
+        Args:
+            tokens (list): Request tokens
+
+        Returns:
+            tuple: Tokens (request tokens first, without duplicates), BM25 weight of each token, and
+                clauses: for each part of the request, the phrases (tuples of tokens) that can match it
+        """
+        weights = dict.fromkeys(tokens, 1.0)
+        clauses = []
+        position = 0
+        while position < len(tokens):
+            length, groups = self.match(tokens, position)
+            if length == 0:
+                clauses.append(((tokens[position],),))
+                position += 1
+                continue
+            phrases = list(dict.fromkeys(phrase for group_id in groups for phrase in self.groups[group_id]))
+            for phrase in phrases:
+                for token in phrase:
+                    weights.setdefault(token, self.weight)
+            clauses.append(tuple(phrases))
+            position += length
+        return list(weights), weights, list(dict.fromkeys(clauses))
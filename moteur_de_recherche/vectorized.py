@@ -0,0 +1,167 @@
+from scoring import TermAtATimeScorer
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class ColumnarPostings:
+    def __init__(self, statistics):
+        """Postings of a field stored by columns: for each token, the arrays of its document IDs, term
+        frequencies and first positions, built the first time the token is scored.
+
+        Args:
+            statistics (dict): BM25 statistics of the field
+        """
+        self.doc_lengths = np.asarray(statistics['doc_lengths'], dtype=np.float64)
+        self.columns = {}
+
+
+    def get(self, field, term):
+        """Returns the document IDs, term frequencies and first positions of a token.
+        """
+        if term not in self.columns:
+            entries = list(TermAtATimeScorer.postings(field, term))
+            columns = np.array(entries, dtype=np.int64).reshape(-1, 3)
+            self.columns[term] = (columns[:, 0].copy(), columns[:, 1].astype(np.float64), columns[:, 2].astype(np.float64))
+        return self.columns[term]
+
+
+class VectorizedScorer(TermAtATimeScorer):
+    def __init__(self, k1=1.5, b=0.75):
+        """BM25 scorer computing the score of all the postings of a token with one NumPy expression.
+
+        The field accumulators are dense vectors indexed by document ID. Every posting is scored,
+        MaxScore is not needed since a token costs one array operation whatever its number of
+        documents. The scores match those of TermAtATimeScorer up to rounding.
+
+        Args:
+            k1 (float): BM25 term frequency saturation
+            b (float): BM25 length normalization
+        """
+        if np is None:
+            raise ImportError("NumPy est nécessaire pour VectorizedScorer")
+        super().__init__(k1, b)
+        self.columns = {}
+
+
+    @staticmethod
+    def available():
+        """Checks whether NumPy is installed.
+        """
+        return np is not None
+
+
+    def columnar(self, field):
+        """Returns the columnar postings of a field, kept by the scorer apart from the statistics
+        shared with the engine, and built again when the statistics of the field are replaced.
+        """
+        statistics = field['statistics']
+        cached = self.columns.get(field['name'])
+        if cached is None or cached[0] is not statistics:
+            cached = (statistics, ColumnarPostings(statistics))
+            self.columns[field['name']] = cached
+        return cached[1]
+
+
+    @staticmethod
+    def mask(docs, size):
+        """Boolean vector of the documents of a set.
+        """
+        mask = np.zeros(size, dtype=bool)
+        if docs:
+            mask[np.fromiter(docs, dtype=np.int64, count=len(docs))] = True
+        return mask
+
+
+    def field_scores(self, fields, tokens, k=None, term_weights=None):
+        """Scores every posting of the request tokens.
+
+        Returns:
+            tuple: Dense score vector of each field, boolean vector of the documents allowed by
+                each field (None if all of them are), and boolean vector of the documents scored
+                in each field
+        """
+        term_weights = term_weights or {}
+        size = max(len(field['statistics']['doc_lengths']) for field in fields)
+        accumulators = {field['name']: np.zeros(size) for field in fields}
+        allowed = {field['name']: None if field['allowed'] is None else self.mask(field['allowed'], size)
+                   for field in fields}
+        scored = {field['name']: np.zeros(size, dtype=bool) for field in fields}
+
+        # Même ordre d'addition que TermAtATimeScorer, pour obtenir les mêmes sommes
+        for field, term, _ in self.ordered_terms(fields, tokens, k, term_weights):
+            docs, scores, boosts = self.column_scores(field, term)
+            if allowed[field['name']] is not None:
+                keep = allowed[field['name']][docs]
+                docs, scores, boosts = docs[keep], scores[keep], boosts[keep]
+            scores = scores * (boosts * term_weights.get(term, 1.0))
+            accumulators[field['name']][docs] += scores  # Un document apparaît une fois par token
+            scored[field['name']][docs] = True
+        return accumulators, allowed, scored
+
+
+    def score_columns(self, field, term):
+        """Returns the document IDs, BM25 scores and position boosts of all the postings of a token as
+        arrays, the scores not yet weighted by the position boost and the weight of the token.
+        """
+        statistics = field['statistics']
+        columns = self.columnar(field)
+        docs, tf, first_position = columns.get(field, term)
+        term_idf = self.idf(statistics['document_frequencies'][term], statistics['N'])
+        denom = tf + self.k1 * (1 - self.b + self.b * (columns.doc_lengths[docs] / statistics['avg_doc_length']))
+        return docs, term_idf * (tf * (self.k1 + 1) / denom), 1 + 1 / (1 + np.log(first_position + 1))
+
+
+    def column_scores(self, field, term):
+        """Returns the arrays of score_columns for a token, kept in term_cache during a batch of requests.
+        """
+        if self.term_cache is None:
+            return self.score_columns(field, term)
+        key = (field['name'], term)
+        if key not in self.term_cache:
+            self.term_cache[key] = self.score_columns(field, term)
+        return self.term_cache[key]
+
+
+    def accumulate(self, fields, tokens, k=None, static_scores=None, term_weights=None):
+        """Accumulates the BM25 scores of the documents containing the request tokens.
+
+        Same arguments and result as TermAtATimeScorer.accumulate.
+        """
+        if k is not None and k <= 0:
+            return {field['name']: {} for field in fields}
+        accumulators, _, scored = self.field_scores(fields, tokens, k, term_weights)
+        results = {}
+        for name, accumulator in accumulators.items():
+            docs = np.flatnonzero(scored[name])
+            results[name] = dict(zip(docs.tolist(), accumulator[docs].tolist()))
+        return results
+
+
+    def score_documents(self, fields, tokens, k=None, static_scores=None, term_weights=None):
+        """Final score of the documents containing the request tokens, computed on the dense vectors:
+        weighted sum of the field scores of the allowed documents, plus the static scores.
+
+        Same arguments and result as TermAtATimeScorer.score_documents.
+        """
+        if not fields or (k is not None and k <= 0):
+            return {}
+        accumulators, allowed, scored = self.field_scores(fields, tokens, k, term_weights)
+        size = len(next(iter(scored.values())))
+        total = np.zeros(size)
+        candidates = np.zeros(size, dtype=bool)
+        for field in fields:
+            candidates |= scored[field['name']]
+            field_total = accumulators[field['name']] * field['weight']
+            if allowed[field['name']] is not None:
+                field_total = np.where(allowed[field['name']], field_total, 0.0)
+            total = total + field_total
+        if static_scores:
+            docs = np.fromiter(static_scores.keys(), dtype=np.int64, count=len(static_scores))
+            values = np.fromiter(static_scores.values(), dtype=np.float64, count=len(static_scores))
+            inside = docs < size
+            total[docs[inside]] += values[inside]
+        docs = np.flatnonzero(candidates)
+        return dict(zip(docs.tolist(), total[docs].tolist()))
@@ -0,0 +1,35 @@
+import os
+import sys
+import pytest
+
+# Les modules sont importés comme des scripts, depuis leur dossier (comme avec python crawler/main.py)
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for folder in ('crawler', 'index', 'moteur_de_recherche'):
+    path = os.path.join(ROOT, folder)
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+from tests.local_site import Site, catalog, ROBOTS
+
+
+@pytest.fixture
+def site():
+    """Catalogue de 20 pages produit servi en local."""
+    with Site(catalog(), ROBOTS) as site:
+        yield site
+
+
+@pytest.fixture(scope="session")
+def catalog_paths(tmp_path_factory):
+    """products.jsonl, index JSON et segment du petit catalogue de produits (tests/local_products.py)."""
+    from tests.local_products import write_catalog
+    return write_catalog(str(tmp_path_factory.mktemp("catalog")))
+
+
+@pytest.fixture(scope="module", params=['json', 'segment'])
+def engine(request, catalog_paths):
+    """Moteur de recherche chargé sur les index JSON puis sur le segment binaire du petit catalogue."""
+    from engine import SearchEngine
+    products_path, index_path, segment_path = catalog_paths
+    return SearchEngine(folder_path=index_path, products_path=products_path,
+                        segment_path=segment_path if request.param == 'segment' else None)
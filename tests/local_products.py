@@ -0,0 +1,105 @@
+import os
+import json
+import importlib.util
+from analyzer import analyzer
+from index import index as Index
+
+
+FIELDS = ('title', 'description')
+
+# (titre, description, marque, origine, notes des avis)
+CATALOG = [
+    ("Dark Chocolate Box", "A box of dark chocolate candy made with the best cacao", "ChocoDelight", "Switzerland", [5, 4, 5]),
+    ("Milk Chocolate Bar", "Creamy milk chocolate bar with hazelnut and a hint of dark caramel", "ChocoDelight", "USA", [4]),
+    ("Chocolate Candy Box", "Assorted candy box with chocolate and caramel", "Sweet Co", "USA", []),
+    ("Running Shoes for Men", "Light running shoes with breathable mesh for men", "RunFast", "Italy", [3, 4]),
+    ("Women's Sandals", "Comfortable sandals for women made of summer leather", "SunStep", "Italy", [5]),
+    ("Classic Sneakers", "Classic white sneakers comfortable for running errands", "RunFast", "USA", [2, 3, 4, 5]),
+    ("Kids' Sneakers", "Colorful sneakers for kids with light soles", "RunFast", "France", [4, 4]),
+    ("Energy Potion", "Red energy potion a drink with dark berry flavor", "Potionz", "France", [1]),
+    ("Hiking Boots", "Leather hiking boots for men waterproof and light", "TrailCo", "Italy", []),
+    ("Box of Chocolate Candy", "Dark chocolate candy in a gift box with twelve pieces of chocolate", "Sweet Co", "Switzerland", [5, 5]),
+    ("Mesh Running Cap", "Running cap with light mesh shoes not included", "RunFast", "USA", [3]),
+    ("Dark Roast Coffee", "Dark roast coffee beans with notes of chocolate and caramel", "BeanHouse", "Brazil", [4, 5]),
+    ("Gift Card", "", "Sweet Co", "France", []),
+    ("Leather Boots for Women", "Dark leather boots for women with a light sole and running comfort", "TrailCo", "USA", [4, 2, 5]),
+]
+
+SYNONYMS = {'usa': ['united states', 'america'], 'france': ['fr']}
+
+
+def products():
+    """Produits du catalogue, au format de products.jsonl."""
+    return [{
+        'url': f"https://shop.test/product/{i}",
+        'title': title,
+        'description': description,
+        'product_features': {'brand': brand, 'made in': origin},
+        'product_reviews': [{'rating': rating, 'text': "avis"} for rating in ratings]
+    } for i, (title, description, brand, origin, ratings) in enumerate(CATALOG)]
+
+
+def write_products(products_path, catalog):
+    """Écrit des produits au format de products.jsonl."""
+    with open(products_path, "w", encoding="utf-8") as f:
+        for product in catalog:
+            f.write(json.dumps(product, ensure_ascii=False) + "\n")
+
+
+def write_catalog(folder, catalog=None):
+    """
+    Écrit products.jsonl et ses index dans un dossier, au format de index_json/ : index positionnels des
+    titres et descriptions (positions à partir de 0, analyseur partagé), facettes, avis, table des
+    documents, statistiques BM25, scores statiques et segment binaire.
+
+    Args:
+        folder (str): Dossier de destination
+        catalog (list): Produits, ceux de products() si None
+
+    Returns:
+        tuple: Chemins de products.jsonl, du dossier des index JSON et du segment
+    """
+    products_path = os.path.join(folder, "products.jsonl")
+    write_products(products_path, products() if catalog is None else catalog)
+
+    index_path = os.path.join(folder, "index_json")
+    os.makedirs(index_path, exist_ok=True)
+    builder = Index(products_path)
+    indexes = {
+        'doc_table': builder.build_doc_table(),
+        'reviews_index': [Index.review_entry(product['product_reviews']) for product in builder.data],
+        'brand_index': {},
+        'origin_index': {},
+        'origin_synonyms': SYNONYMS
+    }
+    for field in FIELDS:
+        field_index = {}
+        for doc_id, product in enumerate(builder.data):
+            for position, token in enumerate(analyzer.tokenize(product[field])):
+                postings = field_index.setdefault(token, {})
+                postings.setdefault(doc_id, []).append(position)
+        indexes[f"{field}_index"] = {token: [[doc_id, positions] for doc_id, positions in postings.items()]
+                                     for token, postings in field_index.items()}
+    for doc_id, product in enumerate(builder.data):
+        features = product['product_features']
+        indexes['brand_index'].setdefault(features['brand'].lower().replace(" ", ""), []).append(doc_id)
+        indexes['origin_index'].setdefault(features['made in'].lower(), []).append(doc_id)
+
+    for name, value in indexes.items():
+        with open(os.path.join(index_path, f"{name}.json"), "w", encoding="utf-8") as f:
+            json.dump(value, f, ensure_ascii=False)
+    builder.save_field_statistics(index_path)
+    builder.save_static_scores(index_path)
+
+    segment_path = os.path.join(folder, "index_segment")
+    builder.save_segment(index_path, segment_path)
+    return products_path, index_path, segment_path
+
+
+def load_index_main():
+    """index/main.py, importé sous un autre nom que les main.py du crawler et du moteur de recherche."""
+    path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "index", "main.py")
+    spec = importlib.util.spec_from_file_location("index_main", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
@@ -0,0 +1,107 @@
+import gzip
+import hashlib
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+
+class Site:
+    """
+    Site local servi par http.server : robots.txt avec sitemap et Crawl-delay, pages avec ETag et
+    Last-Modified (réponse 304 si If-None-Match correspond) et compressées en gzip si le client l'accepte.
+    """
+
+    def __init__(self, pages=None, robots=None):
+        self.pages = dict(pages or {})  # chemin -> HTML, modifiable pendant un test
+        self.robots = robots
+        self.requests = []  # (chemin, en-têtes) de chaque requête reçue
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), self.handler())
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.thread = threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True)
+
+
+    def handler(self):
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def send_body(self, status, body, content_type):
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                site.requests.append((self.path, dict(self.headers)))
+                if self.path == '/robots.txt':
+                    if site.robots is None:
+                        return self.send_body(404, b'', 'text/plain')
+                    if isinstance(site.robots, int):
+                        return self.send_body(site.robots, b'', 'text/plain')
+                    return self.send_body(200, site.robots.replace('HOST', site.url).encode(), 'text/plain')
+                if self.path == '/sitemap.xml':
+                    locs = ''.join(f"<url><loc>{site.url}{path}</loc></url>" for path in site.pages if path.startswith('/produit/'))
+                    sitemap = f'<?xml version="1.0"?><urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{locs}</urlset>'
+                    return self.send_body(200, sitemap.encode(), 'application/xml')
+                if self.path not in site.pages:
+                    return self.send_body(404, b'', 'text/html')
+
+                body = site.pages[self.path].replace('HOST', site.url).encode()
+                etag = '"' + hashlib.md5(body).hexdigest() + '"'
+                if self.headers.get('If-None-Match') == etag:
+                    self.send_response(304)
+                    self.send_header('ETag', etag)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('ETag', etag)
+                self.send_header('Last-Modified', 'Mon, 01 Jan 2024 00:00:00 GMT')
+                if 'gzip' in self.headers.get('Accept-Encoding', ''):
+                    body = gzip.compress(body)
+                    self.send_header('Content-Encoding', 'gzip')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        return Handler
+
+
+    def paths(self):
+        """Chemins des requêtes reçues, dans l'ordre."""
+        return [path for path, _ in self.requests]
+
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def product_page(i, title=None):
+    return (f"<html><head><title>{title or f'Produit {i}'}</title></head><body>"
+            f"<div>menu</div><p>Description du <b>produit {i}</b>. " + "Chocolat noir. " * 20 + "</p><p>second</p>"
+            f'<a href="/products/0">accueil</a><a href="../products/{(i + 1) % 20}#avis">suivant</a>'
+            f'<a href="https://example.org/">externe</a></body></html>')
+
+
+def catalog():
+    """20 pages produit reliées depuis la première, une page interdite par robots.txt et une page du sitemap."""
+    pages = {f"/products/{i}": product_page(i) for i in range(20)}
+    pages['/products/0'] = pages['/products/0'].replace(
+        '</body>', ''.join(f'<a href="HOST/products/{i}">p{i}</a>' for i in range(1, 20)) + '<a href="/private/x">x</a></body>')
+    pages['/private/x'] = "<html><title>privé</title></html>"
+    pages['/produit/sitemap'] = "<html><title>Sitemap</title><p>Seulement dans le sitemap</p></html>"
+    return pages
+
+
+ROBOTS = "User-agent: *\nCrawl-delay: 0\nDisallow: /private\nSitemap: HOST/sitemap.xml\n"
@@ -0,0 +1,131 @@
+import math
+from analyzer import analyzer
+from requests import Requests
+from tests.local_products import products, FIELDS
+
+
+K1, B = 1.5, 0.75
+WEIGHTS = {'title': 2.0, 'description': 1.0}
+ORIGIN_ALIASES = {'united states': 'usa', 'america': 'usa', 'fr': 'france'}
+# Les scores sont sommés dans un autre ordre que la référence : égaux au dernier bit près seulement
+TOLERANCE = 1e-12
+
+REQUESTS = ["dark chocolate", "Chocolate Candy Box", "running shoes", "leather boots women", "light", "caramel",
+            "Sandals", "dark roast coffee chocolate", "box box chocolate", "unknown word", "sneakers kids"]
+POSITIONAL_REQUESTS = ['"dark chocolate"', '"chocolate candy"', 'dark NEAR/2 chocolate', '"light mesh" NEAR/3 running',
+                       'boots NEAR/1 leather', '"box chocolate"', 'chocolate NEAR/1 "candy box"']
+FILTERS = [{'brand': 'RunFast'}, {'origin': 'united states'}, {'origin': ['usa', 'Italy'], 'brand': 'trailco'},
+           {'brand': 'sweet co'}, {'brand': 'unknown'}]
+
+
+# Référence par force brute, calculée directement sur le texte des produits
+
+def field_tokens(field):
+    return [analyzer.tokenize(product[field]) for product in products()]
+
+
+def static_score(product):
+    ratings = [review['rating'] for review in product['product_reviews']]
+    total = len(ratings)
+    mean = sum(ratings) / total if total else 0
+    last = ratings[-1] if ratings else 0
+    return (mean * total + last) * math.log(1 + total) / (total + 1)
+
+
+def bm25(documents, tokens):
+    lengths = [len(document) for document in documents]
+    N = sum(1 for length in lengths if length)
+    avg_doc_length = sum(lengths) / N
+    scores = {}
+    for token in tokens:
+        docs = [doc_id for doc_id, document in enumerate(documents) if token in document]
+        if not docs:
+            continue
+        idf = math.log(1 + (N - len(docs) + 0.5) / (len(docs) + 0.5))
+        for doc_id in docs:
+            tf = documents[doc_id].count(token)
+            boost = 1 + 1 / (1 + math.log(documents[doc_id].index(token) + 1))
+            weight = tf * (K1 + 1) / (tf + K1 * (1 - B + B * lengths[doc_id] / avg_doc_length))
+            scores[doc_id] = scores.get(doc_id, 0) + idf * weight * boost
+    return scores
+
+
+def matches_filters(product, filters):
+    features = product['product_features']
+    for facet, values in (filters or {}).items():
+        values = [values] if isinstance(values, str) else values
+        if facet == 'brand':
+            if features['brand'].lower().replace(" ", "") not in [value.lower().replace(" ", "") for value in values]:
+                return False
+        elif features['made in'].lower() not in [ORIGIN_ALIASES.get(value.lower(), value.lower()) for value in values]:
+            return False
+    return True
+
+
+def reference_search(request, filters=None):
+    """Score of each ranked document, exact matches and documents matching the request."""
+    tokens = list(dict.fromkeys(analyzer.tokenize(request)))
+    allowed_documents = {doc_id for doc_id, product in enumerate(products()) if matches_filters(product, filters)}
+    documents = {field: field_tokens(field) for field in FIELDS}
+    exact = {field: {doc_id for doc_id in allowed_documents if tokens and all(token in documents[field][doc_id] for token in tokens)}
+             for field in FIELDS}
+
+    scores = {}
+    for field, weight in WEIGHTS.items():
+        allowed = exact[field] or allowed_documents
+        for doc_id, score in bm25(documents[field], tokens).items():
+            if doc_id in allowed:
+                scores[doc_id] = scores.get(doc_id, 0) + weight * score
+    results = {doc_id: score + static_score(products()[doc_id]) for doc_id, score in scores.items()}
+    # Documents sans token de la requête, classés par leur seul score statique
+    for field in FIELDS:
+        if not exact[field]:
+            for doc_id in allowed_documents:
+                if documents[field][doc_id] and doc_id not in results:
+                    results[doc_id] = static_score(products()[doc_id])
+
+    matching = exact['title'] | exact['description']
+    if not matching:
+        matching = {doc_id for doc_id in allowed_documents
+                    if any(token in documents[field][doc_id] for field in FIELDS for token in tokens)}
+    return results, exact, matching
+
+
+def positional_matches(request, field):
+    """Documents of a field holding the tokens of a request and satisfying its phrases and NEAR/k."""
+    def starts(document, phrase):
+        return [i for i in range(len(document)) if tuple(document[i:i + len(phrase)]) == phrase]
+
+    def distance(document, left, right):
+        best = None
+        for a in starts(document, left):
+            for b in starts(document, right):
+                if b >= a + len(left):
+                    value = b - (a + len(left) - 1)
+                elif b + len(right) <= a:
+                    value = a - (b + len(right) - 1)
+                else:
+                    continue
+                best = value if best is None else min(best, value)
+        return best
+
+    req = Requests(request)
+    req.tokenize_request()
+    matches = []
+    for doc_id, document in enumerate(field_tokens(field)):
+        if not all(token in document for token in req.tokens_request):
+            continue
+        satisfied = True
+        for constraint in req.constraints:
+            if constraint[0] == 'phrase':
+                satisfied &= bool(starts(document, constraint[1]))
+            else:
+                value = distance(document, constraint[2], constraint[3])
+                satisfied &= value is not None and value <= constraint[1]
+        if satisfied:
+            matches.append(doc_id)
+    return matches
+
+
+def doc_id(url):
+    return int(url.rsplit("/", 1)[1])
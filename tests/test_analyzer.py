@@ -0,0 +1,51 @@
+import pytest
+from analyzer import Analyzer, analyzer, tokenize, STOPWORDS
+from index import index as Index
+from requests import Requests
+from tests.reference import REQUESTS
+
+TEXTS = ["The Dark Chocolate Box", "  running\tshoes\nfor   MEN ", "Women's Sandals, made in U.S.A.!",
+         "Don't stop: it's a café crème", "", "the of and", "Chocolat 70% & noisettes"]
+
+
+def test_tokenization_lowercase_and_stopwords():
+    assert analyzer.tokenize("The Dark Chocolate Box") == ['dark', 'chocolate', 'box']
+    assert analyzer.tokenize("  running\tshoes\nfor   MEN ") == ['running', 'shoes', 'men']
+    # Les mots vides sont comparés en minuscules ; la ponctuation est gardée par défaut
+    assert analyzer.tokenize("THE Women's Sandals, IT'S made in U.S.A.!") == ["women's", 'sandals,', 'made', 'u.s.a.!']
+    assert analyzer.tokenize("the of and") == []
+    assert analyzer.tokenize("") == []
+    assert {'the', 'of', "don't", 'it', 'a'} <= STOPWORDS
+
+
+def test_options():
+    assert Analyzer(strip_punctuation=True).tokenize("Women's Sandals, U.S.A.! -- x") == ['womens', 'sandals', 'usa', 'x']
+    assert Analyzer(lowercase=False).tokenize("The Dark Chocolate") == ['Dark', 'Chocolate']
+    assert Analyzer(stop_words=frozenset()).tokenize("The box") == ['the', 'box']
+
+
+def test_token_cache():
+    cached = Analyzer(cache_size=2)
+    cached.tokenize("box Box BOX")
+    info = cached.cache_info()
+    assert (info.hits, info.misses, info.currsize) == (0, 3, 2)
+    # "box", le plus ancien, est sorti du cache
+    cached.tokenize("BOX Box box")
+    info = cached.cache_info()
+    assert (info.hits, info.misses) == (2, 4)
+
+
+@pytest.mark.parametrize("text", TEXTS + REQUESTS)
+def test_same_normalization_on_index_and_query_side(text):
+    expected = analyzer.tokenize(text)
+    assert Index.tokenize(text) == expected
+    assert Requests.tokenize(text) == expected
+    assert tokenize(text) == expected
+
+
+def test_request_tokens_match_the_indexed_tokens(engine):
+    # Casse et mots vides différents du titre indexé : mêmes tokens, donc même correspondance exacte
+    req = Requests("the LEATHER Boots FOR women", engine=engine)
+    req.tokenize_request()
+    assert req.tokens_request == ['leather', 'boots', 'women']
+    assert req.exact_match('title') == [13]
@@ -0,0 +1,101 @@
+import json
+import asyncio
+import pytest
+from fetcher import fetcher
+from async_crawler import crawl_website_async, TokenBucket
+
+
+PRODUCTS = [f"/products/{i}" for i in range(20)]
+
+
+@pytest.fixture
+def shared_fetcher(monkeypatch):
+    """Couche de téléchargement partagée, rendue dans son état initial après le test."""
+    monkeypatch.setattr(fetcher, 'validators', None)
+    monkeypatch.setattr(fetcher, 'stats', dict.fromkeys(fetcher.stats, 0))
+    return fetcher
+
+
+def crawl(site, filename, **options):
+    options = {'max_pages': 50, 'concurrency': 4, 'default_delay': 0, 'parse_workers': 0, **options}
+    return asyncio.run(crawl_website_async(site.url + "/products/0", filename=filename, **options))
+
+
+def read_records(filename):
+    with open(filename, "r", encoding="utf-8") as f:
+        return {record['url']: record for record in map(json.loads, f)}
+
+
+def test_crawl_follows_internal_links(site, shared_fetcher, tmp_path):
+    filename = str(tmp_path / "pages.jsonl")
+    assert crawl(site, filename) == 20
+    records = read_records(filename)
+    assert sorted(records) == sorted(site.url + path for path in PRODUCTS)
+    assert records[site.url + "/products/3"]['title'] == "Produit 3"
+    assert records[site.url + "/products/3"]['first_paragraph'].startswith("Description duproduit 3.")
+    assert site.url + "/products/4" in records[site.url + "/products/3"]['internal_links']
+    # Page interdite par robots.txt jamais demandée, robots.txt lu une fois, chaque page une fois
+    assert "/private/x" not in site.paths()
+    assert site.paths().count("/robots.txt") <= 1
+    assert sorted(path for path in site.paths() if path.startswith("/products/")) == sorted(PRODUCTS)
+
+
+def test_max_pages_and_sitemaps(site, shared_fetcher, tmp_path):
+    filename = str(tmp_path / "pages.jsonl")
+    assert crawl(site, filename, max_pages=5, use_sitemaps=True) == 5
+    records = read_records(filename)
+    assert len(records) == 5
+    assert site.url + "/produit/sitemap" in records  # Page du sitemap, prioritaire
+
+
+def test_parse_pool(site, shared_fetcher, tmp_path):
+    filename = str(tmp_path / "pages.jsonl")
+    assert crawl(site, filename, parse_workers=2) == 20
+    assert len(read_records(filename)) == 20
+
+
+def test_resume(site, shared_fetcher, tmp_path):
+    filename = str(tmp_path / "pages.jsonl")
+    assert crawl(site, filename, max_pages=6) == 6
+    assert crawl(site, filename, resume=True) == 20
+    with open(filename, "r", encoding="utf-8") as f:
+        urls = [json.loads(line)['url'] for line in f]
+    assert sorted(urls) == sorted(site.url + path for path in PRODUCTS)
+
+
+def test_recrawl_reuses_unchanged_pages(site, shared_fetcher, tmp_path):
+    filename = str(tmp_path / "pages.jsonl")
+    assert crawl(site, filename) == 20
+    first = read_records(filename)
+    downloaded = shared_fetcher.stats['received_bytes']
+
+    changed = PRODUCTS[14:]
+    for path in changed:
+        site.pages[path] = site.pages[path].replace("<title>Produit", "<title>Nouveau produit")
+    shared_fetcher.stats = dict.fromkeys(shared_fetcher.stats, 0)
+    assert crawl(site, filename) == 20
+    second = read_records(filename)
+
+    assert shared_fetcher.stats['requests'] == 20
+    assert shared_fetcher.stats['not_modified'] == 14
+    assert shared_fetcher.stats['received_bytes'] < downloaded
+    for path in PRODUCTS:
+        url = site.url + path
+        if path in changed:
+            assert second[url]['title'].startswith("Nouveau produit")
+        else:
+            assert second[url] == first[url]
+
+
+def test_token_bucket_spaces_requests():
+    async def times():
+        loop = asyncio.get_running_loop()
+        bucket = TokenBucket(0.05)
+        result = []
+        for _ in range(4):
+            await bucket.acquire()
+            result.append(loop.time())
+        return result
+
+    result = asyncio.run(times())
+    assert all(later - earlier >= 0.04 for earlier, later in zip(result, result[1:]))
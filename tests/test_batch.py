@@ -0,0 +1,13 @@
+import pytest
+from engine import SearchEngine
+from tests.reference import REQUESTS, POSITIONAL_REQUESTS, FILTERS
+
+
+@pytest.mark.parametrize("workers", [None, 2])
+def test_search_batch_matches_search(catalog_paths, workers):
+    products_path, index_path, segment_path = catalog_paths
+    engine = SearchEngine(folder_path=index_path, products_path=products_path, segment_path=segment_path, cache_size=0)
+    requests = REQUESTS + POSITIONAL_REQUESTS + REQUESTS[:3]
+    for k, filters, facets in ((None, None, False), (3, None, True), (5, FILTERS[1], True)):
+        expected = [engine.search(request_text, k, filters, facets) for request_text in requests]
+        assert engine.search_batch(requests, k, filters, facets, workers=workers) == expected
@@ -0,0 +1,70 @@
+import os
+import pytest
+from index import index as Index
+from tests.local_products import products, write_products
+
+FILES = ["inverted_index_title.json", "inverted_index_description.json", "index_review.json",
+         "inverted_index_features.json", "inverted_index_position.json", "doc_table.json"]
+
+
+def catalog():
+    """Catalogue répété trois fois (URLs distinctes), pour avoir plusieurs blocs et plusieurs parties."""
+    catalog = []
+    for copy in range(3):
+        for product in products():
+            catalog.append(dict(product, url=f"{product['url']}-{copy}"))
+    # Produit sans caractéristiques, indexé quand même
+    catalog.append({'url': "https://shop.test/product/bare", 'title': "Bare product", 'description': "é à ç",
+                    'product_features': {}, 'product_reviews': []})
+    return catalog
+
+
+def read_files(folder):
+    contents = {}
+    for name in FILES:
+        with open(os.path.join(folder, name), "rb") as f:
+            contents[name] = f.read()
+    return contents
+
+
+@pytest.fixture(scope="module")
+def serial_build(tmp_path_factory):
+    """Fichiers JSON de save_indexes, l'indexation en mémoire en une passe."""
+    folder = tmp_path_factory.mktemp("serial")
+    products_path = str(folder / "products.jsonl")
+    write_products(products_path, catalog())
+    cwd = os.getcwd()
+    os.chdir(folder)
+    try:
+        Index(products_path).save_indexes()
+    finally:
+        os.chdir(cwd)
+    return products_path, read_files(folder)
+
+
+def test_single_pass_matches_the_separate_builds(serial_build):
+    builder = Index(serial_build[0])
+    indexes = builder.build_all_indexes()
+    assert indexes["inverted_index_title"] == builder.build_inverted_index_title()
+    assert indexes["inverted_index_description"] == builder.build_inverted_index_description()
+    assert indexes["index_review"] == builder.build_index_review()
+    assert indexes["inverted_index_features"] == builder.build_inverted_index_features()
+    assert indexes["inverted_index_position"] == builder.build_inverted_index_position()
+
+
+@pytest.mark.parametrize("memory_limit, number_of_runs", [(None, 1), (4000, 11), (1, len(catalog()))])
+def test_spimi_build_is_byte_identical(serial_build, tmp_path, memory_limit, number_of_runs):
+    products_path, expected = serial_build
+    # Avec un budget d'un octet, chaque produit est écrit dans son propre bloc
+    assert Index(None).build_indexes_streaming(products_path, memory_limit, str(tmp_path)) == number_of_runs
+    assert read_files(tmp_path) == expected
+    assert not os.path.exists(tmp_path / "runs")
+
+
+@pytest.mark.parametrize("workers", [1, 2, 5])
+def test_parallel_build_is_byte_identical(serial_build, tmp_path, workers):
+    products_path, expected = serial_build
+    shards = Index(None).build_indexes_parallel(products_path, workers, str(tmp_path))
+    assert shards == workers
+    assert read_files(tmp_path) == expected
+    assert not os.path.exists(tmp_path / "runs")
@@ -0,0 +1,100 @@
+import pytest
+from cache import QueryCache
+
+
+class Clock:
+    """Horloge manuelle, avancée par les tests."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_least_recently_used_entry_is_evicted_first():
+    cache = QueryCache(max_size=3)
+    for key in "abc":
+        cache.put(key, key.upper())
+    assert cache.get("a") == "A"
+    cache.put("d", "D")
+    # "b" est le moins récemment utilisé : "a" vient d'être lu
+    assert list(cache.entries) == ["c", "a", "d"]
+    cache.put("c", "C2")
+    cache.put("e", "E")
+    assert list(cache.entries) == ["d", "c", "e"]
+    assert cache.get("a") is None
+    assert cache.get("c") == "C2"
+    assert cache.evictions == 2
+
+
+def test_entries_expire_after_their_time_to_live():
+    clock = Clock()
+    cache = QueryCache(max_size=10, ttl=60, clock=clock)
+    cache.put("a", 1)
+    clock.now += 30
+    cache.put("b", 2)
+    clock.now += 30
+    assert cache.get("a") == 1
+    clock.now += 0.5
+    assert cache.get("a") is None
+    assert "a" not in cache.entries
+    assert cache.get("b") == 2
+    # Une nouvelle écriture repart de zéro
+    cache.put("a", 3)
+    clock.now += 59
+    assert cache.get("a") == 3
+    assert cache.get("b") is None
+
+
+def test_without_time_to_live_entries_do_not_expire():
+    clock = Clock()
+    cache = QueryCache(max_size=10, clock=clock)
+    cache.put("a", 1)
+    clock.now += 10 ** 9
+    assert cache.get("a") == 1
+
+
+def test_hit_and_miss_counters():
+    clock = Clock()
+    cache = QueryCache(max_size=2, ttl=10, clock=clock)
+    assert cache.stats() == {'hits': 0, 'misses': 0, 'hit_rate': 0.0, 'evictions': 0, 'size': 0}
+    assert cache.get("a") is None
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    assert cache.get("b") == 2
+    cache.put("c", 3)
+    clock.now += 11
+    assert cache.get("c") is None
+    # Expirée ou évincée, une entrée absente compte comme un échec
+    assert cache.get("a") is None
+    assert cache.stats() == {'hits': 2, 'misses': 3, 'hit_rate': pytest.approx(0.4), 'evictions': 1, 'size': 1}
+
+
+def test_new_version_drops_every_entry():
+    cache = QueryCache(max_size=10)
+    cache.put("a", 1, version=1)
+    assert cache.get("a", version=1) == 1
+    assert cache.get("a", version=2) is None
+    cache.put("b", 2, version=2)
+    assert cache.get("b", version=2) == 2
+    assert cache.stats()['size'] == 1
+
+
+def test_engine_results_are_served_from_the_cache(catalog_paths):
+    from engine import SearchEngine
+    products_path, index_path, _ = catalog_paths
+    clock = Clock()
+    engine = SearchEngine(folder_path=index_path, products_path=products_path, cache_size=2, cache_ttl=5)
+    engine.cache.clock = clock
+    first = engine.search("dark chocolate", 3)
+    assert engine.search("dark chocolate", 3) == first
+    # Résultats copiés : modifier ceux de l'appelant ne change pas le cache
+    first['documents'].clear()
+    assert engine.search("dark chocolate", 3)['documents']
+    engine.search("caramel")
+    engine.search("sandals")
+    clock.now += 6
+    engine.search("sandals")
+    assert engine.cache_stats() == {'hits': 2, 'misses': 4, 'hit_rate': pytest.approx(1 / 3), 'evictions': 1, 'size': 2}
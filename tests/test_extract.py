@@ -0,0 +1,47 @@
+from bs4 import BeautifulSoup
+from extract import extract_page, CHUNK_SIZE
+from utils import html_parse
+from tests.local_site import catalog
+
+
+def test_title_first_paragraph_and_internal_links():
+    html = ('<html><head><title>Chocolat &amp; cacao</title></head><body><div>menu</div>'
+            '<p>Premier <b>paragraphe</b> <a href="/products/2#avis">lien</a></p><p>second</p>'
+            '<a href="../products/3">relatif</a><a href="/products/2">doublon</a>'
+            '<a href="https://example.org/">externe</a><a href="//shop.test/products/4">même hôte</a></body></html>')
+    page = extract_page(html, "https://shop.test/products/1")
+    assert page['title'] == "Chocolat & cacao"
+    assert page['first_paragraph'] == "Premierparagraphelien"
+    assert page['internal_links'] == ["https://shop.test/products/2", "https://shop.test/products/3",
+                                      "https://shop.test/products/4"]
+
+
+def test_missing_title_and_paragraph():
+    page = extract_page(b"<html><body><div>rien</div></body></html>", "https://shop.test/")
+    assert page == {'title': "Titre non trouvé", 'first_paragraph': "Aucun paragraphe trouvé", 'internal_links': []}
+
+
+def test_unclosed_paragraph():
+    assert extract_page("<title>t</title><p>ouvert<p>suivant", "https://shop.test/")['first_paragraph'] == "ouvert"
+
+
+def test_links_of_the_start_host_only():
+    html = '<a href="/products/1">a</a><a href="https://shop.test/products/2">b</a>'
+    page = extract_page(html, "https://cdn.shop.test/page", "https://shop.test/")
+    assert page['internal_links'] == ["https://shop.test/products/2"]
+
+
+def test_without_links_stops_after_the_first_paragraph():
+    html = "<title>t</title><p>texte</p>" + '<a href="/x">x</a>' * CHUNK_SIZE
+    page = extract_page(html, "https://shop.test/", links=False)
+    assert page == {'title': "t", 'first_paragraph': "texte", 'internal_links': []}
+
+
+def test_same_result_as_beautifulsoup():
+    for path, html in catalog().items():
+        url = "https://shop.test" + path
+        html = html.replace('HOST', "https://shop.test")
+        expected = html_parse(BeautifulSoup(html, 'html.parser'), url)
+        page = extract_page(html, url)
+        assert page['title'] == expected['title']
+        assert page['first_paragraph'] == expected['first_paragraph']
@@ -0,0 +1,38 @@
+import pytest
+from tests.local_products import products
+from tests.reference import REQUESTS, FILTERS, TOLERANCE, reference_search, doc_id
+
+
+@pytest.mark.parametrize("filters", FILTERS)
+def test_facet_filters_match_brute_force(engine, filters):
+    for request_text in REQUESTS:
+        expected, exact, _ = reference_search(request_text, filters)
+        results = engine.search(request_text, filters=filters, facets=True)
+        ranked = {doc_id(document['url']): document['ranking_score'] for document in results['documents']}
+        assert ranked == pytest.approx(expected, rel=TOLERANCE, abs=0)
+        assert results['filtered_documents'] == len(exact['title'] | exact['description'])
+
+        assert results['facets'] == facet_counts(expected)
+        assert engine.search(request_text, 2, filters, facets=True)['facets'] == results['facets']
+
+
+def facet_counts(docs):
+    """Nombre de documents de chaque marque et de chaque origine."""
+    counts = {'brand': {}, 'origin': {}}
+    for doc in docs:
+        features = products()[doc]['product_features']
+        brand, origin = features['brand'].lower().replace(" ", ""), features['made in'].lower()
+        counts['brand'][brand] = counts['brand'].get(brand, 0) + 1
+        counts['origin'][origin] = counts['origin'].get(origin, 0) + 1
+    return counts
+
+
+@pytest.mark.parametrize("request_text", ["unknown word", "united states", ""])
+def test_facet_counts_of_documents_ranked_without_token(engine, request_text):
+    # Aucun token de la requête dans les index : les documents sont classés par leur score statique
+    results = engine.search(request_text, facets=True)
+    assert len(results['documents']) == len(products())
+    assert results['facets'] == facet_counts(range(len(products())))
+    filtered = engine.search(request_text, filters={'origin': 'usa'}, facets=True)
+    assert results['facets']['origin']['usa'] == len(filtered['documents']) == 5
+    assert filtered['facets'] == facet_counts(doc_id(document['url']) for document in filtered['documents'])
@@ -0,0 +1,87 @@
+import pytest
+import utils
+from fetcher import Fetcher, ValidatorStore, NOT_MODIFIED, fetcher
+
+
+@pytest.fixture
+def shared_fetcher(monkeypatch):
+    """Couche de téléchargement partagée, sans validateurs ni statistiques d'un autre test."""
+    monkeypatch.setattr(fetcher, 'validators', None)
+    monkeypatch.setattr(fetcher, 'stats', dict.fromkeys(fetcher.stats, 0))
+    return fetcher
+
+
+def test_gzip_response_is_decoded(site):
+    page_fetcher = Fetcher()
+    status, body = page_fetcher.fetch(site.url + "/products/1")
+    assert status == 200
+    assert body.decode() == site.pages['/products/1']
+    assert 'gzip' in site.requests[-1][1]['Accept-Encoding']
+    assert page_fetcher.stats['compression_saved_bytes'] > 0
+    assert page_fetcher.stats['received_bytes'] < len(body)
+
+
+def test_deflate_is_decoded():
+    import zlib
+    body = b"<p>page</p>" * 10
+    assert Fetcher.decode(zlib.compress(body), "deflate") == body
+    assert Fetcher.decode(zlib.compress(body)[2:-4], "deflate") == body  # deflate brut
+    assert Fetcher.decode(body, "") == body
+
+
+def test_unchanged_page_is_not_modified(site, tmp_path):
+    store = ValidatorStore(str(tmp_path / "pages.validators.db"))
+    page_fetcher = Fetcher(validators=store)
+    url = site.url + "/products/2"
+    status, body = page_fetcher.fetch(url)
+    assert status == 200
+
+    # Sans données extraites enregistrées, la page est téléchargée de nouveau
+    assert page_fetcher.fetch(url) == (200, body)
+    store.set_record(url, {'url': url, 'title': 'Produit 2'})
+
+    assert page_fetcher.fetch(url) == (304, None)
+    assert site.requests[-1][1]['If-None-Match'] == store.headers(url)['If-None-Match']
+    assert site.requests[-1][1]['If-Modified-Since'] == 'Mon, 01 Jan 2024 00:00:00 GMT'
+    assert page_fetcher.stats['not_modified'] == 1
+    assert page_fetcher.stats['not_modified_saved_bytes'] == len(body)
+    assert store.record(url) == {'url': url, 'title': 'Produit 2'}
+
+    site.pages['/products/2'] = site.pages['/products/2'].replace('Produit 2', 'Produit 2 bis')
+    status, body = page_fetcher.fetch(url)
+    assert status == 200 and b'Produit 2 bis' in body
+    assert store.record(url) is None  # Nouvelle version : ses données sont à extraire de nouveau
+    store.close()
+
+
+def test_headers_are_sent(site):
+    Fetcher().fetch(site.url + "/products/3", {'X-Crawler': 'test', 'Accept-Encoding': 'identity'})
+    headers = site.requests[-1][1]
+    assert headers['X-Crawler'] == 'test'
+    assert headers['Accept-Encoding'] == 'identity'
+
+
+def test_error_status(site):
+    assert Fetcher().fetch(site.url + "/absent") == (404, None)
+
+
+def test_fetch_html_and_fetch_page(site, shared_fetcher):
+    url = site.url + "/products/4"
+    assert utils.fetch_html(url, {'X-Crawler': 'html'}) == site.pages['/products/4'].encode()
+    assert site.requests[-1][1]['X-Crawler'] == 'html'
+
+    soup = utils.fetch_page(url, {'X-Crawler': 'page'})
+    assert site.requests[-1][1]['X-Crawler'] == 'page'
+    assert soup.title.string == "Produit 4"
+
+    assert utils.fetch_html(site.url + "/absent") is None
+
+
+def test_fetch_html_not_modified(site, shared_fetcher, tmp_path):
+    url = site.url + "/products/5"
+    shared_fetcher.validators = ValidatorStore(str(tmp_path / "pages.validators.db"))
+    utils.fetch_html(url)
+    shared_fetcher.validators.set_record(url, {'url': url})
+    assert utils.fetch_html(url) is NOT_MODIFIED
+    assert utils.fetch_page(url) is NOT_MODIFIED
+    shared_fetcher.validators.close()
@@ -0,0 +1,79 @@
+from frontier import Frontier, BloomFilter, open_crawl, frontier_path
+
+
+def test_bloom_filter_has_no_false_negative(tmp_path):
+    bloom = BloomFilter(capacity=1000)
+    urls = [f"https://example.org/products/{i}" for i in range(1000)]
+    for url in urls:
+        bloom.add(url)
+    assert all(url in bloom for url in urls)
+    false_positives = sum(f"https://example.org/other/{i}" in bloom for i in range(1000))
+    assert false_positives < 50
+
+    bloom.save(str(tmp_path / "urls.bloom"))
+    loaded = BloomFilter.load(str(tmp_path / "urls.bloom"))
+    assert all(url in loaded for url in urls)
+
+
+def test_urls_are_queued_once_by_priority(tmp_path):
+    frontier = Frontier(str(tmp_path / "pages.frontier.db"), capacity=100)
+    assert frontier.add("https://example.org/a", 1)
+    assert frontier.add("https://example.org/produit/b", 0)
+    assert frontier.add("https://example.org/c", 1)
+    assert not frontier.add("https://example.org/a", 0)
+    assert [frontier.pop() for _ in range(4)] == ["https://example.org/produit/b", "https://example.org/a",
+                                                  "https://example.org/c", None]
+    frontier.done("https://example.org/a")
+    frontier.done("https://example.org/c", visited=False)
+    assert frontier.visited == 1
+    assert not frontier.add("https://example.org/c")
+    frontier.close()
+
+
+def test_resume_requeues_claimed_urls(tmp_path):
+    path = str(tmp_path / "pages.frontier.db")
+    frontier = Frontier(path, capacity=100)
+    for i in range(4):
+        frontier.add(f"https://example.org/{i}")
+    frontier.done(frontier.pop())
+    claimed = frontier.pop()
+    frontier.checkpoint()
+    frontier.add("https://example.org/after-checkpoint")
+    frontier.db.close()  # Arrêt brutal : les changements après le point de reprise sont perdus
+
+    frontier = Frontier(path, capacity=100, resume=True)
+    assert frontier.visited == 1
+    # L'URL en cours d'exploration revient dans la file, après celles de même priorité
+    assert [frontier.pop() for _ in range(4)] == ["https://example.org/2", "https://example.org/3", claimed, None]
+    assert frontier.seen("https://example.org/0")
+    assert not frontier.seen("https://example.org/after-checkpoint")
+    frontier.close()
+
+    frontier = Frontier(path, capacity=100, resume=False)
+    assert frontier.visited == 0 and frontier.pop() is None
+    frontier.close()
+
+
+def test_open_crawl_restores_pages_written_after_the_checkpoint(tmp_path):
+    filename = str(tmp_path / "pages.jsonl")
+    sink, frontier = open_crawl(filename, capacity=100)
+    frontier.add("https://example.org/0", 0)
+    frontier.pop()
+    sink.write({'url': "https://example.org/0", 'internal_links': ["https://example.org/1"]})
+    frontier.done("https://example.org/0")
+    frontier.checkpoint(sink.offset())
+
+    # Page écrite dans le fichier, mais l'arrêt survient avant le point de reprise suivant
+    frontier.add("https://example.org/1")
+    frontier.pop()
+    sink.write({'url': "https://example.org/1", 'internal_links': ["https://example.org/0", "https://example.org/produit/2"]})
+    sink.close()
+    frontier.db.close()
+
+    sink, frontier = open_crawl(filename, resume=True, capacity=100)
+    assert frontier.visited == 2
+    assert frontier.pop() == "https://example.org/produit/2"
+    assert frontier.pop() is None
+    assert frontier_path(filename) == str(tmp_path / "pages.frontier.db")
+    frontier.close()
+    sink.close()
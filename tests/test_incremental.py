@@ -0,0 +1,148 @@
+import os
+import sys
+import json
+import shutil
+import subprocess
+import pytest
+from analyzer import analyzer
+from engine import SearchEngine
+from index import index as Index
+from incremental import IncrementalIndex
+from tests.local_products import products
+
+
+def mapped_segments(updates_path):
+    """Segments de mise à jour encore ouverts avec mmap par ce processus."""
+    with open("/proc/self/maps") as f:
+        return {os.path.basename(os.path.dirname(line.split()[-1])) for line in f if updates_path in line}
+
+
+@pytest.fixture
+def updates(catalog_paths, tmp_path):
+    products_path, index_path, segment_path = catalog_paths
+    updates_path = str(tmp_path / "index_updates")
+    engine = SearchEngine(folder_path=index_path, products_path=products_path, segment_path=segment_path, updates_path=updates_path)
+    return engine, IncrementalIndex(updates_path, index_path, max_segments=100)
+
+
+def new_product(i, title):
+    return dict(products()[0], url=f"https://shop.test/new/{i}", title=title)
+
+
+def test_updates_are_searchable(updates):
+    engine, incremental_index = updates
+    incremental_index.apply([new_product(1, "Dark Chocolate Truffles")], deleted_urls=["https://shop.test/product/0"])
+    urls = [document['url'] for document in engine.search("truffles")['documents']]
+    assert urls[0] == "https://shop.test/new/1"
+    assert "https://shop.test/product/0" not in [document['url'] for document in engine.search("dark chocolate")['documents']]
+
+
+def test_update_segments_use_the_shared_analyzer(updates):
+    engine, incremental_index = updates
+    incremental_index.apply([new_product(1, "Women's Hiking Sandals, Light.")])
+    engine.refresh()
+    title_index = engine.indexes['title_index']
+    first_doc_id = len(products())
+    for position, token in enumerate(analyzer.tokenize("Women's Hiking Sandals, Light.")):
+        assert title_index[token][first_doc_id] == [position]
+
+
+def test_layered_index_iterates_over_live_terms(updates):
+    engine, incremental_index = updates
+    incremental_index.apply([new_product(1, "Zebra Chocolate"), new_product(2, "Yak Candy")])
+    incremental_index.apply([], deleted_urls=["https://shop.test/new/1", "https://shop.test/product/12"])
+    engine.refresh()
+    title_index = engine.indexes['title_index']
+
+    terms = list(title_index)
+    expected = sorted(term for term in set(title_index.base) | {term for _, index in title_index.layers for term in index}
+                      if term in title_index)
+    assert terms == expected
+    assert len(title_index) == len(expected)
+    assert "yak" in terms and "zebra" not in terms and "gift" not in terms
+
+
+def test_compacted_segments_are_deleted_once_the_engine_switched(updates):
+    engine, incremental_index = updates
+    updates_path = incremental_index.updates_path
+    incremental_index.apply([new_product(1, "Zebra Chocolate")])
+    incremental_index.apply([new_product(2, "Yak Candy")])
+    before = engine.search("chocolate candy")
+    assert mapped_segments(updates_path) == {"segment_1", "segment_2"}
+
+    assert incremental_index.compact()
+    # Le moteur lit encore les anciens segments : ils ne sont pas supprimés
+    assert {"segment_1", "segment_2", "segment_3"} <= set(os.listdir(updates_path))
+    with open(os.path.join(updates_path, "manifest.json")) as f:
+        assert [entry['path'] for entry in json.load(f)['retired']] == ["segment_1", "segment_2"]
+
+    assert engine.search("chocolate candy") == before
+    assert "segment_1" not in os.listdir(updates_path) and "segment_2" not in os.listdir(updates_path)
+    assert mapped_segments(updates_path) == {"segment_3"}
+
+    incremental_index.apply([new_product(3, "Zebra Cake")])
+    with open(os.path.join(updates_path, "manifest.json")) as f:
+        assert json.load(f)['retired'] == []
+
+
+def test_compacted_segments_are_deleted_once_every_engine_switched(updates, catalog_paths):
+    engine, incremental_index = updates
+    updates_path = incremental_index.updates_path
+    products_path, index_path, _ = catalog_paths
+    other = SearchEngine(folder_path=index_path, products_path=products_path, updates_path=updates_path)
+    incremental_index.apply([new_product(1, "Zebra Chocolate")])
+    incremental_index.apply([new_product(2, "Yak Candy")])
+    before = engine.search("chocolate candy")
+    assert other.search("chocolate candy") == before
+    assert len(os.listdir(os.path.join(updates_path, "segment_1", "readers"))) == 3
+
+    assert incremental_index.compact()
+    # Le premier moteur passe au segment fusionné, le second lit encore les anciens segments
+    assert engine.search("chocolate candy") == before
+    assert {"segment_1", "segment_2"} <= set(os.listdir(updates_path))
+    assert len(os.listdir(os.path.join(updates_path, "segment_1", "readers"))) == 1
+    assert other.search("chocolate candy") == before
+    assert "segment_1" not in os.listdir(updates_path) and "segment_2" not in os.listdir(updates_path)
+
+
+def test_readers_of_finished_processes_are_ignored(updates):
+    engine, incremental_index = updates
+    updates_path = incremental_index.updates_path
+    incremental_index.apply([new_product(1, "Zebra Chocolate")])
+    incremental_index.apply([new_product(2, "Yak Candy")])
+    engine.search("chocolate")
+
+    # Lecteur laissé par un processus arrêté sans fermer les segments
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    open(os.path.join(updates_path, "segment_1", "readers", f"{process.pid}_stale"), "w").close()
+    incremental_index.compact()
+    engine.search("chocolate")
+    assert "segment_1" not in os.listdir(updates_path) and "segment_2" not in os.listdir(updates_path)
+
+
+def test_new_base_version_invalidates_the_query_cache(catalog_paths, tmp_path):
+    products_path, index_path, _ = catalog_paths
+    folder_path = str(tmp_path / "index_json")
+    shutil.copytree(index_path, folder_path)
+    engine = SearchEngine(folder_path=folder_path, products_path=products_path)
+    before = engine.search("dark chocolate")
+    assert engine.version() == (0, None)
+
+    def drop_token(token):
+        with open(os.path.join(folder_path, "title_index.json"), encoding="utf-8") as f:
+            title_index = json.load(f)
+        del title_index[token]
+        with open(os.path.join(folder_path, "title_index.json"), "w", encoding="utf-8") as f:
+            json.dump(title_index, f)
+        Index(products_path).save_field_statistics(folder_path)
+
+    # Index réécrits sans nouvelle version : ni rechargés, ni sortis du cache
+    drop_token("dark")
+    assert engine.search("dark chocolate") == before
+
+    assert Index.save_index_version(folder_path) == 1
+    after = engine.search("dark chocolate")
+    assert engine.version() == (1, None)
+    assert after != before
+    assert after == SearchEngine(folder_path=folder_path, products_path=products_path, cache_size=0).search("dark chocolate")
@@ -0,0 +1,117 @@
+import json
+import pytest
+from analyzer import analyzer
+from engine import SearchEngine
+from index import index as Index
+from tests.local_products import products, write_products, write_catalog, load_index_main
+from tests.reference import TOLERANCE
+
+
+REQUESTS = ["Box of Chocolate Candy", "dark chocolate", "running shoes", "unicorn tea", "sneakers", "leather boots women"]
+
+ADDED = {
+    'url': "https://shop.test/product/new",
+    'title': "Galactic Unicorn Tea",
+    'description': "A sparkling unicorn tea blend with dark berry notes",
+    'product_features': {'brand': "Star Brew", 'made in': "Japan"},
+    'product_reviews': [{'rating': 5, 'text': "avis"}]
+}
+
+
+@pytest.fixture
+def indexed_catalog(tmp_path, monkeypatch):
+    """Petit catalogue indexé, dans le dossier courant comme pour python index/main.py."""
+    write_catalog(str(tmp_path))
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def changed_catalog():
+    """Catalogue avec un produit ajouté au milieu du fichier et un produit retiré."""
+    catalog = products()
+    return catalog[:2] + [ADDED] + catalog[2:5] + catalog[6:]
+
+
+def ranking(engine, request):
+    return {document['url']: document['ranking_score'] for document in engine.search(request)['documents']}
+
+
+@pytest.mark.parametrize("segment_path", [None, "index_segment/"])
+def test_reindex_keeps_document_ids_and_indexes_added_products(indexed_catalog, tmp_path_factory, segment_path):
+    catalog = products()
+    write_products("products.jsonl", changed_catalog())
+    load_index_main().generate_and_save_indexes("products.jsonl")
+
+    # Les documents gardent leur identifiant, le produit retiré laisse un trou, le nouveau est ajouté à la fin
+    with open("index_json/doc_table.json", encoding="utf-8") as f:
+        doc_table = json.load(f)
+    assert [entry['url'] for entry in doc_table] == \
+        [product['url'] for product in catalog[:5]] + [""] + [product['url'] for product in catalog[6:]] + [ADDED['url']]
+
+    engine = SearchEngine(folder_path="index_json/", products_path="products.jsonl", segment_path=segment_path)
+    assert engine.search("Box of Chocolate Candy", 1)['documents'][0]['title'] == "Box of Chocolate Candy"
+    assert engine.search("unicorn tea", 1)['documents'][0]['url'] == ADDED['url']
+    assert catalog[5]['url'] not in ranking(engine, "Classic Sneakers")
+    assert engine.search("unicorn", facets=True)['facets'] == {'brand': {'starbrew': 1}, 'origin': {'japan': 1}}
+
+    # Mêmes résultats qu'avec le catalogue modifié indexé d'un coup
+    products_path, index_path, fresh_segment_path = write_catalog(str(tmp_path_factory.mktemp("fresh")), changed_catalog())
+    fresh = SearchEngine(folder_path=index_path, products_path=products_path,
+                         segment_path=fresh_segment_path if segment_path else None)
+    for request in REQUESTS:
+        assert ranking(engine, request) == pytest.approx(ranking(fresh, request), rel=TOLERANCE, abs=0)
+
+
+def test_reindex_of_unchanged_products_keeps_the_indexes(indexed_catalog):
+    before = {}
+    for name in ("doc_table", "title_index", "description_index", "brand_index", "origin_index", "reviews_index"):
+        with open(f"index_json/{name}.json", encoding="utf-8") as f:
+            before[name] = json.load(f)
+    load_index_main().generate_and_save_indexes("products.jsonl")
+    for name, index in before.items():
+        with open(f"index_json/{name}.json", encoding="utf-8") as f:
+            assert json.load(f) == index
+
+
+def test_reindex_statistics_describe_the_aligned_documents(indexed_catalog):
+    write_products("products.jsonl", changed_catalog())
+    load_index_main().generate_and_save_indexes("products.jsonl")
+    with open("index_json/doc_table.json", encoding="utf-8") as f:
+        doc_ids = {entry['url']: doc_id for doc_id, entry in enumerate(json.load(f)) if entry['url']}
+
+    for field in ("title", "description"):
+        with open(f"index_json/{field}_stats.json", encoding="utf-8") as f:
+            statistics = json.load(f)
+        lengths = {doc_ids[product['url']]: len(analyzer.tokenize(product[field])) for product in changed_catalog()}
+        assert statistics['doc_lengths'] == [lengths.get(doc_id, 0) for doc_id in range(len(statistics['doc_lengths']))]
+        assert len(statistics['doc_lengths']) == len(products()) + 1
+        assert sorted(statistics['doc_order']) == sorted(doc_id for doc_id, length in lengths.items() if length)
+        assert statistics['N'] == len(statistics['doc_order'])
+        assert statistics['avg_doc_length'] == pytest.approx(sum(lengths.values()) / statistics['N'])
+        assert statistics['document_frequencies']['unicorn'] == 1
+        assert statistics['term_frequencies']['unicorn'] == [[doc_ids[ADDED['url']], 1]]
+
+
+@pytest.mark.parametrize("codec", ["vbyte", "bitpacked"])
+def test_reindex_segment_matches_the_json_indexes(indexed_catalog, codec):
+    write_products("products.jsonl", changed_catalog())
+    index_main = load_index_main()
+    index_main.generate_and_save_indexes("products.jsonl")
+    if codec != "vbyte":
+        Index(None).save_segment("index_json/", "index_segment/", codec=codec)
+    Index.export_segment("index_segment/", "exported/")
+
+    def load(path):
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+
+    doc_table = load("index_json/doc_table.json")
+    assert [{key: entry[key] for key in ('url', 'offset', 'length')} for entry in load("exported/doc_table.json")] == \
+        [{key: entry[key] for key in ('url', 'offset', 'length')} for entry in doc_table]
+    for field in ("title", "description"):
+        field_index = {token: sorted(postings) for token, postings in load(f"index_json/{field}_index.json").items()}
+        assert load(f"exported/{field}_index.json") == field_index
+        statistics, exported = load(f"index_json/{field}_stats.json"), load(f"exported/{field}_stats.json")
+        for key in ('N', 'avg_doc_length', 'doc_lengths', 'doc_order', 'document_frequencies'):
+            assert exported[key] == statistics[key]
+        assert exported['max_term_weights'] == pytest.approx(statistics['max_term_weights'])
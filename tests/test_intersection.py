@@ -0,0 +1,52 @@
+import random
+import pytest
+from requests import Requests
+from intersection import galloping_search, intersect
+from segment import Segment
+from tests.local_products import products, FIELDS
+from tests.reference import REQUESTS, TOLERANCE, field_tokens, reference_search, doc_id
+
+
+def test_galloping_intersection_matches_sets():
+    generator = random.Random(7)
+    for _ in range(300):
+        lists = [sorted(generator.sample(range(200), generator.randint(0, 60))) for _ in range(generator.randint(1, 4))]
+        expected = sorted(set.intersection(*map(set, lists)))
+        assert intersect(lists) == expected
+        target, low = generator.randint(-5, 205), generator.randint(0, len(lists[0]))
+        position = galloping_search(lists[0], target, low)
+        assert position == low + sum(1 for value in lists[0][low:] if value < target)
+    assert intersect([]) == []
+
+
+def test_block_intersection_matches_sets(catalog_paths):
+    segment = Segment(catalog_paths[2])
+    for field in FIELDS:
+        documents = field_tokens(field)
+        postings = segment.fields[field].statistics['postings']
+        terms = list(segment.fields[field].terms())
+        for first in terms[:15]:
+            for second in terms[:15]:
+                expected = sorted(doc for doc, document in enumerate(documents) if first in document and second in document)
+                assert intersect([postings[first], postings[second]]) == expected
+                assert intersect([sorted(segment.fields[field].index[first]), postings[second]]) == expected
+    segment.close()
+
+
+@pytest.mark.parametrize("request_text", REQUESTS)
+def test_exact_match_matches_brute_force(engine, request_text):
+    expected, exact, _ = reference_search(request_text)
+    req = Requests(request_text, engine=engine)
+    req.tokenize_request()
+    req.add_synonyms()
+    for field in FIELDS:
+        assert req.exact_match(field) == sorted(exact[field])
+
+    results = engine.search(request_text)
+    assert results['total_documents'] == len(products())
+    assert results['filtered_documents'] == len(exact['title'] | exact['description'])
+    # Même classement que la référence, scores égaux à l'arrondi près
+    ranked = [(doc_id(document['url']), document['ranking_score']) for document in results['documents']]
+    assert {doc for doc, _ in ranked} == set(expected)
+    for doc, score in ranked:
+        assert score == pytest.approx(expected[doc], rel=TOLERANCE, abs=0)
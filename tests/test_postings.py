@@ -0,0 +1,98 @@
+import random
+import pytest
+from postings import (BLOCK_SIZE, VByteCodec, BitPackedCodec, get_codec, encode_postings, BlockPostings,
+                      encode_varint, decode_varint)
+
+CODECS = [VByteCodec(), BitPackedCodec()]
+
+
+def postings_list(count, generator, max_gap=50):
+    """Liste de postings aléatoire : identifiants croissants, fréquences et premières positions."""
+    doc_ids, doc_id = [], -1
+    for _ in range(count):
+        doc_id += generator.randint(1, max_gap)
+        doc_ids.append(doc_id)
+    tfs = [generator.randint(1, 20) for _ in range(count)]
+    first_positions = [generator.randint(0, 300) for _ in range(count)]
+    return doc_ids, tfs, first_positions
+
+
+@pytest.mark.parametrize("value", [0, 1, 127, 128, 16383, 16384, 2 ** 40 + 3])
+def test_varint_round_trip(value):
+    out = bytearray(b"x")
+    encode_varint(value, out)
+    assert decode_varint(out, 1) == (value, len(out))
+
+
+@pytest.mark.parametrize("codec", CODECS, ids=lambda codec: codec.name)
+@pytest.mark.parametrize("values", [[], [0], [7], [0] * 5, [1, 2, 3, 1000000, 4, 5, 6, 7, 8, 9],
+                                    [2 ** 40, 1, 2 ** 33], list(range(BLOCK_SIZE + 1))])
+def test_codec_round_trip(codec, values):
+    out = bytearray(b"ab")
+    codec.encode(values, out)
+    end = len(out)
+    out += b"cd"
+    assert codec.decode(out, 2, len(values)) == (values, end)
+
+
+@pytest.mark.parametrize("codec", CODECS, ids=lambda codec: codec.name)
+@pytest.mark.parametrize("count", [1, BLOCK_SIZE - 1, BLOCK_SIZE, BLOCK_SIZE + 1, 3 * BLOCK_SIZE + 1])
+def test_postings_round_trip_at_block_boundaries(codec, count):
+    doc_ids, tfs, first_positions = postings_list(count, random.Random(count))
+    postings = BlockPostings(encode_postings(doc_ids, tfs, first_positions, codec), codec)
+    assert len(postings) == count
+    assert len(postings.last_doc_ids) == (count + BLOCK_SIZE - 1) // BLOCK_SIZE
+    assert postings.to_lists() == (doc_ids, tfs, first_positions)
+    assert list(postings) == list(zip(doc_ids, tfs, first_positions))
+
+
+@pytest.mark.parametrize("codec", CODECS, ids=lambda codec: codec.name)
+def test_large_gaps_and_single_document(codec):
+    doc_ids = [0, 1, 2 ** 31, 2 ** 31 + 1, 2 ** 45]
+    tfs = [1, 2 ** 20, 3, 1, 2]
+    first_positions = [0, 5, 2 ** 32, 0, 7]
+    postings = BlockPostings(encode_postings(doc_ids, tfs, first_positions, codec, block_size=2), codec, block_size=2)
+    assert postings.to_lists() == (doc_ids, tfs, first_positions)
+    assert postings.last_doc_ids == [1, 2 ** 31 + 1, 2 ** 45]
+
+    single = BlockPostings(encode_postings([42], [3], [9], codec), codec)
+    assert list(single) == [(42, 3, 9)]
+    assert single.seek(0) == (42, 3, 9)
+    assert single.seek(42) == (42, 3, 9)
+    assert single.seek(43) is None
+
+
+@pytest.mark.parametrize("codec", CODECS, ids=lambda codec: codec.name)
+def test_seek_skips_blocks(codec):
+    generator = random.Random(3)
+    doc_ids, tfs, first_positions = postings_list(5 * BLOCK_SIZE + 3, generator, max_gap=10)
+    entries = list(zip(doc_ids, tfs, first_positions))
+    encoded = encode_postings(doc_ids, tfs, first_positions, codec)
+
+    # Cibles croissantes : chaque seek renvoie le premier document supérieur ou égal à la cible
+    for _ in range(20):
+        postings = BlockPostings(encoded, codec)
+        targets = sorted(generator.sample(range(doc_ids[-1] + 20), 40))
+        for target in targets:
+            expected = next((entry for entry in entries if entry[0] >= target), None)
+            assert postings.seek(target) == expected
+
+    # Un seek au-delà des premiers blocs ne décode que le bloc de la cible
+    postings = BlockPostings(encoded, codec)
+    target = doc_ids[3 * BLOCK_SIZE + 5]
+    assert postings.seek(target) == entries[3 * BLOCK_SIZE + 5]
+    assert list(postings.decoded) == [3]
+    assert postings.seek(doc_ids[3 * BLOCK_SIZE - 1]) == entries[3 * BLOCK_SIZE + 5]
+    # Les bornes exactes des blocs : dernier document d'un bloc, premier du suivant
+    assert postings.seek(doc_ids[4 * BLOCK_SIZE - 1]) == entries[4 * BLOCK_SIZE - 1]
+    assert postings.seek(doc_ids[4 * BLOCK_SIZE - 1] + 1) == entries[4 * BLOCK_SIZE]
+    assert postings.seek(doc_ids[-1] + 1) is None
+
+    postings.reset()
+    assert postings.seek(doc_ids[0]) == entries[0]
+
+
+def test_unknown_codec():
+    assert get_codec('bitpacked').name == 'bitpacked'
+    with pytest.raises(ValueError):
+        get_codec('gzip')
@@ -0,0 +1,36 @@
+import random
+import pytest
+from requests import Requests
+from proximity import phrase_occurrences, min_distance
+from tests.local_products import FIELDS
+from tests.reference import POSITIONAL_REQUESTS, positional_matches
+
+
+@pytest.mark.parametrize("request_text", POSITIONAL_REQUESTS)
+def test_phrase_and_near_match_brute_force(engine, request_text):
+    req = Requests(request_text, engine=engine)
+    req.tokenize_request()
+    req.add_synonyms()
+    assert req.constraints
+    for field in FIELDS:
+        assert req.exact_match(field) == positional_matches(request_text, field)
+
+    results = engine.search(request_text)
+    expected = set(positional_matches(request_text, 'title')) | set(positional_matches(request_text, 'description'))
+    assert results['filtered_documents'] == len(expected)
+    top = engine.search(request_text, 3)['documents']
+    assert [document['url'] for document in top] == [document['url'] for document in results['documents'][:3]]
+
+
+def test_phrase_occurrences_and_min_distance():
+    generator = random.Random(4)
+    for _ in range(300):
+        positions = [sorted(generator.sample(range(30), generator.randint(0, 8))) for _ in range(3)]
+        expected = [start for start in positions[0] if all(start + i in positions[i] for i in range(1, 3))]
+        assert phrase_occurrences(positions) == expected
+
+        left, right = positions[0], positions[1]
+        left_length, right_length = generator.randint(1, 3), generator.randint(1, 3)
+        distances = [b - (a + left_length - 1) if b >= a + left_length else a - (b + right_length - 1)
+                     for a in left for b in right if b >= a + left_length or b + right_length <= a]
+        assert min_distance(left, right, left_length, right_length) == (min(distances) if distances else None)
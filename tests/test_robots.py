@@ -0,0 +1,57 @@
+import threading
+from robots import RobotsCache
+from tests.local_site import Site, ROBOTS
+import utils
+
+
+def test_rules_crawl_delay_and_sitemaps(site):
+    cache = RobotsCache()
+    assert cache.can_fetch(site.url + "/products/1")
+    assert not cache.can_fetch(site.url + "/private/x")
+    assert cache.crawl_delay(site.url + "/") == 0
+    assert cache.sitemaps(site.url + "/") == [site.url + "/sitemap.xml"]
+    assert cache.fetches == 1
+    assert site.paths().count('/robots.txt') == 1
+
+
+def test_one_fetch_per_host_across_threads(site):
+    cache = RobotsCache()
+    threads = [threading.Thread(target=cache.can_fetch, args=(f"{site.url}/products/{i}",)) for i in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert cache.fetches == 1
+
+
+def test_entry_expires():
+    with Site({}, "User-agent: *\nCrawl-delay: 2\n") as site:
+        cache = RobotsCache(ttl=0)
+        assert cache.crawl_delay(site.url + "/") == 2
+        site.robots = "User-agent: *\nDisallow: /\n"
+        assert not cache.can_fetch(site.url + "/products/1")
+        assert cache.fetches == 2
+
+
+def test_error_responses_are_cached():
+    for status, allowed in ((404, True), (403, False), (401, False), (503, False)):
+        with Site({}, status) as site:
+            cache = RobotsCache()
+            assert cache.can_fetch(site.url + "/products/1") is allowed
+            assert cache.can_fetch(site.url + "/products/2") is allowed
+            assert cache.fetches == 1
+
+
+def test_unreachable_host_is_disallowed():
+    with Site({}, ROBOTS) as site:
+        url = site.url
+    cache = RobotsCache(timeout=1)
+    assert not cache.can_fetch(url + "/products/1")
+    assert cache.fetches == 1
+
+
+def test_sitemap(site):
+    sitemaps = utils.get_sitemaps(site.url + "/")
+    assert sitemaps == [site.url + "/sitemap.xml"]
+    assert utils.parse_sitemap(sitemaps[0]) == [site.url + "/produit/sitemap"]
+    assert utils.parse_sitemap(site.url + "/absent.xml") == []
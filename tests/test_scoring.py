@@ -0,0 +1,50 @@
+import math
+import pytest
+from analyzer import analyzer
+from scoring import TermAtATimeScorer
+from tests.local_products import products
+from tests.reference import REQUESTS, WEIGHTS, TOLERANCE, reference_search, doc_id
+
+
+@pytest.mark.parametrize("request_text", REQUESTS)
+@pytest.mark.parametrize("k", [None, 1, 3, 5])
+def test_ranking_matches_brute_force(engine, request_text, k):
+    expected, exact, _ = reference_search(request_text)
+    results = engine.search(request_text, k)
+    ranked = [(doc_id(document['url']), document['ranking_score']) for document in results['documents']]
+
+    assert results['total_documents'] == len(products())
+    assert results['filtered_documents'] == len(exact['title'] | exact['description'])
+    for doc, score in ranked:
+        assert score == pytest.approx(expected[doc], rel=TOLERANCE, abs=0)
+    assert [score for _, score in ranked] == pytest.approx(sorted(expected.values(), reverse=True)[:k], rel=TOLERANCE, abs=0)
+    if k is None:
+        assert {doc for doc, _ in ranked} == set(expected)
+    else:
+        # MaxScore additionne les tokens dans un autre ordre : mêmes documents, scores à l'arrondi près
+        everything = engine.search(request_text)['documents'][:k]
+        assert [document['url'] for document in results['documents']] == [document['url'] for document in everything]
+
+
+@pytest.mark.parametrize("k", [0, -1])
+def test_no_document_for_k_zero_or_less(engine, k):
+    for request_text in REQUESTS:
+        results = engine.search(request_text, k)
+        assert results['documents'] == []
+        assert results['filtered_documents'] == engine.search(request_text)['filtered_documents']
+
+    fields = [{'name': field, 'weight': weight, 'index': engine.indexes[f"{field}_index"],
+               'statistics': engine.statistics[field], 'allowed': None} for field, weight in WEIGHTS.items()]
+    tokens = analyzer.tokenize("dark chocolate")
+    scorer = TermAtATimeScorer()
+    assert scorer.accumulate(fields, tokens, k, engine.review_scores) == {'title': {}, 'description': {}}
+    assert scorer.score_documents(fields, tokens, k, engine.review_scores) == {}
+    assert scorer.threshold({}, fields, {1, 2}, k, {}) == -math.inf
+    assert scorer.top_k([3, 1, 2], k, key=lambda x: x) == []
+
+
+def test_threshold_with_fewer_candidates_than_k():
+    fields = [{'name': 'title', 'weight': 2.0}]
+    accumulators = {'title': {1: 1.0, 2: 3.0}}
+    assert TermAtATimeScorer.threshold(accumulators, fields, {1, 2}, 3, {}) == -math.inf
+    assert TermAtATimeScorer.threshold(accumulators, fields, {1, 2}, 2, {1: 0.5}) == 2.5
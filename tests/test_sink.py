@@ -0,0 +1,48 @@
+import os
+from sink import JsonlSink
+
+
+def test_records_are_written_in_batches(tmp_path):
+    filename = str(tmp_path / "pages.jsonl")
+    sink = JsonlSink(filename, batch_size=3, flush_interval=3600)
+    sink.write({'url': 'a', 'title': 'é'})
+    sink.write({'url': 'b'})
+    assert os.path.getsize(filename) == 0  # Lot incomplet, encore dans le tampon
+    sink.write({'url': 'c'})
+    assert os.path.getsize(filename) > 0
+    sink.write({'url': 'd'})
+    assert sink.offset() == os.path.getsize(filename)
+    assert [record['url'] for record in sink.records()] == ['a', 'b', 'c', 'd']
+    sink.close()
+
+
+def test_records_from_offset(tmp_path):
+    filename = str(tmp_path / "pages.jsonl")
+    with JsonlSink(filename) as sink:
+        sink.write({'url': 'a'})
+        offset = sink.offset()
+        sink.write({'url': 'b'})
+        assert [record['url'] for record in sink.records(offset)] == ['b']
+
+
+def test_truncated_last_line_is_removed(tmp_path):
+    filename = str(tmp_path / "pages.jsonl")
+    with JsonlSink(filename) as sink:
+        sink.write({'url': 'a'})
+        sink.write({'url': 'b'})
+    with open(filename, "ab") as f:
+        f.write(b'{"url": "c", "tit')  # Arrêt brutal au milieu d'une ligne
+
+    with JsonlSink(filename, resume=True) as sink:
+        assert [record['url'] for record in sink.records()] == ['a', 'b']
+        sink.write({'url': 'c'})
+    with open(filename, "rb") as f:
+        assert f.read().count(b"\n") == 3
+
+
+def test_without_resume_the_file_is_replaced(tmp_path):
+    filename = str(tmp_path / "pages.jsonl")
+    with JsonlSink(filename) as sink:
+        sink.write({'url': 'a'})
+    with JsonlSink(filename, resume=False) as sink:
+        assert list(sink.records()) == []
@@ -0,0 +1,64 @@
+import json
+import math
+import shutil
+import pytest
+from engine import SearchEngine
+from index import index as Index
+from tests.local_products import products
+from tests.reference import TOLERANCE, static_score, doc_id
+
+
+def read_static_scores(folder):
+    with open(folder + "/static_scores.json", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def test_static_score_file_shape_and_values(catalog_paths):
+    static_scores = read_static_scores(catalog_paths[1])
+    # Un flottant par document, dans l'ordre de la table des documents
+    assert len(static_scores) == len(products())
+    assert all(isinstance(score, float) for score in static_scores)
+    assert static_scores == pytest.approx([static_score(product) for product in products()], rel=TOLERANCE, abs=0)
+    # Sans avis, le score est nul ; avec une seule note de 5 : (5 + 5) * log(2) / 2
+    assert static_scores[2] == 0.0
+    assert static_scores[4] == pytest.approx(5 * math.log(2))
+
+
+def test_documents_without_reviews_entry_get_none(tmp_path):
+    with open(tmp_path / "doc_table.json", "w", encoding="utf-8") as f:
+        json.dump([{'url': f"https://shop.test/product/{i}"} for i in range(4)], f)
+    with open(tmp_path / "reviews_index.json", "w", encoding="utf-8") as f:
+        json.dump([{'total_reviews': 2, 'mean_mark': 3.0, 'last_rating': 4}, None], f)
+    Index(None).save_static_scores(str(tmp_path))
+    assert read_static_scores(str(tmp_path)) == [pytest.approx(10 * math.log(3) / 3), None, None, None]
+
+
+def test_missing_reviews_index_writes_no_file(tmp_path, capsys):
+    with open(tmp_path / "doc_table.json", "w", encoding="utf-8") as f:
+        json.dump([], f)
+    Index(None).save_static_scores(str(tmp_path))
+    assert not (tmp_path / "static_scores.json").exists()
+    assert "introuvable" in capsys.readouterr().out
+
+
+def test_static_scores_are_added_to_the_ranking(catalog_paths, tmp_path):
+    products_path, index_path, _ = catalog_paths
+    engine = SearchEngine(folder_path=index_path, products_path=products_path)
+    # Aucun token connu : les documents sont classés par leur seul score statique
+    ranked = [(doc_id(document['url']), document['ranking_score']) for document in engine.search("unknown")['documents']]
+    expected = sorted(((doc, static_score(product)) for doc, product in enumerate(products())), key=lambda x: -x[1])
+    assert [score for _, score in ranked] == pytest.approx([score for _, score in expected], rel=TOLERANCE, abs=0)
+
+    # Le moteur lit static_scores.json : un score statique modifié change le classement
+    folder = str(tmp_path / "index_json")
+    shutil.copytree(index_path, folder)
+    static_scores = read_static_scores(folder)
+    baseline = engine.search("dark chocolate")['documents']
+    last = doc_id(baseline[-1]['url'])
+    static_scores[last] += 100
+    with open(folder + "/static_scores.json", "w", encoding="utf-8") as f:
+        json.dump(static_scores, f)
+    boosted = SearchEngine(folder_path=folder, products_path=products_path).search("dark chocolate")['documents']
+    assert doc_id(boosted[0]['url']) == last
+    assert boosted[0]['ranking_score'] == pytest.approx(baseline[-1]['ranking_score'] + 100, rel=TOLERANCE, abs=0)
+    assert [document['url'] for document in boosted[1:]] == [document['url'] for document in baseline[:-1]]
@@ -0,0 +1,73 @@
+import pytest
+from analyzer import analyzer
+from requests import Requests
+from scoring import TermAtATimeScorer
+from synonyms import SynonymTable, END
+from tests.reference import WEIGHTS, TOLERANCE, field_tokens
+
+SYNONYMS = {'usa': ['united states', 'america', 'united states of america'], 'sneakers': ['running shoes']}
+
+
+def test_multi_word_entries_are_compiled_into_the_trie():
+    table = SynonymTable(SYNONYMS, analyzer.tokenize)
+    # "of" est un mot vide : l'entrée est compilée avec les tokens de l'analyseur des requêtes
+    assert table.groups[0] == [('usa',), ('united', 'states'), ('america',), ('united', 'states', 'america')]
+    assert table.trie['united']['states'][END] == [0]
+    assert table.trie['united']['states']['america'][END] == [0]
+    assert END not in table.trie['united']
+    assert table.trie['running']['shoes'][END] == [1]
+
+
+def test_longest_entry_is_matched():
+    table = SynonymTable(SYNONYMS, analyzer.tokenize)
+    tokens = analyzer.tokenize("boots united states of america")
+    assert table.match(tokens, 0) == (0, [])
+    assert table.match(tokens, 1) == (3, [0])
+    assert table.match(analyzer.tokenize("united kingdom"), 0) == (0, [])
+
+
+def test_expansion_weights_and_clauses():
+    table = SynonymTable(SYNONYMS, analyzer.tokenize)
+    tokens, weights, clauses = table.expand(analyzer.tokenize("leather boots united states"))
+    assert tokens == ['leather', 'boots', 'united', 'states', 'usa', 'america']
+    # Tokens de la requête à 1, tokens ajoutés par l'expansion à 0.5
+    assert weights == {'leather': 1.0, 'boots': 1.0, 'united': 1.0, 'states': 1.0, 'usa': 0.5, 'america': 0.5}
+    assert clauses == [(('leather',),), (('boots',),),
+                       (('usa',), ('united', 'states'), ('america',), ('united', 'states', 'america'))]
+
+    tokens, weights, clauses = table.expand(analyzer.tokenize("sneakers"))
+    assert weights == {'sneakers': 1.0, 'running': 0.5, 'shoes': 0.5}
+    assert clauses == [(('sneakers',), ('running', 'shoes'))]
+
+
+def test_request_expansion_through_the_engine(engine):
+    req = Requests("Running Shoes America", engine=engine)
+    req.synonym_table = SynonymTable(SYNONYMS, req.tokenize)
+    req.tokenize_request()
+    req.add_synonyms()
+    assert req.term_weights == {'running': 1.0, 'shoes': 1.0, 'america': 1.0, 'sneakers': 0.5,
+                                'usa': 0.5, 'united': 0.5, 'states': 0.5}
+
+    # "running shoes" trouve aussi les documents contenant "sneakers", et inversement
+    for request_text in ("running shoes", "sneakers"):
+        req = Requests(request_text, engine=engine)
+        req.synonym_table = SynonymTable(SYNONYMS, req.tokenize)
+        req.tokenize_request()
+        req.add_synonyms()
+        for field in WEIGHTS:
+            expected = [doc for doc, document in enumerate(field_tokens(field))
+                        if 'sneakers' in document or {'running', 'shoes'} <= set(document)]
+            assert req.exact_match(field) == expected
+
+
+def test_expanded_tokens_are_scored_at_half_weight(engine):
+    fields = [{'name': field, 'weight': weight, 'index': engine.indexes[f"{field}_index"],
+               'statistics': engine.statistics[field], 'allowed': None} for field, weight in WEIGHTS.items()]
+    tokens, weights, _ = SynonymTable(SYNONYMS, analyzer.tokenize).expand(analyzer.tokenize("sneakers"))
+    scorer = TermAtATimeScorer()
+    expanded = scorer.score_documents(fields, tokens, None, None, weights)
+    expected = {}
+    for token, weight in weights.items():
+        for doc, score in scorer.score_documents(fields, [token]).items():
+            expected[doc] = expected.get(doc, 0) + weight * score
+    assert expanded == pytest.approx(expected, rel=TOLERANCE, abs=0)
@@ -0,0 +1,73 @@
+import pytest
+from analyzer import analyzer
+from engine import SearchEngine
+from scoring import TermAtATimeScorer
+from vectorized import VectorizedScorer
+from tests.reference import REQUESTS, WEIGHTS, TOLERANCE, reference_search, doc_id
+
+
+def test_vectorized_scorer_matches_python_scorer(engine):
+    pytest.importorskip("numpy")
+    static_scores = engine.review_scores
+    fields = [{'name': field, 'weight': weight, 'index': engine.indexes[f"{field}_index"],
+               'statistics': engine.statistics[field], 'allowed': None} for field, weight in WEIGHTS.items()]
+    for request_text in REQUESTS:
+        tokens = analyzer.tokenize(request_text)
+        expected = TermAtATimeScorer().score_documents(fields, tokens, None, static_scores)
+        assert VectorizedScorer().score_documents(fields, tokens, None, static_scores) == pytest.approx(expected, rel=TOLERANCE, abs=0)
+        # Avec k, seuls les k meilleurs documents sont garantis (MaxScore élague les autres)
+        top = sorted(expected.values(), reverse=True)[:3]
+        for scorer in (TermAtATimeScorer(), VectorizedScorer()):
+            scores = sorted(scorer.score_documents(fields, tokens, 3, static_scores).values(), reverse=True)[:3]
+            assert scores == pytest.approx(top, rel=TOLERANCE, abs=0)
+
+
+def test_vectorized_engine_matches_brute_force(catalog_paths):
+    pytest.importorskip("numpy")
+    products_path, index_path, _ = catalog_paths
+    engine = SearchEngine(folder_path=index_path, products_path=products_path, vectorized=True)
+    assert isinstance(engine.scorer, VectorizedScorer)
+    for request_text in REQUESTS:
+        expected, _, _ = reference_search(request_text)
+        ranked = {doc_id(document['url']): document['ranking_score'] for document in engine.search(request_text)['documents']}
+        assert ranked == pytest.approx(expected, rel=TOLERANCE, abs=0)
+
+
+def test_vectorized_scorer_without_document_for_k_zero(engine):
+    pytest.importorskip("numpy")
+    fields = [{'name': field, 'weight': weight, 'index': engine.indexes[f"{field}_index"],
+               'statistics': engine.statistics[field], 'allowed': None} for field, weight in WEIGHTS.items()]
+    tokens = analyzer.tokenize("dark chocolate")
+    assert VectorizedScorer().accumulate(fields, tokens, 0, engine.review_scores) == {'title': {}, 'description': {}}
+    assert VectorizedScorer().score_documents(fields, tokens, 0, engine.review_scores) == {}
+
+
+def test_vectorized_scorer_keeps_the_scorer_interface(engine):
+    pytest.importorskip("numpy")
+    # Les méthodes de TermAtATimeScorer gardent leur signature et leur résultat
+    field = {'name': 'title', 'weight': 2.0, 'index': engine.indexes["title_index"],
+             'statistics': engine.statistics['title'], 'allowed': None}
+    python_scorer, vectorized_scorer = TermAtATimeScorer(), VectorizedScorer()
+    for term in ('chocolate', 'box', 'running'):
+        entries = list(TermAtATimeScorer.postings(field, term))
+        assert list(vectorized_scorer.score_postings(field, term, entries)) == list(python_scorer.score_postings(field, term, entries))
+        python_scorer.term_cache, vectorized_scorer.term_cache = {}, {}
+        assert vectorized_scorer.term_scores(field, term) == python_scorer.term_scores(field, term)
+        python_scorer.term_cache, vectorized_scorer.term_cache = None, None
+
+
+def test_columnar_postings_are_kept_apart_from_the_statistics(catalog_paths):
+    pytest.importorskip("numpy")
+    products_path, index_path, _ = catalog_paths
+    engine = SearchEngine(folder_path=index_path, products_path=products_path, vectorized=True, cache_size=0)
+    statistics = dict(engine.statistics['title'])
+    engine.search("dark chocolate")
+    assert engine.statistics['title'] == statistics
+    columns = engine.scorer.columns['title'][1]
+    assert 'chocolate' in columns.columns
+
+    # Le même scorer sur d'autres statistiques du champ construit d'autres colonnes
+    other = dict(engine.statistics['title'])
+    field = {'name': 'title', 'weight': 2.0, 'index': engine.indexes["title_index"], 'statistics': other, 'allowed': None}
+    assert engine.scorer.columnar(field) is not columns
+    assert engine.scorer.columnar(field) is engine.scorer.columnar(field)